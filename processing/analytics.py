@@ -0,0 +1,210 @@
+import math
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Avg, CharField, Count, F, FloatField, Max, Min, Q, Sum, Value, Window
+from django.db.models.expressions import Expression
+from django.db.models.functions import (Cast, Ceil, Floor, Least, RowNumber, TruncDate, TruncMonth, TruncWeek,
+                                        TruncYear)
+from django.db.models.query import QuerySet
+
+from processing.models import METRIC_FIELDS, Dataset, Mask
+
+GROUPINGS = {
+    'day': TruncDate,
+    'week': TruncWeek,
+    'month': TruncMonth,
+    'year': TruncYear,
+}
+
+
+def get_group(group_by: str = None) -> Expression:
+    """
+    Returns the expression masks are grouped by.
+
+    Parameters:
+        group_by (str, optional): One of ``GROUPINGS``, the period of the upload date of the pictures. Defaults to a
+            single group.
+
+    Returns:
+        Expression: The group of a mask.
+    """
+
+    if group_by is None:
+        return Value(None, output_field=CharField())
+
+    return GROUPINGS[group_by]('picture__created')
+
+
+def get_analytics_version(masks: QuerySet[Mask]) -> str:
+    """
+    Returns a version of the masks of a dataset, which changes whenever one of them is created, updated or deleted.
+
+    Parameters:
+        masks (QuerySet[Mask]): The masks of the dataset.
+
+    Returns:
+        str: The version of the masks.
+    """
+
+    stamp = masks.aggregate(count=Count('id'), updated=Max('updated'))
+    updated = stamp['updated'].isoformat() if stamp['updated'] is not None else ''
+
+    return f'{stamp["count"]}:{updated}'
+
+
+def find_percentiles(masks: QuerySet[Mask], group: Expression, field: str, percentiles: list[float]) -> dict:
+    """
+    Computes percentiles of a metric in every group, interpolating linearly between ranks like ``np.percentile``.
+
+    Rows are ranked with window functions and only the rows at the ranks the percentiles fall between are fetched.
+
+    Parameters:
+        masks (QuerySet[Mask]): The masks.
+        group (Expression): The group of a mask, see ``get_group``.
+        field (str): The metric.
+        percentiles (list[float]): The percentiles to compute, between 0 and 100.
+
+    Returns:
+        dict: The percentiles of each group, by group.
+    """
+
+    partition = None if isinstance(group, Value) else [group]
+    ranked = masks.annotate(
+        group=group,
+        position=Window(RowNumber(), partition_by=partition, order_by=[F(field).asc(), F('id').asc()]),
+        size=Window(Count('id'), partition_by=partition),
+    )
+
+    wanted = Q()
+    for percentile in percentiles:
+        rank = percentile / 100 * (F('size') - 1)
+        wanted |= Q(position=Floor(rank) + 1) | Q(position=Ceil(rank) + 1)
+
+    values = {}
+    sizes = {}
+    for key, position, size, value in ranked.filter(wanted).values_list('group', 'position', 'size', field):
+        values[key, position - 1] = value
+        sizes[key] = size
+
+    results = {}
+    for key, size in sizes.items():
+        results[key] = {}
+        for percentile in percentiles:
+            rank = percentile / 100 * (size - 1)
+            lower = values[key, math.floor(rank)]
+            upper = values[key, math.ceil(rank)]
+            results[key][f'{percentile:g}'] = lower + (upper - lower) * (rank - math.floor(rank))
+
+    return results
+
+
+def find_histograms(masks: QuerySet[Mask], group: Expression, field: str, low: float, high: float,
+                    bins: int) -> dict:
+    """
+    Counts the masks of every group in equal-width bins of a metric.
+
+    Parameters:
+        masks (QuerySet[Mask]): The masks.
+        group (Expression): The group of a mask, see ``get_group``.
+        field (str): The metric.
+        low (float): The lower edge of the first bin.
+        high (float): The upper edge of the last bin, which is closed.
+        bins (int): The number of bins.
+
+    Returns:
+        dict: The count of each bin, by group.
+    """
+
+    if high > low:
+        bucket = Least(Floor((Cast(field, FloatField()) - low) * bins / (high - low)), Value(bins - 1.0))
+    else:
+        bucket = Value(0)
+
+    counts = masks.annotate(group=group, bucket=bucket).values('group', 'bucket').annotate(count=Count('id'))
+
+    results = {}
+    for row in counts:
+        results.setdefault(row['group'], [0] * bins)[int(row['bucket'])] = row['count']
+
+    return results
+
+
+def compute_analytics(dataset: Dataset, group_by: str = None, percentiles: list[float] = (5, 25, 50, 75, 95),
+                      bins: int = 10) -> dict:
+    """
+    Summarizes the metrics of the masks of a dataset in the database.
+
+    Every statistic is computed by the database, with a fixed number of queries whatever the size of the dataset.
+    Histograms share their edges across groups, so that groups can be compared.
+
+    Parameters:
+        dataset (Dataset): The dataset.
+        group_by (str, optional): One of ``GROUPINGS``. Defaults to a single group.
+        percentiles (list[float], optional): The percentiles to compute. Defaults to 5, 25, 50, 75 and 95.
+        bins (int, optional): The number of bins of the histograms. Defaults to 10.
+
+    Returns:
+        dict: The count of masks and the sum, mean, minimum, maximum, percentiles and histogram of every metric,
+        for every group.
+    """
+
+    masks = Mask.objects.filter(picture__dataset=dataset)
+    group = get_group(group_by)
+
+    aggregates = {'count': Count('id')}
+    for field in METRIC_FIELDS:
+        aggregates.update({
+            f'{field}__sum': Sum(field), f'{field}__mean': Avg(field),
+            f'{field}__min': Min(field), f'{field}__max': Max(field),
+        })
+
+    rows = list(masks.annotate(group=group).values('group').annotate(**aggregates).order_by('group'))
+    groups = {row['group']: {'group': row['group'], 'count': row['count'], 'fields': {}} for row in rows}
+
+    for field in METRIC_FIELDS:
+        low = min((row[f'{field}__min'] for row in rows), default=0)
+        high = max((row[f'{field}__max'] for row in rows), default=0)
+        edges = [low + (high - low) * index / bins for index in range(bins + 1)]
+
+        field_percentiles = find_percentiles(masks, group, field, percentiles)
+        histograms = find_histograms(masks, group, field, low, high, bins)
+
+        for row in rows:
+            groups[row['group']]['fields'][field] = {
+                'sum': row[f'{field}__sum'],
+                'mean': row[f'{field}__mean'],
+                'min': row[f'{field}__min'],
+                'max': row[f'{field}__max'],
+                'percentiles': field_percentiles[row['group']],
+                'histogram': {'edges': edges, 'counts': histograms[row['group']]},
+            }
+
+    return {'group_by': group_by, 'count': sum(row['count'] for row in rows), 'groups': list(groups.values())}
+
+
+def get_analytics(dataset: Dataset, group_by: str = None, percentiles: list[float] = (5, 25, 50, 75, 95),
+                  bins: int = 10) -> dict:
+    """
+    Returns the analytics of a dataset, computing them only if a mask of the dataset changed since they were
+    cached.
+
+    Parameters:
+        dataset (Dataset): The dataset.
+        group_by (str, optional): One of ``GROUPINGS``. Defaults to a single group.
+        percentiles (list[float], optional): The percentiles to compute. Defaults to 5, 25, 50, 75 and 95.
+        bins (int, optional): The number of bins of the histograms. Defaults to 10.
+
+    Returns:
+        dict: The analytics, see ``compute_analytics``.
+    """
+
+    version = get_analytics_version(Mask.objects.filter(picture__dataset=dataset))
+    key = f'analytics:{dataset.id}:{group_by}:{",".join(f"{p:g}" for p in percentiles)}:{bins}:{version}'
+
+    analytics = cache.get(key)
+    if analytics is None:
+        analytics = compute_analytics(dataset, group_by, percentiles, bins)
+        cache.set(key, analytics, settings.ANALYTICS_CACHE_SECONDS)
+
+    return analytics
@@ -0,0 +1,176 @@
+import hashlib
+import os
+import tempfile
+from collections.abc import Callable, Iterator
+from datetime import datetime
+
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.http import HttpRequest, HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+from processing.tiles import delete_tree
+
+
+def get_version(*parts) -> str:
+    """
+    Combines whatever a response depends on, such as ids and ``updated`` timestamps, into a short version string.
+
+    Parameters:
+        *parts: The values the response depends on.
+
+    Returns:
+        str: The version.
+    """
+
+    return hashlib.sha256(':'.join(str(part) for part in parts).encode('utf-8')).hexdigest()[:32]
+
+
+def check_conditions(request: HttpRequest, version: str, last_modified: datetime = None) -> HttpResponse | None:
+    """
+    Answers a conditional request from the version and last modification of the resource, without building it.
+
+    Parameters:
+        request (HttpRequest): The request, with its ``If-None-Match`` and ``If-Modified-Since`` headers.
+        version (str): The version of the resource, see ``get_version``.
+        last_modified (datetime, optional): The last modification of the resource.
+
+    Returns:
+        HttpResponse | None: A 304 or 412 response if the client's copy is current, None if the resource has to be
+        sent.
+    """
+
+    timestamp = int(last_modified.timestamp()) if last_modified is not None else None
+    response = get_conditional_response(request, etag=quote_etag(version), last_modified=timestamp)
+
+    if response is not None:
+        set_validators(response, version, last_modified)
+
+    return response
+
+
+def set_validators(response: HttpResponse, version: str, last_modified: datetime = None,
+                   public: bool = False) -> HttpResponse:
+    """
+    Adds the ``ETag`` and ``Last-Modified`` headers of a resource to its response, asking clients and proxies to
+    revalidate it before reusing it.
+
+    Parameters:
+        response (HttpResponse): The response.
+        version (str): The version of the resource, see ``get_version``.
+        last_modified (datetime, optional): The last modification of the resource.
+        public (bool, optional): Whether shared caches may keep the resource. Defaults to False.
+
+    Returns:
+        HttpResponse: The response.
+    """
+
+    response['ETag'] = quote_etag(version)
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+
+    patch_cache_control(response, no_cache=True, **({'public': True} if public else {'private': True}))
+    patch_vary_headers(response, ['Authorization', 'Cookie'])
+
+    return response
+
+
+def get_artifact_root(dataset_id: int, picture_id: int = None) -> str:
+    """
+    Returns the storage directory of the export artifacts of a dataset, or of one of its pictures.
+
+    Parameters:
+        dataset_id (int): The dataset.
+        picture_id (int, optional): The picture.
+
+    Returns:
+        str: The directory.
+    """
+
+    if picture_id is None:
+        return f'exports/{dataset_id}'
+
+    return f'exports/{dataset_id}/{picture_id}'
+
+
+def get_artifact(name: str, build: Callable[[], bytes]) -> str:
+    """
+    Returns an export artifact, building and storing it if this version of it is not stored yet. Other versions
+    of the artifact, which are stored next to it, are deleted.
+
+    Parameters:
+        name (str): The storage name of the artifact, whose file name is its version.
+        build (Callable[[], bytes]): Builds the artifact.
+
+    Returns:
+        str: The storage name of the artifact.
+    """
+
+    if not default_storage.exists(name):
+        delete_other_versions(name)
+        default_storage.save(name, ContentFile(build()))
+
+    return name
+
+
+def stream_artifact(name: str, chunks: Iterator[bytes]) -> Iterator[bytes]:
+    """
+    Passes a streamed export through while copying it to a temporary file, which is stored as the artifact once the
+    stream is complete. Streams that are interrupted are not stored.
+
+    Parameters:
+        name (str): The storage name of the artifact, whose file name is its version.
+        chunks (Iterator[bytes]): The export.
+
+    Yields:
+        bytes: The next part of the export.
+    """
+
+    with tempfile.TemporaryFile() as f:
+        for chunk in chunks:
+            f.write(chunk)
+            yield chunk
+
+        f.seek(0)
+        if not default_storage.exists(name):
+            delete_other_versions(name)
+            default_storage.save(name, File(f))
+
+
+def delete_other_versions(name: str) -> None:
+    """
+    Deletes the stored versions of an artifact other than the given one.
+
+    Parameters:
+        name (str): The storage name of the current version of the artifact.
+    """
+
+    directory, filename = os.path.split(name)
+
+    try:
+        _, files = default_storage.listdir(directory)
+    except FileNotFoundError:
+        return
+
+    for other in files:
+        if other != filename:
+            default_storage.delete(f'{directory}/{other}')
+
+
+def delete_artifacts(dataset_id: int, picture_ids: list[int] = None) -> None:
+    """
+    Deletes the export artifacts of a dataset, or of some of its pictures.
+
+    Parameters:
+        dataset_id (int): The dataset.
+        picture_ids (list[int], optional): The pictures. Defaults to the whole dataset.
+    """
+
+    if picture_ids is None:
+        delete_tree(get_artifact_root(dataset_id))
+        return
+
+    for picture_id in picture_ids:
+        delete_tree(get_artifact_root(dataset_id, picture_id))
@@ -0,0 +1,291 @@
+import csv
+import io
+import os
+import shutil
+import zipfile
+from collections.abc import Iterator
+from datetime import datetime
+
+import numpy as np
+from PIL import Image as PILImage
+
+from django.db.models import Count, Max
+from django.db.models.fields.files import FieldFile
+
+from processing.caching import get_version
+from processing.models import METRIC_FIELDS, Dataset, Picture, Mask
+import segmentation
+
+CHUNK_SIZE = 64 * 1024
+
+
+class ZipStream(io.RawIOBase):
+    """
+    A write-only, unseekable file that keeps what is written to it until it is popped, so that a ``zipfile.ZipFile``
+    can be streamed as it is written.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.chunks = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data: bytes) -> int:
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def pop(self) -> bytes:
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def get_zip_info(name: str, modified: datetime, compress_type: int = zipfile.ZIP_STORED) -> zipfile.ZipInfo:
+    """
+    Describes an archive entry, dated from the record it comes from so that archives of unchanged data are
+    identical.
+
+    Parameters:
+        name (str): The path of the entry in the archive.
+        modified (datetime): The last modification of the entry.
+        compress_type (int, optional): The compression of the entry. Defaults to none, images being compressed
+            already.
+
+    Returns:
+        zipfile.ZipInfo: The entry.
+    """
+
+    info = zipfile.ZipInfo(name, date_time=modified.timetuple()[:6])
+    info.compress_type = compress_type
+
+    return info
+
+
+def write_file(archive: zipfile.ZipFile, stream: ZipStream, info: zipfile.ZipInfo,
+               field: FieldFile) -> Iterator[bytes]:
+    """
+    Copies a stored file into an archive, yielding the archive as it grows.
+
+    Parameters:
+        archive (zipfile.ZipFile): The archive being written.
+        stream (ZipStream): The file the archive is written to.
+        info (zipfile.ZipInfo): The entry to write the file to.
+        field (FieldFile): The stored file.
+
+    Yields:
+        bytes: The next part of the archive.
+    """
+
+    with field.open('rb') as source, archive.open(info, 'w') as entry:
+        while chunk := source.read(CHUNK_SIZE):
+            entry.write(chunk)
+            yield stream.pop()
+
+
+def find_contours(mask_arr: np.ndarray) -> dict:
+    """
+    Describes the regions of a mask by the polygons its LabelMe annotation is made of, to be cached in
+    ``Mask.contours``.
+
+    Parameters:
+        mask_arr (np.ndarray): The mask, non-zero pixels being roots.
+
+    Returns:
+        dict: The height and width of the mask and its polygons, see ``find_polygons``.
+    """
+
+    return {
+        'height': mask_arr.shape[0],
+        'width': mask_arr.shape[1],
+        'polygons': segmentation.masks.find_polygons(mask_arr),
+    }
+
+
+def get_contours(mask: Mask) -> dict:
+    """
+    Returns the cached contours of a mask, finding and caching them first for masks saved before they were cached.
+
+    Parameters:
+        mask (Mask): The mask.
+
+    Returns:
+        dict: The contours of the mask, see ``find_contours``.
+    """
+
+    if mask.contours is None:
+        with mask.image.open('rb') as f:
+            mask_arr = (np.array(PILImage.open(f).convert('L')) > 0).astype(np.uint8)
+
+        mask.contours = find_contours(mask_arr)
+        Mask.objects.filter(pk=mask.pk).update(contours=mask.contours)
+
+    return mask.contours
+
+
+def get_archive_filename(picture: Picture) -> str:
+    """
+    Returns the name of a picture in dataset archives, which is unique within the dataset. Pictures may have been
+    uploaded under the same name and share a stored file, so the name is prefixed with the id of the picture.
+
+    Parameters:
+        picture (Picture): The picture.
+
+    Returns:
+        str: The file name of the picture in the archive.
+    """
+
+    return f'{picture.id}_{picture.filename}'
+
+
+def get_labelme(picture: Picture, mask: Mask, image_path: str = None) -> str:
+    """
+    Builds the LabelMe annotation of a mask from its cached contours, without decoding any image.
+
+    Parameters:
+        picture (Picture): The picture, which the annotation refers to.
+        mask (Mask): The mask of the picture.
+        image_path (str, optional): The path of the picture the annotation refers to. Defaults to its file name.
+
+    Returns:
+        str: The LabelMe JSON string.
+    """
+
+    contours = get_contours(mask)
+
+    return segmentation.masks.polygons_to_labelme(
+        image_path or picture.filename, contours['polygons'], contours['height'], contours['width'])
+
+
+def build_labelme_archive(picture: Picture, mask: Mask) -> bytes:
+    """
+    Builds a zip archive of a picture and the LabelMe annotation of its mask.
+
+    Parameters:
+        picture (Picture): The picture.
+        mask (Mask): The mask of the picture.
+
+    Returns:
+        bytes: The archive.
+    """
+
+    outfile = io.BytesIO()
+    with zipfile.ZipFile(outfile, 'w') as zf:
+        zf.writestr(get_zip_info('labelme.json', mask.updated, zipfile.ZIP_DEFLATED), get_labelme(picture, mask))
+
+        with picture.image.open('rb') as source, zf.open(get_zip_info(picture.filename, picture.updated), 'w') as f:
+            shutil.copyfileobj(source, f, CHUNK_SIZE)
+
+    return outfile.getvalue()
+
+
+def write_labelme(archive: zipfile.ZipFile, picture: Picture, mask: Mask) -> None:
+    """
+    Writes the LabelMe annotation of a mask next to its picture in a dataset archive.
+
+    Parameters:
+        archive (zipfile.ZipFile): The archive being written.
+        picture (Picture): The picture, which the annotation refers to.
+        mask (Mask): The mask of the picture.
+    """
+
+    filename = get_archive_filename(picture)
+
+    info = get_zip_info(f'images/{os.path.splitext(filename)[0]}.json', mask.updated, zipfile.ZIP_DEFLATED)
+    archive.writestr(info, get_labelme(picture, mask, filename))
+
+
+def write_metrics(archive: zipfile.ZipFile, stream: ZipStream, dataset: Dataset,
+                  modified: datetime) -> Iterator[bytes]:
+    """
+    Writes the metrics of every mask of a dataset to a CSV file in an archive, yielding the archive as it grows.
+
+    Parameters:
+        archive (zipfile.ZipFile): The archive being written.
+        stream (ZipStream): The file the archive is written to.
+        dataset (Dataset): The dataset.
+        modified (datetime): The last modification of the masks.
+
+    Yields:
+        bytes: The next part of the archive.
+    """
+
+    rows = Mask.objects.filter(picture__dataset=dataset).order_by('picture_id').values_list(
+        'picture_id', 'picture__name', 'picture__image', *METRIC_FIELDS)
+
+    with archive.open(get_zip_info('metrics.csv', modified, zipfile.ZIP_DEFLATED), 'w') as entry:
+        text = io.TextIOWrapper(entry, encoding='utf-8', newline='', write_through=True)
+        writer = csv.writer(text)
+        writer.writerow(('image', *METRIC_FIELDS))
+
+        for picture_id, name, image, *metrics in rows.iterator():
+            picture = Picture(id=picture_id, name=name, image=image)
+            writer.writerow((get_archive_filename(picture), *metrics))
+            yield stream.pop()
+
+        text.detach()
+
+
+def get_dataset_version(dataset: Dataset) -> tuple[str, datetime]:
+    """
+    Returns the version of the export of a dataset, which changes whenever the dataset, one of its pictures or one of
+    their masks is created, updated or deleted.
+
+    Parameters:
+        dataset (Dataset): The dataset.
+
+    Returns:
+        tuple[str, datetime]: The version and the last modification of the dataset.
+    """
+
+    pictures = Picture.objects.filter(dataset=dataset).aggregate(
+        count=Count('id'), last_id=Max('id'), updated=Max('updated'))
+    masks = Mask.objects.filter(picture__dataset=dataset).aggregate(
+        count=Count('id'), last_id=Max('id'), updated=Max('updated'))
+
+    version = get_version('dataset', dataset.id, dataset.updated, *pictures.values(), *masks.values())
+    last_modified = max(filter(None, [dataset.updated, pictures['updated'], masks['updated']]))
+
+    return version, last_modified
+
+
+def stream_dataset_archive(dataset: Dataset) -> Iterator[bytes]:
+    """
+    Generates a zip archive of a dataset without holding it in memory.
+
+    The archive holds every picture and the LabelMe annotation of its mask in ``images/``, named by
+    ``get_archive_filename``, the masks in ``masks/`` and the metrics of the masks in ``metrics.csv``. Stored files
+    are copied in chunks as they are, without being decoded, and annotations come from the cached contours, so
+    memory stays constant whatever the size of the dataset.
+
+    Parameters:
+        dataset (Dataset): The dataset to export.
+
+    Yields:
+        bytes: The next part of the archive.
+    """
+
+    stream = ZipStream()
+    modified = dataset.updated
+    pictures = Picture.objects.filter(dataset=dataset).select_related('mask').order_by('id')
+
+    with zipfile.ZipFile(stream, 'w') as archive:
+        for picture in pictures.iterator(chunk_size=100):
+            info = get_zip_info(f'images/{get_archive_filename(picture)}', picture.updated)
+            yield from write_file(archive, stream, info, picture.image)
+
+            mask = getattr(picture, 'mask', None)
+            if mask is None:
+                continue
+
+            yield from write_file(archive, stream, get_zip_info(f'masks/{mask.filename}', mask.updated), mask.image)
+
+            write_labelme(archive, picture, mask)
+            yield stream.pop()
+
+            modified = max(modified, mask.updated)
+
+        yield from write_metrics(archive, stream, dataset, modified)
+
+    yield stream.pop()
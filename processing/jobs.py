@@ -0,0 +1,106 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from processing.models import Picture, Mask, PredictionJob
+from processing.prediction import delete_mask_images, predict_masks
+
+
+class JobReleased(Exception):
+    """
+    Raised when a worker no longer holds the job it is running, because the job was cancelled or claimed again.
+    """
+
+
+def claim_job(worker: str, stale_after: int = None) -> PredictionJob | None:
+    """
+    Claims the oldest job that is waiting for a worker.
+
+    Jobs whose worker stopped sending heartbeats are claimed again, so that a crashed worker's job is resumed by
+    the next one. Claims are made with a conditional update, so two workers never claim the same job.
+
+    Parameters:
+        worker (str): The name of the worker claiming the job.
+        stale_after (int, optional): The number of seconds after which a running job without a heartbeat is
+            considered abandoned. Defaults to ``settings.PREDICTION_JOB_STALE_SECONDS``.
+
+    Returns:
+        PredictionJob | None: The claimed job, or None if there is nothing to do.
+    """
+
+    if stale_after is None:
+        stale_after = settings.PREDICTION_JOB_STALE_SECONDS
+
+    now = timezone.now()
+    is_pending = Q(status=PredictionJob.PENDING)
+    is_abandoned = Q(status=PredictionJob.RUNNING, heartbeat__lt=now - timedelta(seconds=stale_after))
+
+    for job in PredictionJob.objects.filter(is_pending | is_abandoned).order_by('created'):
+        claimed = PredictionJob.objects.filter(id=job.id, status=job.status, heartbeat=job.heartbeat).update(
+            status=PredictionJob.RUNNING, worker=worker, heartbeat=now, updated=now)
+
+        if claimed:
+            job.refresh_from_db()
+            return job
+
+    return None
+
+
+def run_job(job: PredictionJob, chunk_size: int = None) -> PredictionJob:
+    """
+    Predicts the masks of a claimed job, saving them chunk by chunk.
+
+    Only pictures without a mask are predicted, so a job resumed after a crash skips the chunks that were already
+    saved. The heartbeat is updated after every picture, so that a slow chunk is not mistaken for a crashed worker,
+    and progress after every chunk. The job stops at the next picture once it is cancelled or claimed by another
+    worker, without saving the chunk, and the images of its unsaved masks are deleted. Errors mark the job as failed
+    instead of being raised.
+
+    Parameters:
+        job (PredictionJob): The job, claimed with ``claim_job``.
+        chunk_size (int, optional): The number of masks saved at a time.
+            Defaults to ``settings.PREDICTION_JOB_CHUNK_SIZE``.
+
+    Returns:
+        PredictionJob: The job in its final state.
+    """
+
+    if chunk_size is None:
+        chunk_size = settings.PREDICTION_JOB_CHUNK_SIZE
+
+    claim = PredictionJob.objects.filter(id=job.id, status=PredictionJob.RUNNING, worker=job.worker)
+
+    def send_heartbeat(**fields) -> None:
+        if not claim.update(heartbeat=timezone.now(), updated=timezone.now(), **fields):
+            raise JobReleased
+
+    try:
+        while True:
+            remaining = list(Picture.objects.filter(
+                id__in=job.picture_ids, dataset=job.dataset_id, mask__isnull=True).order_by('id')[:chunk_size])
+
+            if not remaining:
+                break
+
+            masks = predict_masks(remaining, job.threshold, job.model, on_progress=send_heartbeat)
+
+            try:
+                send_heartbeat()
+                Mask.objects.bulk_create(masks)
+            except Exception:
+                delete_mask_images(masks)
+                raise
+
+            send_heartbeat(completed=Mask.objects.filter(picture__in=job.picture_ids).count())
+
+        claim.update(status=PredictionJob.COMPLETED, updated=timezone.now())
+    except JobReleased:
+        pass
+    except Exception as e:
+        claim.update(status=PredictionJob.FAILED, error=str(e), updated=timezone.now())
+
+    job.refresh_from_db()
+
+    return job
@@ -0,0 +1,41 @@
+import logging
+
+from django.core.management.base import BaseCommand, CommandParser
+
+from processing.models import Picture
+from processing.uploads import hash_file
+
+
+class Command(BaseCommand):
+    help = 'Compute the content hash of pictures uploaded before pictures were hashed.'
+
+    def __init__(self):
+        self.logger = logging.getLogger('main')
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument('--chunk_size', type=int, default=500, help='Number of pictures updated at a time')
+
+    def handle(self, *args, **options) -> None:
+        pictures = Picture.objects.filter(content_hash='').only('id', 'image')
+        total = pictures.count()
+
+        self.logger.info(f'Hashing {total} pictures')
+
+        chunk = []
+        for index, picture in enumerate(pictures.iterator(chunk_size=options['chunk_size'])):
+            try:
+                with picture.image.open('rb') as f:
+                    picture.content_hash = hash_file(f)
+            except FileNotFoundError:
+                self.logger.warning(f'Image of picture {picture.id} is missing')
+                continue
+
+            chunk.append(picture)
+            if len(chunk) >= options['chunk_size']:
+                Picture.objects.bulk_update(chunk, ['content_hash'])
+                chunk = []
+                self.logger.info(f'Hashed {index + 1}/{total} pictures')
+
+        Picture.objects.bulk_update(chunk, ['content_hash'])
+
+        self.logger.info(f'Hashed {total} pictures')
@@ -0,0 +1,46 @@
+import logging
+import os
+import socket
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandParser
+
+from processing.jobs import claim_job, run_job
+
+
+class Command(BaseCommand):
+    help = 'Run queued prediction jobs.'
+
+    def __init__(self):
+        self.logger = logging.getLogger('main')
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument('--name', type=str, default=f'{socket.gethostname()}:{os.getpid()}',
+                            help='Name of the worker, recorded on the jobs it claims')
+        parser.add_argument('--poll_interval', type=float, default=settings.PREDICTION_JOB_POLL_SECONDS,
+                            help='Seconds to wait before checking for new jobs when the queue is empty')
+        parser.add_argument('--chunk_size', type=int, default=settings.PREDICTION_JOB_CHUNK_SIZE,
+                            help='Number of masks saved at a time')
+        parser.add_argument('--once', action='store_true', help='Exit once the queue is empty')
+
+    def handle(self, *args, **options) -> None:
+        self.logger.info(f'Prediction worker {options["name"]} started')
+
+        while True:
+            job = claim_job(options['name'])
+
+            if job is None:
+                if options['once']:
+                    break
+
+                time.sleep(options['poll_interval'])
+                continue
+
+            self.logger.info(f'Running job {job.id}: {job.completed}/{job.total} masks already done')
+            job = run_job(job, options['chunk_size'])
+
+            if job.status == job.FAILED:
+                self.logger.error(f'Job {job.id} failed: {job.error}')
+            else:
+                self.logger.info(f'Job {job.id} {job.status}: {job.completed}/{job.total} masks')
@@ -0,0 +1,33 @@
+# Generated by Django 5.0.2 on 2026-10-17 20:18
+
+import django.db.models.deletion
+import django_prometheus.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('processing', '0005_model_owner_model_public_alter_model_model_type'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProbabilityMap',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model_name', models.CharField(max_length=200)),
+                ('model_version', models.CharField(max_length=200)),
+                ('image', models.ImageField(editable=False, upload_to='probabilities/')),
+                ('size', models.PositiveBigIntegerField(default=0)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('accessed', models.DateTimeField(auto_now=True, db_index=True)),
+                ('picture', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='probability_maps', to='processing.picture')),
+            ],
+            bases=(django_prometheus.models.ExportModelOperationsMixin('probability_map'), models.Model),
+        ),
+        migrations.AddConstraint(
+            model_name='probabilitymap',
+            constraint=models.UniqueConstraint(fields=('picture', 'model_name'), name='unique_probability_map'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.0.2 on 2026-10-17 20:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('processing', '0007_predictionjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mask',
+            name='model',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='masks', to='processing.model'),
+        ),
+        migrations.AddField(
+            model_name='predictionjob',
+            name='model',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='prediction_jobs', to='processing.model'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.2 on 2026-10-17 21:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('processing', '0008_mask_model'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mask',
+            name='contours',
+            field=models.JSONField(blank=True, editable=False, null=True),
+        ),
+    ]
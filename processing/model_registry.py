@@ -0,0 +1,390 @@
+import threading
+from collections import Counter, OrderedDict
+from collections.abc import Callable
+from concurrent.futures import Future
+from pathlib import Path
+from typing import NamedTuple, TYPE_CHECKING
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from prometheus_client import REGISTRY
+from prometheus_client.core import GaugeMetricFamily
+from prometheus_client.registry import Collector
+
+from processing.models import Model
+from segmentation.utils.instrumentation import get_model_type
+
+if TYPE_CHECKING:
+    from torch import nn
+
+
+class LoadedModel(NamedTuple):
+    model: 'nn.Module'
+    name: str
+    version: str
+
+
+def get_model_name(record: Model) -> str:
+    """
+    Returns the name the outputs of an uploaded model are cached under.
+
+    Parameters:
+        record (Model): The uploaded model.
+
+    Returns:
+        str: The cache name of the model.
+    """
+
+    return f'model:{record.id}'
+
+
+def get_inference_variant() -> str:
+    """
+    Returns the suffix that sets apart the outputs of a model run with non-default inference settings, i.e. another
+    ``settings.INFERENCE_PRECISION`` or a ``settings.INFERENCE_MEMORY_BUDGET``.
+
+    Returns:
+        str: The suffix, empty for the default settings.
+    """
+
+    variant = ''
+
+    if settings.INFERENCE_PRECISION != 'fp32':
+        variant += f':{settings.INFERENCE_PRECISION}'
+
+    if settings.INFERENCE_MEMORY_BUDGET is not None:
+        variant += f':tiled{settings.INFERENCE_MEMORY_BUDGET}-{settings.INFERENCE_TILE_OVERLAP}'
+
+    return variant
+
+
+def get_model_version(record: Model) -> str:
+    """
+    Returns the version of an uploaded model, which changes whenever the record or the inference settings are
+    updated.
+
+    Parameters:
+        record (Model): The uploaded model.
+
+    Returns:
+        str: The version of the model.
+    """
+
+    return record.updated.isoformat() + get_inference_variant()
+
+
+def get_model_size(model: 'nn.Module') -> int:
+    """
+    Returns the memory taken by the weights and buffers of a model.
+
+    The size is read off the state dict, since the int8 models of ``quantize_static`` keep their weights in packed
+    parameters, which ``parameters()`` and ``buffers()`` do not return. Their linear layers save the packed weight
+    and bias as a tuple of tensors.
+
+    Parameters:
+        model (nn.Module): The model.
+
+    Returns:
+        int: The size of the model in bytes.
+    """
+
+    import torch
+
+    values = list(model.state_dict(keep_vars=True).values())
+    tensors = []
+
+    while values:
+        value = values.pop()
+
+        if isinstance(value, torch.Tensor):
+            tensors.append(value)
+        elif isinstance(value, (tuple, list)):
+            values.extend(value)
+
+    return sum(tensor.numel() * tensor.element_size() for tensor in tensors)
+
+
+def apply_precision(model: 'nn.Module', model_type: str) -> 'nn.Module':
+    """
+    Converts a model to ``settings.INFERENCE_PRECISION``.
+
+    Int8 quantization is calibrated on up to ``settings.INFERENCE_CALIBRATION_IMAGES`` images from
+    ``settings.INFERENCE_CALIBRATION_DIR``.
+
+    Parameters:
+        model (nn.Module): The eager model.
+        model_type (str): The architecture of the model, see ``ModelType``.
+
+    Returns:
+        nn.Module: The converted model.
+    """
+
+    from segmentation.models import ModelType
+    from segmentation.utils.file_management import get_image_filenames
+    from segmentation.utils.predict import load_image
+    from segmentation.utils.precision import convert_precision
+
+    calibration_images = None
+    if settings.INFERENCE_PRECISION == 'int8':
+        if settings.INFERENCE_CALIBRATION_DIR is None:
+            raise ImproperlyConfigured('INFERENCE_CALIBRATION_DIR must be set to run int8 inference.')
+
+        image_filenames = get_image_filenames(str(settings.INFERENCE_CALIBRATION_DIR), recursive=True)
+        calibration_images = [load_image(filename)
+                              for filename in image_filenames[:settings.INFERENCE_CALIBRATION_IMAGES]]
+
+    return convert_precision(model, ModelType(model_type), settings.INFERENCE_PRECISION, calibration_images)
+
+
+def apply_tiling(model: 'nn.Module', model_type: str) -> 'nn.Module':
+    """
+    Runs a model on overlapping tiles sized to ``settings.INFERENCE_MEMORY_BUDGET``, if it is set.
+
+    Parameters:
+        model (nn.Module): The model.
+        model_type (str): The architecture of the model, see ``ModelType``.
+
+    Returns:
+        nn.Module: The tiled model, or the model itself without a memory budget.
+    """
+
+    from segmentation.models import ModelType
+    from segmentation.utils.tiling import TiledModel
+
+    if settings.INFERENCE_MEMORY_BUDGET is None:
+        return model
+
+    return TiledModel(model, ModelType(model_type), settings.INFERENCE_MEMORY_BUDGET, settings.INFERENCE_TILE_OVERLAP)
+
+
+def load_model(record: Model) -> 'nn.Module':
+    """
+    Builds the architecture of an uploaded model and loads its weights, in ``settings.INFERENCE_PRECISION`` and
+    tiled to ``settings.INFERENCE_MEMORY_BUDGET``.
+
+    Both plain state dicts, as written by the ``export_model`` command, and training checkpoints are accepted.
+
+    Parameters:
+        record (Model): The uploaded model.
+
+    Returns:
+        nn.Module: The model in evaluation mode.
+    """
+
+    from segmentation.models import ModelType
+    from segmentation.utils.backends import load_eager
+
+    with record.model_weights.open('rb') as f:
+        model = load_eager(ModelType(record.model_type), f)
+
+    return apply_tiling(apply_precision(model, record.model_type), record.model_type)
+
+
+def load_default_model() -> LoadedModel:
+    """
+    Loads the model used when a request does not pick one, from ``settings.DEFAULT_MODEL_CHECKPOINT``.
+
+    With an ``settings.INFERENCE_BACKEND`` other than eager, the artifact exported next to the checkpoint by the
+    ``export_model`` command is loaded instead. Reduced precisions only apply to the eager backend.
+
+    Returns:
+        LoadedModel: The default model, versioned by the modification time of the file it was loaded from and by
+        the inference settings.
+    """
+
+    from segmentation.models import ModelType
+    from segmentation.utils.backends import ARTIFACT_SUFFIXES, load_backend
+
+    backend = settings.INFERENCE_BACKEND
+    artifact_path = Path(settings.DEFAULT_MODEL_CHECKPOINT).with_suffix(ARTIFACT_SUFFIXES[backend])
+    version = f'{artifact_path.name}:{artifact_path.stat().st_mtime_ns}'
+
+    model = load_backend(backend, ModelType.UNET, artifact_path)
+
+    if settings.INFERENCE_PRECISION != 'fp32':
+        if backend != 'eager':
+            raise ImproperlyConfigured('INFERENCE_PRECISION can only be changed with the eager INFERENCE_BACKEND.')
+
+        model = apply_precision(model, Model.UNET)
+
+    return LoadedModel(apply_tiling(model, Model.UNET), 'default', version + get_inference_variant())
+
+
+class ModelRegistry:
+    """
+    Keeps the most recently used uploaded models in memory, up to ``settings.MODEL_REGISTRY_MAX_BYTES``.
+
+    Models are loaded the first time they are requested, and the least recently used ones are evicted once the
+    loaded models no longer fit. The default model is never evicted and does not count towards the limit.
+
+    Models are loaded outside the lock of the registry, so that loading one, which may include calibrating int8
+    quantization, does not hold up requests for the models in memory. Concurrent requests for a model that is
+    loading wait for the same load.
+    """
+
+    def __init__(self) -> None:
+        self.default = None
+        self.models = OrderedDict()
+        self.loading = {}
+        self.model_types = []
+        self.lock = threading.Lock()
+
+    def get(self, record: Model = None) -> LoadedModel:
+        """
+        Returns an uploaded model, loading it if it is not in memory.
+
+        Parameters:
+            record (Model, optional): The uploaded model. Returns the default model if not given.
+
+        Returns:
+            LoadedModel: The model with the name and version its outputs are cached under.
+        """
+
+        if record is None:
+            return self.get_default()
+
+        name = get_model_name(record)
+        version = get_model_version(record)
+
+        with self.lock:
+            entry = self.models.get(name)
+
+            if entry is not None and entry[0].version == version:
+                self.models.move_to_end(name)
+                self.evict()
+                self.report()
+                return entry[0]
+
+        def load() -> LoadedModel:
+            model = load_model(record)
+            loaded = LoadedModel(model, name, version)
+            size = get_model_size(model)
+
+            with self.lock:
+                self.models[name] = (loaded, size)
+                self.models.move_to_end(name)
+                self.evict()
+                self.report()
+
+            return loaded
+
+        return self.load_once((name, version), load)
+
+    def get_default(self) -> LoadedModel:
+        """
+        Returns the default model, loading it on first use.
+
+        Returns:
+            LoadedModel: The default model with the name and version its outputs are cached under.
+        """
+
+        if self.default is not None:
+            return self.default
+
+        def load() -> LoadedModel:
+            loaded = load_default_model()
+
+            with self.lock:
+                self.default = loaded
+                self.report()
+
+            return loaded
+
+        return self.load_once(('default', None), load)
+
+    def load_once(self, key: tuple, load: Callable[[], LoadedModel]) -> LoadedModel:
+        """
+        Runs a load outside the lock of the registry, unless the same load is running already, in which case its
+        result is awaited instead.
+
+        Parameters:
+            key (tuple): The name and version of the model.
+            load (Callable[[], LoadedModel]): Loads the model and adds it to the registry.
+
+        Returns:
+            LoadedModel: The loaded model.
+        """
+
+        with self.lock:
+            future = self.loading.get(key)
+            running = future is not None
+
+            if not running:
+                future = self.loading[key] = Future()
+
+        if running:
+            return future.result()
+
+        try:
+            future.set_result(load())
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            with self.lock:
+                self.loading.pop(key, None)
+
+        return future.result()
+
+    def warm_up(self) -> None:
+        """
+        Loads the default model and runs it once, so that the first request does not pay for it.
+        """
+
+        import torch
+
+        model = self.get_default().model
+
+        with torch.no_grad():
+            model(torch.zeros(1, 3, 64, 64))
+
+    def discard(self, record: Model) -> None:
+        """
+        Removes an uploaded model from memory.
+
+        Parameters:
+            record (Model): The uploaded model.
+        """
+
+        with self.lock:
+            self.models.pop(get_model_name(record), None)
+            self.report()
+
+    def evict(self) -> None:
+        total_bytes = sum(size for _, size in self.models.values())
+
+        while len(self.models) > 1 and total_bytes > settings.MODEL_REGISTRY_MAX_BYTES:
+            _, (_, size) = self.models.popitem(last=False)
+            total_bytes -= size
+
+    def report(self) -> None:
+        loaded = [entry[0] for entry in self.models.values()]
+        if self.default is not None:
+            loaded.append(self.default)
+
+        self.model_types = [get_model_type(model.model) for model in loaded]
+
+
+class LoadedModelsCollector(Collector):
+    """
+    Exports the models a registry holds in memory by type, as of the last time they changed, so that scrapes never
+    wait for a model to load.
+
+    Parameters:
+        models (ModelRegistry): The registry.
+    """
+
+    def __init__(self, models: ModelRegistry) -> None:
+        self.models = models
+
+    def collect(self):
+        gauge = GaugeMetricFamily('segmentation_loaded_models', 'Segmentation models held in memory.',
+                                  labels=['model_type'])
+
+        for model_type, count in Counter(self.models.model_types).items():
+            gauge.add_metric([model_type], count)
+
+        yield gauge
+
+
+registry = ModelRegistry()
+REGISTRY.register(LoadedModelsCollector(registry))
@@ -2,8 +2,11 @@ import os
 
 from django.db import models
 from django.contrib.auth.models import User
+from django_cleanup import cleanup
 from django_prometheus.models import ExportModelOperationsMixin
 
+METRIC_FIELDS = ('root_count', 'average_root_diameter', 'total_root_length', 'total_root_area', 'total_root_volume')
+
 
 class Dataset(ExportModelOperationsMixin('dataset'), models.Model):
     name = models.CharField(max_length=200)
@@ -15,16 +18,19 @@ class Dataset(ExportModelOperationsMixin('dataset'), models.Model):
     public = models.BooleanField(default=False)
 
 
+@cleanup.ignore
 class Picture(ExportModelOperationsMixin('picture'), models.Model):
     dataset = models.ForeignKey(
         'processing.Dataset', related_name='pictures', on_delete=models.CASCADE)
     image = models.ImageField(upload_to='images/', editable=False)
+    name = models.CharField(max_length=255, blank=True, default='', editable=False)
+    content_hash = models.CharField(max_length=64, blank=True, default='', editable=False, db_index=True)
     created = models.DateTimeField(auto_now_add=True)
     updated = models.DateTimeField(auto_now=True)
 
     @property
     def filename(self) -> str:
-        return os.path.basename(self.image.name)
+        return self.name or os.path.basename(self.image.name)
 
     @property
     def filename_noext(self) -> str:
@@ -34,6 +40,10 @@ class Picture(ExportModelOperationsMixin('picture'), models.Model):
     def owner(self) -> User:
         return self.dataset.owner
 
+    @property
+    def owner_id(self) -> int:
+        return self.dataset.owner_id
+
     @property
     def public(self) -> bool:
         return self.dataset.public
@@ -44,6 +54,10 @@ class Mask(ExportModelOperationsMixin('mask'), models.Model):
         'processing.Picture', related_name='mask', on_delete=models.CASCADE)
     image = models.ImageField(upload_to='masks/', editable=False)
     threshold = models.IntegerField(default=0)
+    model = models.ForeignKey(
+        'processing.Model', related_name='masks', on_delete=models.SET_NULL, blank=True, null=True)
+    model_version = models.CharField(max_length=200, blank=True, default='', editable=False)
+    contours = models.JSONField(blank=True, null=True, editable=False)
     created = models.DateTimeField(auto_now_add=True)
     updated = models.DateTimeField(auto_now=True)
 
@@ -65,11 +79,63 @@ class Mask(ExportModelOperationsMixin('mask'), models.Model):
     def owner(self) -> User:
         return self.picture.owner
 
+    @property
+    def owner_id(self) -> int:
+        return self.picture.owner_id
+
     @property
     def public(self) -> bool:
         return self.picture.public
 
 
+class PredictionJob(ExportModelOperationsMixin('prediction_job'), models.Model):
+    PENDING = 'pending'
+    RUNNING = 'running'
+    COMPLETED = 'completed'
+    FAILED = 'failed'
+    CANCELLED = 'cancelled'
+
+    statuses = [
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (COMPLETED, 'Completed'),
+        (FAILED, 'Failed'),
+        (CANCELLED, 'Cancelled'),
+    ]
+
+    dataset = models.ForeignKey(
+        'processing.Dataset', related_name='prediction_jobs', on_delete=models.CASCADE)
+    owner = models.ForeignKey('auth.User', related_name='prediction_jobs', on_delete=models.CASCADE)
+    model = models.ForeignKey(
+        'processing.Model', related_name='prediction_jobs', on_delete=models.CASCADE, blank=True, null=True)
+    picture_ids = models.JSONField(default=list)
+    threshold = models.IntegerField(default=0)
+    status = models.CharField(max_length=20, choices=statuses, default=PENDING, db_index=True)
+    total = models.IntegerField(default=0)
+    completed = models.IntegerField(default=0)
+    error = models.TextField(blank=True, null=True)
+    worker = models.CharField(max_length=200, blank=True, null=True)
+    heartbeat = models.DateTimeField(blank=True, null=True)
+    created = models.DateTimeField(auto_now_add=True)
+    updated = models.DateTimeField(auto_now=True)
+
+
+class ProbabilityMap(ExportModelOperationsMixin('probability_map'), models.Model):
+    picture = models.ForeignKey(
+        'processing.Picture', related_name='probability_maps', on_delete=models.CASCADE)
+    model_name = models.CharField(max_length=200)
+    model_version = models.CharField(max_length=200)
+    image = models.ImageField(upload_to='probabilities/', editable=False)
+    size = models.PositiveBigIntegerField(default=0)
+    created = models.DateTimeField(auto_now_add=True)
+    accessed = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['picture', 'model_name'], name='unique_probability_map'),
+        ]
+
+
 class Model(ExportModelOperationsMixin('model'), models.Model):
     UNET = 'unet'
     RESNET18 = 'resnet18'
@@ -6,7 +6,7 @@ from django.views import View
 
 class IsOwnerOrReadOnly(permissions.BasePermission):
     def has_object_permission(self, request: HttpRequest, view: View, obj: Model) -> bool:
-        if obj.owner == request.user:
+        if obj.owner_id == request.user.id:
             return True
         elif obj.public and request.method in permissions.SAFE_METHODS:
             return True
@@ -0,0 +1,182 @@
+import contextvars
+import io
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db.models import F
+
+from processing.exports import find_contours
+from processing.model_registry import registry
+from processing.models import METRIC_FIELDS, Picture, Mask, Model
+from processing.probability_cache import get_probability_maps
+import segmentation
+from segmentation.utils.instrumentation import get_model_type, get_size_bucket, time_stage, use_model_type
+
+
+def build_mask(picture: Picture, probability_map: np.ndarray, area_threshold: int, model: Model = None,
+               model_version: str = '') -> Mask:
+    """
+    Thresholds a probability map and calculates its metrics into an unsaved mask, whose image is stored already.
+
+    Parameters:
+        picture (Picture): The picture the probability map belongs to.
+        probability_map (np.ndarray): The quantized probability map of the picture.
+        area_threshold (int): The threshold for filtering small regions in the mask.
+        model (Model, optional): The uploaded model the probability map was predicted with, if any.
+        model_version (str, optional): The version of the model the probability map was predicted with.
+
+    Returns:
+        Mask: The unsaved mask.
+    """
+
+    mask = segmentation.threshold_probabilities(probability_map, area_threshold)
+
+    mask_arr = np.array(mask) // 255
+    metrics = segmentation.calculate_metrics(mask_arr, 0.2581)
+
+    size = get_size_bucket(*mask_arr.shape[:2])
+
+    with time_stage('encode', size):
+        mask_byte_arr = io.BytesIO()
+        mask.save(mask_byte_arr, format='PNG')
+
+    mask = Mask(picture=picture, threshold=area_threshold, model=model, model_version=model_version,
+                contours=find_contours(mask_arr), **metrics)
+
+    with time_stage('store', size):
+        mask.image.save(f'{picture.filename_noext}_mask.png', File(mask_byte_arr), save=False)
+
+    return mask
+
+
+def delete_mask_images(masks: list[Mask]) -> None:
+    """
+    Deletes the stored images of unsaved masks that will not be saved, so that they are not left orphaned.
+
+    Parameters:
+        masks (list[Mask]): The masks. Copies whose image is not stored yet are skipped.
+    """
+
+    for mask in masks:
+        if mask.image and mask.image._committed:
+            default_storage.delete(mask.image.name)
+
+
+def copy_mask(mask: Mask, picture: Picture) -> Mask:
+    """
+    Copies a mask into an unsaved mask of another picture with the same content.
+
+    Parameters:
+        mask (Mask): The mask to copy.
+        picture (Picture): The picture of the copy.
+
+    Returns:
+        Mask: The unsaved copy.
+    """
+
+    with mask.image.open('rb') as f:
+        image = File(io.BytesIO(f.read()), name=f'{picture.filename_noext}_mask.png')
+
+    metrics = {field: getattr(mask, field) for field in METRIC_FIELDS}
+
+    return Mask(picture=picture, image=image, threshold=mask.threshold, model=mask.model,
+                model_version=mask.model_version, contours=mask.contours, **metrics)
+
+
+def find_mask_copies(pictures: list[Picture], area_threshold: int, model: Model, model_version: str) -> dict:
+    """
+    Copies the masks that pictures with the same content already have for a model, its version and a threshold.
+
+    Parameters:
+        pictures (list[Picture]): The pictures to segment.
+        area_threshold (int): The threshold for filtering small regions in the masks.
+        model (Model): The uploaded model to predict with, or None for the default model.
+        model_version (str): The current version of the model.
+
+    Returns:
+        dict: The unsaved copies, by picture id.
+    """
+
+    hashes = {picture.content_hash for picture in pictures if picture.content_hash}
+    if not hashes:
+        return {}
+
+    sources = {}
+    for mask in Mask.objects.filter(picture__content_hash__in=hashes, threshold=area_threshold, model=model,
+                                    model_version=model_version).annotate(content_hash=F('picture__content_hash')):
+        sources.setdefault(mask.content_hash, mask)
+
+    return {picture.id: copy_mask(sources[picture.content_hash], picture)
+            for picture in pictures if picture.content_hash in sources}
+
+
+def predict_masks(pictures: list[Picture], area_threshold: int, model: Model = None, batch_size: int = None,
+                  workers: int = None, on_progress: Callable[[], None] = None) -> list[Mask]:
+    """
+    Predicts unsaved masks for many pictures with batched inference.
+
+    Pictures with the same content as a picture that already has a mask for the model, its version and the threshold
+    get a copy of that mask. The others are predicted: same-sized pictures go through the model together, and each
+    batch is thresholded, measured, encoded and stored on a thread pool while the model runs on the next one. The
+    database is only accessed from the calling thread.
+
+    Parameters:
+        pictures (list[Picture]): The pictures to segment.
+        area_threshold (int): The threshold for filtering small regions in the masks.
+        model (Model, optional): The uploaded model to predict with. Uses the default model if not given.
+        batch_size (int, optional): The largest number of pictures in a forward pass.
+            Defaults to ``settings.PREDICTION_BATCH_SIZE``.
+        workers (int, optional): The number of post-processing threads. Defaults to ``settings.PREDICTION_WORKERS``.
+        on_progress (Callable[[], None], optional): Called from the calling thread whenever a picture has gone
+            through the model and whenever its mask is done. Errors it raises stop the prediction.
+
+    Raises:
+        Exception: Any error of the prediction or of ``on_progress``, once the images of the masks predicted so far
+            are deleted.
+
+    Returns:
+        list[Mask]: The unsaved masks, in the order of ``pictures``.
+    """
+
+    if workers is None:
+        workers = settings.PREDICTION_WORKERS
+
+    network, model_name, model_version = registry.get(model)
+
+    copies = find_mask_copies(pictures, area_threshold, model, model_version)
+    remaining = [picture for picture in pictures if picture.id not in copies]
+
+    def report_progress() -> None:
+        if on_progress is not None:
+            on_progress()
+
+    with use_model_type(get_model_type(network)), ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {}
+        try:
+            for picture, probability_map in get_probability_maps(remaining, network, model_name, model_version,
+                                                                 batch_size):
+                futures[picture.id] = executor.submit(contextvars.copy_context().run, build_mask, picture,
+                                                      probability_map, area_threshold, model, model_version)
+                report_progress()
+
+            masks = []
+            for picture in pictures:
+                if picture.id in copies:
+                    masks.append(copies[picture.id])
+                else:
+                    masks.append(futures[picture.id].result())
+                    report_progress()
+        except Exception:
+            for future in futures.values():
+                future.cancel()
+
+            delete_mask_images([future.result() for future in futures.values()
+                                if not future.cancelled() and future.exception() is None])
+            raise
+
+        return masks
@@ -0,0 +1,177 @@
+import io
+from typing import Iterator, TYPE_CHECKING
+
+import numpy as np
+from PIL import Image as PILImage
+
+from django.conf import settings
+from django.core.files import File
+from django.db.models import F, Q, Sum
+from django.utils import timezone
+
+import segmentation
+from processing.models import Picture, ProbabilityMap
+from segmentation.utils.instrumentation import get_size_bucket, time_stage
+
+if TYPE_CHECKING:
+    from torch import nn
+
+
+def get_probability_maps(pictures: list[Picture], model: 'nn.Module', model_name: str, model_version: str,
+                         batch_size: int = None) -> Iterator[tuple[Picture, np.ndarray]]:
+    """
+    Returns the quantized probability maps of pictures, running the model only on the ones that are not cached.
+
+    Pictures with the same content share their cache entries, and the model runs once for all the pictures with the
+    same content. Cached maps are yielded first. The rest are predicted in batches of same-sized pictures and cached
+    as they are yielded.
+
+    Parameters:
+        pictures (list[Picture]): The pictures to segment.
+        model (nn.Module): The model to run on cache misses.
+        model_name (str): The name the model's entries are cached under.
+        model_version (str): The version of the model. Entries of any other version of the model are stale.
+        batch_size (int, optional): The largest number of pictures in a forward pass.
+            Defaults to ``settings.PREDICTION_BATCH_SIZE``.
+
+    Yields:
+        tuple[Picture, np.ndarray]: A picture and its quantized probability map.
+    """
+
+    if batch_size is None:
+        batch_size = settings.PREDICTION_BATCH_SIZE
+
+    hashes = {picture.content_hash for picture in pictures if picture.content_hash}
+    entries = list(ProbabilityMap.objects.filter(
+        Q(picture__in=pictures) | Q(picture__content_hash__in=hashes), model_name=model_name,
+        model_version=model_version).annotate(content_hash=F('picture__content_hash')))
+
+    by_picture = {}
+    by_hash = {}
+    for entry in entries:
+        by_picture[entry.picture_id] = entry
+        if entry.content_hash:
+            by_hash[entry.content_hash] = entry
+
+    ProbabilityMap.objects.filter(id__in=[entry.id for entry in entries]).update(accessed=timezone.now())
+
+    misses = []
+    duplicates = {}
+    for picture in pictures:
+        entry = by_picture.get(picture.id) or by_hash.get(picture.content_hash)
+
+        if entry is not None:
+            with entry.image.open('rb') as f:
+                yield picture, np.array(PILImage.open(f))
+        elif picture.content_hash and picture.content_hash in duplicates:
+            duplicates[picture.content_hash].append(picture)
+        else:
+            misses.append(picture)
+            duplicates[picture.content_hash] = []
+
+    if not misses:
+        return
+
+    for index, probability_map in segmentation.predict_probabilities_batched(
+            model, [picture.image for picture in misses], batch_size):
+        store_probability_map(misses[index], probability_map, model_name, model_version)
+        yield misses[index], probability_map
+
+        if misses[index].content_hash:
+            for duplicate in duplicates[misses[index].content_hash]:
+                yield duplicate, probability_map
+
+
+def get_probability_map(picture: Picture, model: 'nn.Module', model_name: str, model_version: str) -> np.ndarray:
+    """
+    Returns the quantized probability map of a picture, running the model only if it is not cached.
+
+    Parameters:
+        picture (Picture): The picture to segment.
+        model (nn.Module): The model to run on a cache miss.
+        model_name (str): The name the model's entries are cached under.
+        model_version (str): The version of the model. Entries of any other version of the model are stale.
+
+    Returns:
+        np.ndarray: The quantized probability map.
+    """
+
+    _, probability_map = next(get_probability_maps([picture], model, model_name, model_version))
+
+    return probability_map
+
+
+def store_probability_map(picture: Picture, probability_map: np.ndarray, model_name: str,
+                          model_version: str) -> ProbabilityMap:
+    """
+    Caches the probability map of a picture, dropping stale versions of the model and evicting old entries.
+
+    Parameters:
+        picture (Picture): The picture the probability map belongs to.
+        probability_map (np.ndarray): The quantized probability map.
+        model_name (str): The name the model's entries are cached under.
+        model_version (str): The version of the model.
+
+    Returns:
+        ProbabilityMap: The cache entry.
+    """
+
+    invalidate_probability_maps(model_name, model_version)
+
+    with time_stage('cache_encode', get_size_bucket(*probability_map.shape[:2])):
+        image_bytes = io.BytesIO()
+        PILImage.fromarray(probability_map).save(image_bytes, format='PNG')
+
+    entry, _ = ProbabilityMap.objects.update_or_create(
+        picture=picture, model_name=model_name,
+        defaults={
+            'model_version': model_version,
+            'image': File(image_bytes, name=f'{picture.filename_noext}_probabilities.png'),
+            'size': image_bytes.getbuffer().nbytes,
+        })
+
+    evict_probability_maps()
+
+    return entry
+
+
+def invalidate_probability_maps(model_name: str, model_version: str = None) -> None:
+    """
+    Deletes the cached probability maps of a model that were not produced by the given version of it.
+
+    Parameters:
+        model_name (str): The name the model's entries are cached under.
+        model_version (str, optional): The current version of the model. Deletes every entry if not given.
+    """
+
+    entries = ProbabilityMap.objects.filter(model_name=model_name)
+
+    if model_version is not None:
+        entries = entries.exclude(model_version=model_version)
+
+    entries.delete()
+
+
+def evict_probability_maps(max_bytes: int = None) -> None:
+    """
+    Deletes the least recently used probability maps until the cache fits in its size limit.
+
+    Parameters:
+        max_bytes (int, optional): The size limit of the cache. Defaults to ``settings.PROBABILITY_CACHE_MAX_BYTES``.
+    """
+
+    if max_bytes is None:
+        max_bytes = settings.PROBABILITY_CACHE_MAX_BYTES
+
+    total_bytes = ProbabilityMap.objects.aggregate(total=Sum('size'))['total'] or 0
+
+    evicted = []
+    for entry in ProbabilityMap.objects.order_by('accessed').only('id', 'size').iterator():
+        if total_bytes <= max_bytes:
+            break
+
+        evicted.append(entry.id)
+        total_bytes -= entry.size
+
+    if evicted:
+        ProbabilityMap.objects.filter(id__in=evicted).delete()
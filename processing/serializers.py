@@ -1,6 +1,24 @@
 from rest_framework import serializers
-from rest_framework.serializers import ImageField, FloatField, IntegerField, PrimaryKeyRelatedField, FileField, CharField
-from processing.models import Dataset, Picture, Mask, Model
+from rest_framework.serializers import (ImageField, FloatField, IntegerField, PrimaryKeyRelatedField, FileField,
+                                        CharField, ChoiceField, ListField, BooleanField, ValidationError)
+from django.core.files.uploadedfile import UploadedFile
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.query import QuerySet
+
+from processing.analytics import GROUPINGS
+from processing.models import Dataset, Picture, Mask, Model, PredictionJob
+from processing.uploads import store_image
+
+
+class VisibleModelField(PrimaryKeyRelatedField):
+    def get_queryset(self) -> QuerySet[Model]:
+        user = self.context['request'].user
+
+        if user.is_anonymous:
+            return Model.objects.filter(public=True)
+
+        return Model.objects.filter(Q(owner=user) | Q(public=True))
 
 
 class DatasetSerializer(serializers.ModelSerializer):
@@ -18,13 +36,26 @@ class PictureSerializer(serializers.ModelSerializer):
     class Meta:
         model = Picture
         fields = '__all__'
-        read_only_fields = ['created', 'updated', 'dataset']
+        read_only_fields = ['created', 'updated', 'dataset', 'content_hash']
+
+    def create(self, validated_data) -> Picture:
+        image = validated_data.pop('image')
+
+        picture = Picture(**validated_data)
+
+        with transaction.atomic():
+            store_image(picture, image)
+            picture.save()
+
+        return picture
 
 
 class MaskSerializer(serializers.ModelSerializer):
+    model = VisibleModelField(required=False, allow_null=True)
+
     class Meta:
         model = Mask
-        fields = '__all__'
+        exclude = ['contours']
         read_only_fields = ['created', 'updated', 'image', 'mask', 'picture', 'root_count',
                             'average_root_diameter', 'total_root_length', 'total_root_area', 'total_root_volume']
         write_only_fields = ['threshold']
@@ -46,7 +77,8 @@ class LabelMeSerializer(serializers.ModelSerializer):
         }
 
     def create(self, validated_data) -> Mask:
-        return Mask.objects.create(image=validated_data['image'], picture=validated_data['picture'], threshold=0)
+        return Mask.objects.create(image=validated_data['image'], picture=validated_data['picture'], threshold=0,
+                                   contours=validated_data.get('contours'))
 
 
 class ModelSerializer(serializers.ModelSerializer):
@@ -61,6 +93,55 @@ class ModelSerializer(serializers.ModelSerializer):
             'model_weights': {'required': True},
         }
 
+    def validate_model_weights(self, value: UploadedFile) -> UploadedFile:
+        from segmentation.utils.backends import load_state_dict
+
+        try:
+            load_state_dict(value)
+        except ValueError as e:
+            raise ValidationError(str(e))
+        finally:
+            value.seek(0)
+
+        return value
+
+
+class PredictionJobSerializer(serializers.ModelSerializer):
+    model = VisibleModelField(required=False, allow_null=True)
+
+    class Meta:
+        model = PredictionJob
+        fields = '__all__'
+        read_only_fields = ['created', 'updated', 'dataset', 'owner', 'picture_ids', 'status', 'total', 'completed',
+                            'error', 'worker', 'heartbeat']
+        extra_kwargs = {
+            'threshold': {'required': False, 'default': 0},
+        }
+
+
+class BulkUploadSerializer(serializers.Serializer):
+    images = ListField(child=FileField(), allow_empty=False)
+    predict = BooleanField(required=False, default=False)
+    threshold = IntegerField(required=False, default=0)
+    model = VisibleModelField(required=False, allow_null=True, default=None)
+
+
+class DatasetAnalyticsSerializer(serializers.Serializer):
+    group_by = ChoiceField(choices=list(GROUPINGS), required=False)
+    percentiles = CharField(required=False, default='5,25,50,75,95')
+    bins = IntegerField(required=False, default=10, min_value=1, max_value=100)
+
+    def validate_percentiles(self, value: str) -> list[float]:
+        try:
+            percentiles = [float(percentile) for percentile in value.split(',')]
+        except ValueError:
+            raise ValidationError('Percentiles must be comma-separated numbers.')
+
+        if not 0 < len(percentiles) <= 20 or not all(0 <= percentile <= 100 for percentile in percentiles):
+            raise ValidationError('Between 1 and 20 percentiles from 0 to 100 are allowed.')
+
+        return percentiles
+
 
 class AnalysisSerializer(serializers.Serializer):
     image = ImageField(required=False)
@@ -0,0 +1,26 @@
+from django.db import transaction
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from processing.models import Picture
+
+
+@receiver(post_delete, sender=Picture)
+def delete_picture_image(sender: type, instance: Picture, **kwargs) -> None:
+    """
+    Deletes the stored image of a deleted picture once the deletion is committed, unless another picture with the
+    same content still shares it. Uploads reusing the image lock the picture until they are inserted, see
+    ``store_image``, so the deletion only commits once they share it.
+    """
+
+    name = instance.image.name
+    if not name:
+        return
+
+    def delete() -> None:
+        if instance.content_hash and Picture.objects.filter(content_hash=instance.content_hash, image=name).exists():
+            return
+
+        instance.image.storage.delete(name)
+
+    transaction.on_commit(delete)
@@ -1,21 +1,49 @@
 import os
 import io
 import shutil
+import subprocess
+import sys
+import threading
 import json
+import tarfile
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
 
 from rest_framework.test import APIRequestFactory, force_authenticate, APITestCase
 from rest_framework import reverse
+from rest_framework.response import Response
 from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
 from django.core.files import File
-from django.test import override_settings
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.db.models import QuerySet
+from django.http import FileResponse, HttpResponse
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.utils.http import urlencode
 
 from PIL import Image as PILImage
+import numpy as np
 import tempfile
+import torch
+from unittest import mock
 from urllib.parse import urlparse
 
-from processing.models import Dataset, Picture, Mask, Model
-from processing.views import DatasetViewSet, PictureViewSet, MaskViewSet, ModelViewSet
+from processing.exports import stream_dataset_archive
+from processing.jobs import claim_job, run_job
+from processing.model_registry import (ModelRegistry, registry, get_model_size, get_model_version, load_model,
+                                       load_default_model)
+from processing.models import Dataset, Picture, Mask, Model, ProbabilityMap, PredictionJob
+from processing.probability_cache import get_probability_map, get_probability_maps, store_probability_map
+from processing.prediction import predict_masks
+from processing.tiles import get_level_size, get_pyramid_path
+from processing.uploads import hash_file, store_image
+from processing.views import DatasetViewSet, PictureViewSet, MaskViewSet, ModelViewSet, PredictionJobViewSet
+import segmentation
 
 MEDIA_ROOT = tempfile.mkdtemp()
 
@@ -91,6 +119,198 @@ class TestDatasetViewSet(APITestCase):
             Dataset.objects.get(id=self.dataset.id)
 
 
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class TestDatasetExport(APITestCase):
+    def setUp(self) -> None:
+        self.user = User.objects.create_user(username='test', password='test')
+        self.dataset = Dataset.objects.create(
+            name='Test dataset', description='test', owner=self.user)
+
+        image = PILImage.new('RGB', (100, 100), color='red')
+        image_bytes = io.BytesIO()
+        image.save(image_bytes, format='PNG')
+
+        mask = np.zeros((100, 100), dtype=np.uint8)
+        mask[20:60, 30:40] = 255
+        mask_bytes = io.BytesIO()
+        PILImage.fromarray(mask).save(mask_bytes, format='PNG')
+
+        self.picture = Picture.objects.create(
+            dataset=self.dataset, image=File(image_bytes, name='test.png'))
+        self.mask = Mask.objects.create(
+            picture=self.picture, image=File(mask_bytes, name='test_mask.png'), root_count=1, total_root_length=40)
+        self.picture_no_mask = Picture.objects.create(
+            dataset=self.dataset, image=File(image_bytes, name='test.png'))
+
+        self.client = APIRequestFactory()
+
+    def export(self, user: User = None) -> HttpResponse:
+        request = self.client.get(f'datasets/{self.dataset.id}/export/')
+        force_authenticate(request, user=user)
+
+        view = DatasetViewSet.as_view({'get': 'export'})
+        return view(request, pk=self.dataset.id)
+
+    def test_export_endpoint(self) -> None:
+        response = self.export(self.user)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename=test-dataset.zip')
+
+        archive = zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+        filename = f'{self.picture.id}_{self.picture.filename}'
+        self.assertEqual(sorted(archive.namelist()), sorted([
+            f'images/{filename}', f'images/{self.picture_no_mask.id}_{self.picture_no_mask.filename}',
+            f'images/{self.picture.id}_{self.picture.filename_noext}.json', f'masks/{self.mask.filename}',
+            'metrics.csv']))
+
+        with self.picture.image.open('rb') as f:
+            self.assertEqual(archive.read(f'images/{filename}'), f.read())
+
+        labelme = json.loads(archive.read(f'images/{self.picture.id}_{self.picture.filename_noext}.json'))
+        self.assertEqual(labelme['imagePath'], filename)
+        self.assertEqual(len(labelme['shapes']), 1)
+
+        self.mask.refresh_from_db()
+        self.assertEqual(len(self.mask.contours['polygons']), 1)
+
+        rows = archive.read('metrics.csv').decode('utf-8').splitlines()
+        self.assertEqual(rows[0].split(',')[:3], ['image', 'root_count', 'average_root_diameter'])
+        self.assertEqual(rows[1].split(',')[:2], [filename, '1'])
+        self.assertEqual(len(rows), 2)
+
+    def test_export_same_uploaded_names(self) -> None:
+        pictures = [self.picture, self.picture_no_mask]
+        Picture.objects.filter(id__in=[picture.id for picture in pictures]).update(name='img.png')
+        with self.mask.image.open('rb') as f:
+            Mask.objects.create(picture=self.picture_no_mask, image=File(io.BytesIO(f.read()), name='img_mask.png'))
+
+        archive = zipfile.ZipFile(io.BytesIO(b''.join(stream_dataset_archive(self.dataset))))
+        names = archive.namelist()
+
+        self.assertEqual(len(names), len(set(names)))
+        for picture in pictures:
+            self.assertIn(f'images/{picture.id}_img.png', names)
+            self.assertIn(f'images/{picture.id}_img.json', names)
+
+        rows = archive.read('metrics.csv').decode('utf-8').splitlines()
+        self.assertEqual([row.split(',')[0] for row in rows[1:]], [f'{picture.id}_img.png' for picture in pictures])
+
+    def test_export_is_private(self) -> None:
+        other = User.objects.create_user(username='other', password='other')
+
+        self.assertEqual(self.export(other).status_code, 404)
+
+    def test_export_is_conditional_and_memoized(self) -> None:
+        response = self.export(self.user)
+        content = b''.join(response.streaming_content)
+        etag = response['ETag']
+
+        self.assertIn('private', response['Cache-Control'])
+
+        request = self.client.get(f'datasets/{self.dataset.id}/export/', HTTP_IF_NONE_MATCH=etag)
+        force_authenticate(request, user=self.user)
+        response = DatasetViewSet.as_view({'get': 'export'})(request, pk=self.dataset.id)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+        with mock.patch('processing.views.api.stream_dataset_archive') as stream:
+            response = self.export(self.user)
+            stream.assert_not_called()
+
+        self.assertIsInstance(response, FileResponse)
+        self.assertEqual(b''.join(response.streaming_content), content)
+
+        self.mask.total_root_length = 50
+        self.mask.save()
+
+        response = self.export(self.user)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertNotIsInstance(response, FileResponse)
+
+        b''.join(response.streaming_content)
+        _, files = default_storage.listdir(f'exports/{self.dataset.id}/archive')
+        self.assertEqual(len(files), 1)
+
+
+class TestDatasetAnalytics(APITestCase):
+    def setUp(self) -> None:
+        cache.clear()
+
+        self.user = User.objects.create_user(username='test', password='test')
+        self.dataset = Dataset.objects.create(
+            name='test', description='test', owner=self.user)
+
+        rng = np.random.default_rng(0)
+        self.lengths = rng.uniform(0, 100, 25)
+        self.counts = rng.integers(0, 20, 25)
+
+        for index, (length, count) in enumerate(zip(self.lengths, self.counts)):
+            picture = Picture.objects.create(dataset=self.dataset, image=f'images/{index}.png')
+            Picture.objects.filter(pk=picture.pk).update(created=datetime(2024, 1 + index % 2, 1, tzinfo=timezone.utc))
+            Mask.objects.create(picture=picture, image=f'masks/{index}.png', total_root_length=length,
+                                root_count=count)
+
+        Picture.objects.create(dataset=self.dataset, image='images/no_mask.png')
+        self.client = APIRequestFactory()
+
+    def analytics(self, **params) -> Response:
+        request = self.client.get(f'datasets/{self.dataset.id}/analytics/', params)
+        force_authenticate(request, user=self.user)
+
+        view = DatasetViewSet.as_view({'get': 'analytics'})
+        return view(request, pk=self.dataset.id)
+
+    def test_analytics_endpoint(self) -> None:
+        response = self.analytics(percentiles='0,10,50,92.5,100', bins=4)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 25)
+        self.assertEqual(len(response.data['groups']), 1)
+
+        fields = response.data['groups'][0]['fields']
+        for field, values in (('total_root_length', self.lengths), ('root_count', self.counts)):
+            self.assertAlmostEqual(fields[field]['sum'], values.sum())
+            self.assertAlmostEqual(fields[field]['mean'], values.mean())
+
+            for percentile, value in fields[field]['percentiles'].items():
+                self.assertAlmostEqual(value, np.percentile(values, float(percentile)))
+
+            counts, edges = np.histogram(values, bins=4)
+            self.assertEqual(fields[field]['histogram']['counts'], counts.tolist())
+            np.testing.assert_allclose(fields[field]['histogram']['edges'], edges)
+
+    def test_group_by(self) -> None:
+        response = self.analytics(group_by='month')
+        self.assertEqual(response.status_code, 200)
+
+        groups = response.data['groups']
+        self.assertEqual([group['count'] for group in groups], [13, 12])
+        self.assertAlmostEqual(groups[1]['fields']['total_root_length']['percentiles']['50'],
+                               np.percentile(self.lengths[1::2], 50))
+        self.assertEqual(sum(groups[1]['fields']['total_root_length']['histogram']['counts']), 12)
+
+    def test_cached_until_masks_change(self) -> None:
+        with self.assertNumQueries(14):
+            self.analytics()
+
+        with self.assertNumQueries(3):
+            self.assertEqual(self.analytics().data['count'], 25)
+
+        mask = Mask.objects.filter(picture__dataset=self.dataset).first()
+        mask.total_root_length = 1000
+        mask.save()
+        self.assertEqual(self.analytics().data['groups'][0]['fields']['total_root_length']['max'], 1000)
+
+        mask.delete()
+        self.assertEqual(self.analytics().data['count'], 24)
+
+    def test_invalid_parameters(self) -> None:
+        self.assertEqual(self.analytics(group_by='hour').status_code, 400)
+        self.assertEqual(self.analytics(percentiles='50,101').status_code, 400)
+        self.assertEqual(self.analytics(percentiles='median').status_code, 400)
+
+
 @override_settings(MEDIA_ROOT=MEDIA_ROOT)
 class TestPictureViewSet(APITestCase):
     def setUp(self) -> None:
@@ -191,6 +411,280 @@ class TestPictureViewSet(APITestCase):
         self.assertEqual(response.status_code, 201)
         self.assertEqual(len(response.data), Mask.objects.filter(
             picture__dataset=self.dataset).count())
+        self.assertEqual(Mask.objects.get(picture=self.picture).contours['height'], 100)
+
+    def test_bulk_predict_mixed_sizes(self) -> None:
+        pictures = [self.picture]
+        for size in [(120, 80), (100, 100), (120, 80)]:
+            image_bytes = io.BytesIO()
+            PILImage.new('RGB', size, color='red').save(image_bytes, format='PNG')
+            pictures.append(Picture.objects.create(dataset=self.dataset, image=File(image_bytes, name='test.png')))
+
+        ids = ','.join(str(picture.id) for picture in pictures)
+        request = self.client.post('images/bulk_predict/', data={'threshold': 15},
+                                   QUERY_STRING=urlencode({'ids': ids}))
+        force_authenticate(request, user=self.user)
+
+        view = PictureViewSet.as_view({'post': 'bulk_predict'})
+        with self.settings(PREDICTION_BATCH_SIZE=2):
+            response = view(request, dataset_pk=self.dataset.id)
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(sorted(mask['picture'] for mask in response.data), sorted(picture.id for picture in pictures))
+
+    def upload(self, data: dict) -> Response:
+        request = self.client.post('images/upload/', data, format='multipart')
+        force_authenticate(request, user=self.user)
+
+        view = PictureViewSet.as_view({'post': 'bulk_upload'})
+        return view(request, dataset_pk=self.dataset.id)
+
+    def png(self, name: str, size: tuple[int, int] = (50, 40)) -> SimpleUploadedFile:
+        image_bytes = io.BytesIO()
+        PILImage.new('RGB', size, color='red').save(image_bytes, format='PNG')
+
+        return SimpleUploadedFile(name, image_bytes.getvalue(), content_type='image/png')
+
+    def test_bulk_upload_endpoint(self) -> None:
+        with self.settings(BULK_UPLOAD_BATCH_SIZE=2):
+            response = self.upload({'images': [self.png(f'{i}.png') for i in range(5)]})
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.data['pictures']), 5)
+        self.assertEqual(response.data['errors'], [])
+        self.assertIsNone(response.data['job'])
+        self.assertEqual(Picture.objects.filter(dataset=self.dataset).count(), 6)
+
+        picture = Picture.objects.get(pk=response.data['pictures'][0]['id'])
+        self.assertEqual(PILImage.open(picture.image).size, (50, 40))
+
+    def test_bulk_upload_archives(self) -> None:
+        zip_bytes = io.BytesIO()
+        with zipfile.ZipFile(zip_bytes, 'w') as zf:
+            zf.writestr('session/a.png', self.png('a.png').read())
+            zf.writestr('session/notes.txt', 'not an image')
+            zf.writestr('__MACOSX/session/._a.png', 'metadata')
+
+        tar_bytes = io.BytesIO()
+        with tarfile.open(fileobj=tar_bytes, mode='w:gz') as tf:
+            for name in ['b.png', 'c.png']:
+                content = self.png(name).read()
+                info = tarfile.TarInfo(f'session/{name}')
+                info.size = len(content)
+                tf.addfile(info, io.BytesIO(content))
+
+        response = self.upload({'images': [
+            SimpleUploadedFile('session.zip', zip_bytes.getvalue()),
+            SimpleUploadedFile('session.tar.gz', tar_bytes.getvalue()),
+            SimpleUploadedFile('broken.png', b'not an image'),
+        ]})
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(sorted(picture['name'] for picture in response.data['pictures']), ['a.png', 'b.png', 'c.png'])
+        self.assertEqual([error['name'] for error in response.data['errors']], ['notes.txt', 'broken.png'])
+
+    def test_bulk_upload_queues_prediction(self) -> None:
+        response = self.upload({'images': [self.png('a.png'), self.png('b.png')], 'predict': True, 'threshold': 15})
+
+        self.assertEqual(response.status_code, 201)
+
+        job = PredictionJob.objects.get(pk=response.data['job']['id'])
+        self.assertEqual(job.status, PredictionJob.PENDING)
+        self.assertEqual(job.threshold, 15)
+        self.assertEqual(job.picture_ids, [picture['id'] for picture in response.data['pictures']])
+
+    def test_bulk_upload_rejects_invalid(self) -> None:
+        response = self.upload({'images': [SimpleUploadedFile('broken.png', b'not an image')]})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(len(response.data['errors']), 1)
+
+        with self.settings(BULK_UPLOAD_MAX_FILES=1):
+            response = self.upload({'images': [self.png('a.png'), self.png('b.png'), self.png('c.png')]})
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.data['pictures']), 1)
+        self.assertEqual([error['name'] for error in response.data['errors']], ['b.png', 'c.png'])
+
+    def test_retrieve_is_conditional(self) -> None:
+        view = PictureViewSet.as_view({'get': 'retrieve'})
+
+        request = self.client.get(f'images/{self.picture.id}/')
+        force_authenticate(request, user=self.user)
+        response = view(request, dataset_pk=self.dataset.id, pk=self.picture.id)
+        self.assertEqual(response.status_code, 200)
+
+        for headers in [{'HTTP_IF_NONE_MATCH': response['ETag']},
+                        {'HTTP_IF_MODIFIED_SINCE': response['Last-Modified']}]:
+            request = self.client.get(f'images/{self.picture.id}/', **headers)
+            force_authenticate(request, user=self.user)
+            self.assertEqual(view(request, dataset_pk=self.dataset.id, pk=self.picture.id).status_code, 304)
+
+        request = self.client.get(f'images/{self.picture.id}/', HTTP_IF_NONE_MATCH='"stale"')
+        force_authenticate(request, user=self.user)
+        self.assertEqual(view(request, dataset_pk=self.dataset.id, pk=self.picture.id).status_code, 200)
+
+    def test_duplicates_share_storage(self) -> None:
+        other = Dataset.objects.create(name='other', owner=self.user)
+
+        first = self.upload({'images': [self.png('a.png')]}).data['pictures'][0]
+        with self.settings(BULK_UPLOAD_BATCH_SIZE=10):
+            response = self.upload({'images': [self.png('b.png'), self.png('c.png', (30, 30)), self.png('d.png')]})
+
+        pictures = Picture.objects.filter(id__in=[first['id']] + [p['id'] for p in response.data['pictures']])
+        self.assertEqual(len({picture.content_hash for picture in pictures}), 2)
+        self.assertEqual(len({picture.image.name for picture in pictures}), 2)
+        self.assertEqual(sorted(picture.filename for picture in pictures), ['a.png', 'b.png', 'c.png', 'd.png'])
+
+        request = self.client.post('images/', {'image': self.png('e.png')}, format='multipart')
+        force_authenticate(request, user=self.user)
+        response = PictureViewSet.as_view({'post': 'create'})(request, dataset_pk=other.id)
+
+        duplicate = Picture.objects.get(pk=response.data['id'])
+        original = Picture.objects.get(pk=first['id'])
+        self.assertEqual(duplicate.image.name, original.image.name)
+        self.assertEqual(duplicate.filename, 'e.png')
+
+        path = original.image.path
+        shared = Picture.objects.filter(image=original.image.name)
+        for picture in shared[1:]:
+            with self.captureOnCommitCallbacks(execute=True):
+                picture.delete()
+            self.assertTrue(os.path.exists(path))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            shared.delete()
+        self.assertFalse(os.path.exists(path))
+
+    def test_reused_image_is_locked_until_inserted(self) -> None:
+        depth = len(connection.atomic_blocks)
+        select_for_update = QuerySet.select_for_update
+        locked = []
+
+        def lock(queryset: QuerySet, *args, **kwargs) -> QuerySet:
+            # The lock is only released when the transaction inserting the picture ends.
+            locked.append(len(connection.atomic_blocks) > depth)
+            return select_for_update(queryset, *args, **kwargs)
+
+        self.upload({'images': [self.png('a.png')]})
+
+        with mock.patch.object(QuerySet, 'select_for_update', autospec=True, side_effect=lock):
+            self.upload({'images': [self.png('b.png'), self.png('c.png')]})
+
+            request = self.client.post('images/', {'image': self.png('d.png')}, format='multipart')
+            force_authenticate(request, user=self.user)
+            response = PictureViewSet.as_view({'post': 'create'})(request, dataset_pk=self.dataset.id)
+            self.assertEqual(response.status_code, 201)
+
+        self.assertEqual(locked, [True, True])
+
+    def test_duplicates_reuse_predictions(self) -> None:
+        self.picture.content_hash = hash_file(self.picture.image)
+        self.picture.save()
+        original = predict_masks([self.picture], 15)[0]
+        original.save()
+
+        other = Dataset.objects.create(name='other', owner=self.user)
+        duplicate = Picture(dataset=other)
+        with self.picture.image.open('rb') as f:
+            store_image(duplicate, File(f, name='copy.png'))
+        duplicate.save()
+
+        with mock.patch('segmentation.predict_probabilities_batched') as predict:
+            mask = predict_masks([duplicate], 15)[0]
+            predict.assert_not_called()
+
+            self.assertEqual(mask.total_root_length, original.total_root_length)
+            self.assertEqual(mask.contours, original.contours)
+            self.assertEqual(mask.model_version, original.model_version)
+
+            mask = predict_masks([duplicate], 30)[0]
+            predict.assert_not_called()
+            self.assertEqual(mask.threshold, 30)
+
+        with mock.patch('processing.prediction.find_mask_copies', return_value={}), \
+                mock.patch('segmentation.predict_probabilities_batched',
+                           wraps=segmentation.predict_probabilities_batched) as predict:
+            third = Picture(dataset=other)
+            with self.picture.image.open('rb') as f:
+                store_image(third, File(f, name='copy.png'))
+            third.save()
+
+            ProbabilityMap.objects.all().delete()
+            masks = predict_masks([duplicate, third], 15)
+
+            self.assertEqual(len(predict.call_args.args[1]), 1)
+            self.assertEqual([mask.picture for mask in masks], [duplicate, third])
+
+    def get_tile(self, view: type, actions: dict, **kwargs) -> HttpResponse:
+        request = self.client.get(f'/api/datasets/{self.dataset.id}/images/{kwargs["pk"]}/tiles/')
+        force_authenticate(request, user=self.user)
+
+        return view.as_view(actions)(request, **kwargs)
+
+    def test_tiles_endpoint(self) -> None:
+        image_bytes = io.BytesIO()
+        PILImage.new('RGB', (600, 300), color='blue').save(image_bytes, format='PNG')
+        picture = Picture.objects.create(dataset=self.dataset, image=File(image_bytes, name='large.png'))
+
+        response = self.get_tile(PictureViewSet, {'get': 'tiles'}, dataset_pk=self.dataset.id, pk=picture.id)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['Image']['Size'], {'Width': 600, 'Height': 300})
+        self.assertEqual(response.data['Image']['Format'], 'jpg')
+        self.assertEqual(response.data['Image']['Url'],
+                         f'http://testserver/api/datasets/{self.dataset.id}/images/{picture.id}/tiles/')
+
+        response = self.get_tile(PictureViewSet, {'get': 'tile'}, dataset_pk=self.dataset.id, pk=picture.id,
+                                 level='10', column='2', row='1', extension='jpg')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertEqual(PILImage.open(io.BytesIO(b''.join(response.streaming_content))).size, (88, 44))
+
+        response = self.get_tile(PictureViewSet, {'get': 'tile'}, dataset_pk=self.dataset.id, pk=picture.id,
+                                 level='8', column='0', row='0', extension='jpg')
+        self.assertEqual(PILImage.open(io.BytesIO(b''.join(response.streaming_content))).size, (150, 75))
+
+        for level, column, row, extension in [('10', '3', '0', 'jpg'), ('11', '0', '0', 'jpg'),
+                                              ('10', '0', '0', 'png')]:
+            response = self.get_tile(PictureViewSet, {'get': 'tile'}, dataset_pk=self.dataset.id, pk=picture.id,
+                                     level=level, column=column, row=row, extension=extension)
+            self.assertEqual(response.status_code, 404)
+
+    def test_jpeg_levels_are_drafted(self) -> None:
+        image_bytes = io.BytesIO()
+        PILImage.new('RGB', (1001, 777), color='red').save(image_bytes, format='JPEG')
+        picture = Picture.objects.create(dataset=self.dataset, image=File(image_bytes, name='large.jpg'))
+
+        kwargs = {'dataset_pk': self.dataset.id, 'pk': picture.id, 'column': '0', 'row': '0', 'extension': 'jpg'}
+        with mock.patch('PIL.Image.Image.reduce', autospec=True, side_effect=PILImage.Image.reduce) as reduce:
+            response = self.get_tile(PictureViewSet, {'get': 'tile'}, level='6', **kwargs)
+
+        tile = PILImage.open(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(tile.size, get_level_size(1001, 777, 6))
+        self.assertGreater(tile.getpixel((10, 10))[0], 200)
+        self.assertTrue(all(call.args[0].width <= 1001 // 8 + 1 for call in reduce.call_args_list))
+
+    def test_tiles_are_cached(self) -> None:
+        kwargs = {'dataset_pk': self.dataset.id, 'pk': self.picture.id, 'column': '0', 'row': '0', 'extension': 'jpg'}
+        self.get_tile(PictureViewSet, {'get': 'tile'}, level='7', **kwargs)
+
+        pyramid = os.path.join(MEDIA_ROOT, get_pyramid_path(self.picture))
+        self.assertEqual(sorted(os.listdir(pyramid), key=int), [str(level) for level in range(8)])
+
+        with mock.patch('processing.tiles.build_levels') as build_levels:
+            for level in range(8):
+                response = self.get_tile(PictureViewSet, {'get': 'tile'}, level=str(level), **kwargs)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(PILImage.open(io.BytesIO(b''.join(response.streaming_content))).size,
+                                 get_level_size(100, 100, level))
+
+            build_levels.assert_not_called()
+
+        request = self.client.delete(f'images/{self.picture.id}/')
+        force_authenticate(request, user=self.user)
+        PictureViewSet.as_view({'delete': 'destroy'})(request, dataset_pk=self.dataset.id, pk=self.picture.id)
+
+        self.assertFalse(os.path.exists(pyramid))
 
     def test_bulk_destroy_predictions_endpoint(self) -> None:
         request = self.client.delete(
@@ -293,6 +787,25 @@ class TestMaskViewSet(APITestCase):
         self.mask.refresh_from_db()
         self.assertEqual(self.mask.threshold, 5)
 
+    def test_update_keeps_image(self) -> None:
+        previous_path = self.mask.image.path
+
+        request = self.client.patch(f'masks/{self.mask.id}/', {'threshold': 5})
+        force_authenticate(request, user=self.user)
+
+        view = MaskViewSet.as_view({'patch': 'partial_update'})
+        with self.captureOnCommitCallbacks(execute=True):
+            response = view(request, dataset_pk=self.dataset.id, image_pk=self.picture.id, pk=self.mask.id)
+        self.assertEqual(response.status_code, 200)
+
+        self.mask.refresh_from_db()
+        self.assertTrue(self.mask.image.name.startswith('masks/'))
+        with self.mask.image.open('rb') as f:
+            self.assertEqual(PILImage.open(f).size, (100, 100))
+
+        self.assertNotEqual(self.mask.image.path, previous_path)
+        self.assertFalse(os.path.exists(previous_path))
+
     def test_delete_endpoint(self) -> None:
         request = self.client.delete(f'masks/{self.mask.id}/')
         force_authenticate(request, user=self.user)
@@ -305,6 +818,49 @@ class TestMaskViewSet(APITestCase):
         with self.assertRaises(Mask.DoesNotExist):
             Mask.objects.get(id=self.mask.id)
 
+    def test_tiles_endpoint(self) -> None:
+        mask_bytes = io.BytesIO()
+        PILImage.fromarray(np.eye(100, dtype=np.uint8)).save(mask_bytes, format='PNG')
+        self.mask.image = File(mask_bytes, name='test_mask.png')
+        self.mask.save()
+
+        kwargs = {'dataset_pk': self.dataset.id, 'image_pk': self.picture.id, 'pk': self.mask.id}
+
+        request = self.client.get('tiles/')
+        force_authenticate(request, user=self.user)
+        response = MaskViewSet.as_view({'get': 'tiles'})(request, **kwargs)
+        self.assertEqual(response.data['Image']['Format'], 'png')
+
+        request = self.client.get('tiles/7/0_0.png')
+        force_authenticate(request, user=self.user)
+        response = MaskViewSet.as_view({'get': 'tile'})(request, level='7', column='0', row='0', extension='png',
+                                                        **kwargs)
+        self.assertEqual(response.status_code, 200)
+
+        tile = np.array(PILImage.open(io.BytesIO(b''.join(response.streaming_content))))
+        np.testing.assert_array_equal(tile, np.eye(100, dtype=np.uint8) * 255)
+
+    def test_retrieve_is_conditional(self) -> None:
+        view = MaskViewSet.as_view({'get': 'retrieve'})
+        kwargs = {'dataset_pk': self.dataset.id, 'image_pk': self.picture.id, 'pk': self.mask.id}
+
+        request = self.client.get(f'masks/{self.mask.id}/')
+        force_authenticate(request, user=self.user)
+        etag = view(request, **kwargs)['ETag']
+
+        request = self.client.get(f'masks/{self.mask.id}/', HTTP_IF_NONE_MATCH=etag)
+        force_authenticate(request, user=self.user)
+        self.assertEqual(view(request, **kwargs).status_code, 304)
+
+        self.mask.threshold = 20
+        self.mask.save()
+
+        request = self.client.get(f'masks/{self.mask.id}/', HTTP_IF_NONE_MATCH=etag)
+        force_authenticate(request, user=self.user)
+        response = view(request, **kwargs)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
     def test_create_labelme_endpoint(self) -> None:
         json_data = {
             'shapes': []
@@ -338,6 +894,636 @@ class TestMaskViewSet(APITestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response['Content-Type'], 'application/octet-stream')
 
+        archive = zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+        with self.picture.image.open('rb') as f:
+            self.assertEqual(archive.read(self.picture.filename), f.read())
+
+        labelme = json.loads(archive.read('labelme.json'))
+        self.assertEqual((labelme['imageHeight'], labelme['imageWidth']), (100, 100))
+
+        request = self.client.get(f'masks/{self.mask.id}/labelme/', HTTP_IF_NONE_MATCH=response['ETag'])
+        force_authenticate(request, user=self.user)
+        response = view(request, dataset_pk=self.dataset.id, image_pk=self.picture.id, pk=self.mask.id)
+        self.assertEqual(response.status_code, 304)
+
+        with mock.patch('processing.views.api.build_labelme_archive') as build:
+            request = self.client.get(f'masks/{self.mask.id}/labelme/')
+            force_authenticate(request, user=self.user)
+            response = view(request, dataset_pk=self.dataset.id, image_pk=self.picture.id, pk=self.mask.id)
+            build.assert_not_called()
+
+        self.assertEqual(response.status_code, 200)
+
+    def test_export_labelme_uses_cached_contours(self) -> None:
+        self.mask.contours = {'height': 100, 'width': 100, 'polygons': [[[0, 0], [10, 0], [10, 10]]]}
+        self.mask.save()
+
+        request = self.client.get(f'masks/{self.mask.id}/labelme/')
+        force_authenticate(request, user=self.user)
+
+        view = MaskViewSet.as_view({'get': 'export_labelme'})
+        with mock.patch('PIL.Image.open', side_effect=AssertionError('Exports should not decode images')):
+            response = view(request, dataset_pk=self.dataset.id,
+                            image_pk=self.picture.id, pk=self.mask.id)
+
+        labelme = json.loads(zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content))).read('labelme.json'))
+        self.assertEqual(labelme['shapes'][0]['points'], [[0, 0], [10, 0], [10, 10]])
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class TestProbabilityCache(APITestCase):
+    def setUp(self) -> None:
+        self.user = User.objects.create_user(username='test', password='test')
+        self.dataset = Dataset.objects.create(
+            name='test', description='test', owner=self.user)
+
+        image = PILImage.new('RGB', (100, 100), color='red')
+        image_bytes = io.BytesIO()
+        image.save(image_bytes, format='PNG')
+
+        self.picture = Picture.objects.create(
+            dataset=self.dataset, image=File(image_bytes, name='test.png'))
+        self.other_picture = Picture.objects.create(
+            dataset=self.dataset, image=File(image_bytes, name='test.png'))
+        self.client = APIRequestFactory()
+
+    def test_threshold_update_skips_model(self) -> None:
+        request = self.client.post('masks/', {'threshold': 0})
+        force_authenticate(request, user=self.user)
+        view = MaskViewSet.as_view({'post': 'create'})
+        response = view(request, dataset_pk=self.dataset.id, image_pk=self.picture.id)
+        self.assertEqual(response.status_code, 201)
+
+        request = self.client.patch(f'masks/{response.data["id"]}/', {'threshold': 5})
+        force_authenticate(request, user=self.user)
+        view = MaskViewSet.as_view({'patch': 'partial_update'})
+        default = registry.get_default()._replace(model=mock.Mock(side_effect=AssertionError('model was run')))
+        with mock.patch.object(registry, 'default', default):
+            response = view(request, dataset_pk=self.dataset.id, image_pk=self.picture.id, pk=response.data['id'])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['threshold'], 5)
+        self.assertEqual(ProbabilityMap.objects.filter(picture=self.picture).count(), 1)
+
+    def test_round_trip(self) -> None:
+        probability_map = np.arange(100 * 100, dtype=np.uint32).reshape(100, 100).astype(np.uint8)
+        store_probability_map(self.picture, probability_map, 'test', '1')
+
+        model = mock.Mock(side_effect=AssertionError('model was run'))
+        cached = get_probability_map(self.picture, model, 'test', '1')
+
+        np.testing.assert_array_equal(cached, probability_map)
+
+    def test_model_change_invalidates(self) -> None:
+        store_probability_map(self.picture, np.zeros((100, 100), dtype=np.uint8), 'test', '1')
+        store_probability_map(self.other_picture, np.zeros((100, 100), dtype=np.uint8), 'test', '2')
+
+        self.assertEqual(ProbabilityMap.objects.filter(model_version='1').count(), 0)
+        self.assertEqual(ProbabilityMap.objects.filter(model_version='2').count(), 1)
+
+    def test_size_eviction(self) -> None:
+        noise = np.random.default_rng(0).integers(0, 255, (100, 100), dtype=np.uint8)
+        first = store_probability_map(self.picture, noise, 'test', '1')
+
+        with self.settings(PROBABILITY_CACHE_MAX_BYTES=first.size):
+            store_probability_map(self.other_picture, noise, 'test', '1')
+
+        self.assertFalse(ProbabilityMap.objects.filter(picture=self.picture).exists())
+        self.assertTrue(ProbabilityMap.objects.filter(picture=self.other_picture).exists())
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class TestPredictionJobViewSet(APITestCase):
+    def setUp(self) -> None:
+        self.user = User.objects.create_user(username='test', password='test')
+        self.dataset = Dataset.objects.create(
+            name='test', description='test', owner=self.user)
+
+        self.pictures = []
+        for _ in range(3):
+            image_bytes = io.BytesIO()
+            PILImage.new('RGB', (100, 100), color='red').save(image_bytes, format='PNG')
+            self.pictures.append(Picture.objects.create(
+                dataset=self.dataset, image=File(image_bytes, name='test.png')))
+
+        self.client = APIRequestFactory()
+
+    def submit(self) -> PredictionJob:
+        ids = ','.join(str(picture.id) for picture in self.pictures)
+        request = self.client.post('jobs/', data={'threshold': 15}, QUERY_STRING=urlencode({'ids': ids}))
+        force_authenticate(request, user=self.user)
+
+        view = PredictionJobViewSet.as_view({'post': 'create'})
+        response = view(request, dataset_pk=self.dataset.id)
+        self.assertEqual(response.status_code, 201)
+
+        return PredictionJob.objects.get(pk=response.data['id'])
+
+    def test_create_endpoint(self) -> None:
+        job = self.submit()
+
+        self.assertEqual(job.status, PredictionJob.PENDING)
+        self.assertEqual(job.total, 3)
+        self.assertEqual(job.threshold, 15)
+        self.assertEqual(Mask.objects.count(), 0)
+
+    def test_retrieve_endpoint(self) -> None:
+        job = self.submit()
+        run_job(claim_job('test'))
+
+        request = self.client.get(f'jobs/{job.id}/')
+        force_authenticate(request, user=self.user)
+
+        view = PredictionJobViewSet.as_view({'get': 'retrieve'})
+        response = view(request, dataset_pk=self.dataset.id, pk=job.id)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['status'], PredictionJob.COMPLETED)
+        self.assertEqual(response.data['completed'], 3)
+
+    def test_results_endpoint(self) -> None:
+        job = self.submit()
+        run_job(claim_job('test'), chunk_size=2)
+
+        request = self.client.get(f'jobs/{job.id}/results/')
+        force_authenticate(request, user=self.user)
+
+        view = PredictionJobViewSet.as_view({'get': 'results'})
+        response = view(request, dataset_pk=self.dataset.id, pk=job.id)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sorted(mask['picture'] for mask in response.data),
+                         sorted(picture.id for picture in self.pictures))
+
+    def test_cancel_endpoint(self) -> None:
+        job = self.submit()
+
+        request = self.client.post(f'jobs/{job.id}/cancel/')
+        force_authenticate(request, user=self.user)
+
+        view = PredictionJobViewSet.as_view({'post': 'cancel'})
+        response = view(request, dataset_pk=self.dataset.id, pk=job.id)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['status'], PredictionJob.CANCELLED)
+        self.assertIsNone(claim_job('test'))
+
+    def test_abandoned_job_resumes(self) -> None:
+        job = self.submit()
+        claim_job('crashed')
+
+        image_bytes = io.BytesIO()
+        PILImage.new('L', (100, 100)).save(image_bytes, format='PNG')
+        done = Mask.objects.create(picture=self.pictures[0], image=File(image_bytes, name='test_mask.png'))
+
+        self.assertIsNone(claim_job('test'))
+
+        with self.settings(PREDICTION_JOB_STALE_SECONDS=0):
+            job = claim_job('test')
+
+        self.assertEqual(job.worker, 'test')
+
+        job = run_job(job)
+        self.assertEqual(job.status, PredictionJob.COMPLETED)
+        self.assertEqual(job.completed, 3)
+        self.assertEqual(Mask.objects.get(picture=self.pictures[0]).id, done.id)
+
+    def test_slow_chunk_keeps_heartbeat(self) -> None:
+        job = self.submit()
+        job = claim_job('test')
+
+        def slow_probability_maps(*args, **kwargs):
+            for index, result in enumerate(get_probability_maps(*args, **kwargs)):
+                if index > 0:
+                    # The previous picture took long, but its heartbeat keeps other workers away.
+                    self.assertIsNone(claim_job('other', stale_after=60))
+
+                stale = datetime.now(timezone.utc) - timedelta(hours=1)
+                PredictionJob.objects.filter(id=job.id).update(heartbeat=stale)
+                yield result
+
+        with mock.patch('processing.prediction.get_probability_maps', side_effect=slow_probability_maps):
+            job = run_job(job, chunk_size=3)
+
+        self.assertEqual(job.status, PredictionJob.COMPLETED)
+        self.assertEqual(job.worker, 'test')
+        self.assertEqual(job.completed, 3)
+
+    def test_released_job_is_not_saved(self) -> None:
+        job = self.submit()
+        job = claim_job('test')
+
+        def stalled_probability_maps(*args, **kwargs):
+            for result in get_probability_maps(*args, **kwargs):
+                stale = datetime.now(timezone.utc) - timedelta(hours=1)
+                PredictionJob.objects.filter(id=job.id).update(heartbeat=stale)
+                self.assertIsNotNone(claim_job('other', stale_after=60))
+                yield result
+
+        with mock.patch('processing.prediction.get_probability_maps', side_effect=stalled_probability_maps):
+            job = run_job(job, chunk_size=3)
+
+        self.assertEqual(job.status, PredictionJob.RUNNING)
+        self.assertEqual(job.worker, 'other')
+        self.assertEqual(Mask.objects.count(), 0)
+
+        job = run_job(job)
+        self.assertEqual(job.status, PredictionJob.COMPLETED)
+        self.assertEqual(job.completed, 3)
+
+    def list_mask_images(self) -> set[str]:
+        directory = os.path.join(MEDIA_ROOT, 'masks')
+
+        return set(os.listdir(directory)) if os.path.isdir(directory) else set()
+
+    def test_released_job_deletes_mask_images(self) -> None:
+        job = self.submit()
+        job = claim_job('test')
+        mask_images = self.list_mask_images()
+
+        def released_probability_maps(*args, **kwargs):
+            for index, result in enumerate(get_probability_maps(*args, **kwargs)):
+                if index == 2:
+                    PredictionJob.objects.filter(id=job.id).update(status=PredictionJob.CANCELLED)
+                yield result
+
+        with mock.patch('processing.prediction.get_probability_maps', side_effect=released_probability_maps):
+            job = run_job(job, chunk_size=3)
+
+        self.assertEqual(job.status, PredictionJob.CANCELLED)
+        self.assertEqual(Mask.objects.count(), 0)
+        self.assertEqual(self.list_mask_images(), mask_images)
+
+    def test_failed_insert_deletes_mask_images(self) -> None:
+        job = self.submit()
+        job = claim_job('test')
+        mask_images = self.list_mask_images()
+
+        with mock.patch('processing.jobs.Mask.objects.bulk_create', side_effect=RuntimeError('insert failed')):
+            job = run_job(job, chunk_size=3)
+
+        self.assertEqual(job.status, PredictionJob.FAILED)
+        self.assertEqual(job.error, 'insert failed')
+        self.assertEqual(self.list_mask_images(), mask_images)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class TestModelRegistry(APITestCase):
+    def setUp(self) -> None:
+        self.user = User.objects.create_user(username='test', password='test')
+        self.other_user = User.objects.create_user(username='other', password='other')
+        self.dataset = Dataset.objects.create(
+            name='test', description='test', owner=self.user)
+
+        image_bytes = io.BytesIO()
+        PILImage.new('RGB', (100, 100), color='red').save(image_bytes, format='PNG')
+        self.picture = Picture.objects.create(
+            dataset=self.dataset, image=File(image_bytes, name='test.png'))
+
+        self.records = [
+            Model.objects.create(name=name, owner=self.user, model_weights=File(io.BytesIO(), name=f'{name}.pth'))
+            for name in ['first', 'second']]
+        self.client = APIRequestFactory()
+
+    def test_load_training_checkpoint(self) -> None:
+        weights = {f'model.{key}': value for key, value in registry.get_default().model.state_dict().items()}
+        checkpoint_bytes = io.BytesIO()
+        torch.save({'state_dict': weights}, checkpoint_bytes)
+
+        record = Model.objects.create(name='checkpoint', owner=self.user,
+                                      model_weights=File(checkpoint_bytes, name='checkpoint.pth'))
+        model = load_model(record)
+
+        self.assertFalse(model.training)
+        for key, value in registry.get_default().model.state_dict().items():
+            self.assertTrue(torch.equal(model.state_dict()[key], value))
+
+    @mock.patch('processing.model_registry.load_model', side_effect=lambda record: torch.nn.Linear(64, 64))
+    def test_least_recently_used_is_evicted(self, load_model: mock.Mock) -> None:
+        models = ModelRegistry()
+        first, second = self.records
+
+        with self.settings(MODEL_REGISTRY_MAX_BYTES=(64 * 64 + 64) * 4 * 2):
+            models.get(first)
+            models.get(second)
+            models.get(first)
+            self.assertEqual(load_model.call_count, 2)
+
+        with self.settings(MODEL_REGISTRY_MAX_BYTES=1):
+            models.get(second)
+            models.get(first)
+            self.assertEqual(load_model.call_count, 3)
+            self.assertEqual(list(models.models), ['model:' + str(first.id)])
+
+    def test_loading_does_not_block_loaded_models(self) -> None:
+        models = ModelRegistry()
+        first, second = self.records
+        started = threading.Event()
+        release = threading.Event()
+
+        def load(record: Model) -> torch.nn.Module:
+            if record == second:
+                started.set()
+                release.wait(5)
+
+            return torch.nn.Linear(1, 1)
+
+        with mock.patch('processing.model_registry.load_model', side_effect=load) as load_model:
+            loaded = models.get(first)
+
+            with ThreadPoolExecutor(max_workers=3) as executor:
+                futures = [executor.submit(models.get, second) for _ in range(2)]
+                self.assertTrue(started.wait(5))
+
+                self.assertIs(executor.submit(models.get, first).result(timeout=1), loaded)
+
+                release.set()
+                self.assertIs(futures[0].result().model, futures[1].result().model)
+
+            self.assertEqual(load_model.call_count, 2)
+
+    def test_quantized_model_size(self) -> None:
+        from segmentation.models import ModelType
+        from segmentation.utils.precision import quantize_static
+
+        model = ModelType.UNET.get_model(3, 1).eval()
+        quantized = quantize_static(model, ModelType.UNET, [torch.rand(3, 64, 64)])
+        weights = sum(parameter.numel() for parameter in model.parameters() if parameter.dim() > 1)
+
+        self.assertGreater(get_model_size(quantized), weights)
+        self.assertLess(get_model_size(quantized), get_model_size(model) / 2)
+
+        dynamic = torch.ao.quantization.quantize_dynamic(torch.nn.Sequential(torch.nn.Linear(64, 64)))
+        self.assertGreaterEqual(get_model_size(dynamic), 64 * 64)
+
+        models = ModelRegistry()
+        first, second = self.records
+
+        with mock.patch('processing.model_registry.load_model', return_value=quantized), \
+                self.settings(MODEL_REGISTRY_MAX_BYTES=get_model_size(quantized) * 3 // 2):
+            models.get(first)
+            models.get(second)
+
+        self.assertEqual(list(models.models), ['model:' + str(second.id)])
+
+    def test_update_reloads(self) -> None:
+        models = ModelRegistry()
+        record = self.records[0]
+
+        with mock.patch('processing.model_registry.load_model', side_effect=lambda record: torch.nn.Linear(1, 1)):
+            loaded = models.get(record)
+            self.assertIs(models.get(record).model, loaded.model)
+
+            record.save()
+            self.assertIsNot(models.get(record).model, loaded.model)
+
+    def test_precision_from_settings(self) -> None:
+        with self.settings(INFERENCE_PRECISION='bf16'):
+            loaded = load_default_model()
+            self.assertTrue(get_model_version(self.records[0]).endswith(':bf16'))
+
+        self.assertTrue(loaded.version.endswith(':bf16'))
+        self.assertEqual(type(loaded.model).__name__, 'BFloat16Model')
+
+        with self.settings(INFERENCE_PRECISION='int8', INFERENCE_CALIBRATION_DIR=None):
+            with self.assertRaises(ImproperlyConfigured):
+                load_default_model()
+
+    def test_tiling_from_settings(self) -> None:
+        with self.settings(INFERENCE_MEMORY_BUDGET=64 * 1024 ** 2):
+            loaded = load_default_model()
+            self.assertIn(':tiled', get_model_version(self.records[0]))
+
+        self.assertIn(':tiled', loaded.version)
+        self.assertEqual(type(loaded.model).__name__, 'TiledModel')
+
+        with torch.no_grad():
+            output = loaded.model(torch.rand(1, 3, 300, 250))
+
+        self.assertEqual(output.shape, (1, 1, 300, 250))
+
+    def test_predict_with_uploaded_model(self) -> None:
+        record = self.records[0]
+
+        request = self.client.post('masks/', {'threshold': 0, 'model': record.id})
+        force_authenticate(request, user=self.user)
+        view = MaskViewSet.as_view({'post': 'create'})
+
+        with mock.patch('processing.model_registry.load_model', return_value=registry.get_default().model) as load:
+            response = view(request, dataset_pk=self.dataset.id, image_pk=self.picture.id)
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['model'], record.id)
+        load.assert_called_once()
+        self.assertEqual(ProbabilityMap.objects.get(picture=self.picture).model_name, f'model:{record.id}')
+        registry.discard(record)
+
+    def test_pipeline_metrics_exported(self) -> None:
+        predict_masks([self.picture], 0)
+
+        response = Client().get('/metrics')
+        self.assertEqual(response.status_code, 200)
+
+        content = response.content.decode()
+        for stage in ['decode', 'forward', 'threshold', 'calculate_metrics', 'encode', 'store']:
+            self.assertIn(f'segmentation_stage_seconds_count{{model_type="unet",size="lt1mp",stage="{stage}"}}',
+                          content)
+        self.assertIn('segmentation_loaded_models{model_type="unet"} 1.0', content)
+        self.assertIn('segmentation_inferences_in_progress{model_type="unet"} 0.0', content)
+
+    def test_update_model_only(self) -> None:
+        mask = predict_masks([self.picture], 7)[0]
+        mask.save()
+        record = self.records[0]
+
+        request = self.client.patch(f'masks/{mask.id}/', {'model': record.id})
+        force_authenticate(request, user=self.user)
+        view = MaskViewSet.as_view({'patch': 'partial_update'})
+
+        with mock.patch('processing.model_registry.load_model', return_value=registry.get_default().model):
+            response = view(request, dataset_pk=self.dataset.id, image_pk=self.picture.id, pk=mask.id)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['model'], record.id)
+        self.assertEqual(response.data['threshold'], 7)
+        registry.discard(record)
+
+    def test_private_model_rejected(self) -> None:
+        other_dataset = Dataset.objects.create(name='other', description='other', owner=self.other_user)
+        image_bytes = io.BytesIO()
+        PILImage.new('RGB', (100, 100), color='red').save(image_bytes, format='PNG')
+        picture = Picture.objects.create(dataset=other_dataset, image=File(image_bytes, name='test.png'))
+
+        request = self.client.post('masks/', {'threshold': 0, 'model': self.records[0].id})
+        force_authenticate(request, user=self.other_user)
+        view = MaskViewSet.as_view({'post': 'create'})
+        response = view(request, dataset_pk=other_dataset.id, image_pk=picture.id)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('model', response.data)
+
+    def upload_model(self, weights: bytes) -> Response:
+        request = self.client.post('models/', {
+            'name': 'uploaded', 'model_type': Model.UNET,
+            'model_weights': SimpleUploadedFile('uploaded.pth', weights)}, format='multipart')
+        force_authenticate(request, user=self.user)
+
+        return ModelViewSet.as_view({'post': 'create'})(request)
+
+    def test_upload_state_dict(self) -> None:
+        weights = io.BytesIO()
+        torch.save(torch.nn.Linear(2, 1).state_dict(), weights)
+
+        response = self.upload_model(weights.getvalue())
+        self.assertEqual(response.status_code, 201)
+
+    def test_upload_pickle_payload_rejected(self) -> None:
+        marker = os.path.join(tempfile.mkdtemp(), 'executed')
+
+        class Payload:
+            def __reduce__(self):
+                return os.mkdir, (marker,)
+
+        for checkpoint in [{'weight': Payload()}, {'state_dict': [torch.zeros(1)]}]:
+            weights = io.BytesIO()
+            torch.save(checkpoint, weights)
+
+            response = self.upload_model(weights.getvalue())
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('model_weights', response.data)
+
+        self.assertFalse(os.path.exists(marker))
+        self.assertFalse(Model.objects.filter(name='uploaded').exists())
+
+        record = self.records[0]
+        with record.model_weights.open('wb') as f:
+            torch.save({'weight': Payload()}, f)
+
+        with self.assertRaises(ValueError):
+            load_model(record)
+        self.assertFalse(os.path.exists(marker))
+
+
+class TestQueryBudget(APITestCase):
+    """
+    Checks that the number of queries of every list and detail endpoint stays within a budget and does not grow with
+    the number of rows.
+    """
+
+    def setUp(self) -> None:
+        self.user = User.objects.create_user(username='test', password='test')
+        self.other = User.objects.create_user(username='other', password='other')
+        self.dataset = Dataset.objects.create(name='test', owner=self.user)
+        self.public_dataset = Dataset.objects.create(name='public', owner=self.other, public=True)
+        self.client = APIRequestFactory()
+
+    def add_pictures(self, dataset: Dataset, count: int) -> list[Picture]:
+        pictures = []
+        for _ in range(count):
+            picture = Picture.objects.create(dataset=dataset, image='images/test.png')
+            Mask.objects.create(picture=picture, image='masks/test.png')
+            pictures.append(picture)
+
+        return pictures
+
+    def add_datasets(self, count: int) -> None:
+        for _ in range(count):
+            self.add_pictures(Dataset.objects.create(name='test', owner=self.user), 2)
+
+    def add_jobs(self, count: int) -> None:
+        for _ in range(count):
+            PredictionJob.objects.create(dataset=self.dataset, owner=self.user, picture_ids=[])
+
+    def add_models(self, count: int) -> None:
+        for _ in range(count):
+            Model.objects.create(name='test', owner=self.user, model_weights='models/test.pth')
+
+    def assertQueryBudget(self, budget: int, viewset: type, actions: dict, add_rows: callable,
+                          user: User = None, **kwargs) -> None:
+        counts = []
+        for _ in range(2):
+            add_rows(5)
+
+            request = self.client.get('/')
+            force_authenticate(request, user=user)
+
+            with CaptureQueriesContext(connection) as queries:
+                response = viewset.as_view(actions)(request, **kwargs)
+                response.render()
+
+            self.assertEqual(response.status_code, 200, response.data)
+            counts.append(len(queries))
+
+        self.assertEqual(counts[0], counts[1], f'Queries grow with rows: {counts}')
+        self.assertLessEqual(counts[1], budget, f'Over the budget of {budget} queries')
+
+    def test_datasets(self) -> None:
+        self.assertQueryBudget(2, DatasetViewSet, {'get': 'list'}, self.add_datasets, self.user)
+        self.assertQueryBudget(2, DatasetViewSet, {'get': 'retrieve'},
+                               lambda count: self.add_pictures(self.dataset, count), self.user, pk=self.dataset.id)
+        self.assertQueryBudget(2, DatasetViewSet, {'get': 'list'}, self.add_datasets)
+
+    def test_pictures(self) -> None:
+        picture = self.add_pictures(self.dataset, 1)[0]
+
+        self.assertQueryBudget(1, PictureViewSet, {'get': 'list'},
+                               lambda count: self.add_pictures(self.dataset, count), self.user,
+                               dataset_pk=self.dataset.id)
+        self.assertQueryBudget(1, PictureViewSet, {'get': 'retrieve'},
+                               lambda count: self.add_pictures(self.dataset, count), self.user,
+                               dataset_pk=self.dataset.id, pk=picture.id)
+        self.assertQueryBudget(1, PictureViewSet, {'get': 'list'},
+                               lambda count: self.add_pictures(self.public_dataset, count),
+                               dataset_pk=self.public_dataset.id)
+
+    def test_masks(self) -> None:
+        picture = self.add_pictures(self.dataset, 1)[0]
+        public_picture = self.add_pictures(self.public_dataset, 1)[0]
+
+        self.assertQueryBudget(1, MaskViewSet, {'get': 'list'},
+                               lambda count: self.add_pictures(self.dataset, count), self.user,
+                               dataset_pk=self.dataset.id, image_pk=picture.id)
+        self.assertQueryBudget(1, MaskViewSet, {'get': 'retrieve'},
+                               lambda count: self.add_pictures(self.dataset, count), self.user,
+                               dataset_pk=self.dataset.id, image_pk=picture.id, pk=picture.mask.id)
+        self.assertQueryBudget(1, MaskViewSet, {'get': 'retrieve'},
+                               lambda count: self.add_pictures(self.public_dataset, count),
+                               dataset_pk=self.public_dataset.id, image_pk=public_picture.id,
+                               pk=public_picture.mask.id)
+
+    def test_jobs_and_models(self) -> None:
+        self.assertQueryBudget(1, PredictionJobViewSet, {'get': 'list'}, self.add_jobs, self.user,
+                               dataset_pk=self.dataset.id)
+        self.assertQueryBudget(1, ModelViewSet, {'get': 'list'}, self.add_models, self.user)
+
+    def test_private_rows_are_hidden(self) -> None:
+        picture = self.add_pictures(self.dataset, 1)[0]
+
+        request = self.client.get('/')
+        force_authenticate(request, user=self.other)
+        response = MaskViewSet.as_view({'get': 'list'})(request, dataset_pk=self.dataset.id, image_pk=picture.id)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 0)
+
+
+class TestStartup(APITestCase):
+    def test_startup_skips_heavy_imports(self) -> None:
+        script = ('import sys; from django.urls import get_resolver; get_resolver().url_patterns; '
+                  'print([module for module in ("torch", "cv2", "skimage", "lightning") if module in sys.modules])')
+        result = subprocess.run([sys.executable, 'manage.py', 'shell', '-c', script],
+                                capture_output=True, text=True, check=True)
+
+        self.assertEqual(result.stdout.strip(), '[]')
+
+    def test_default_model_loads_on_first_use(self) -> None:
+        models = ModelRegistry()
+        self.assertIsNone(models.default)
+
+        with mock.patch('processing.model_registry.load_default_model', wraps=load_default_model) as load:
+            models.warm_up()
+            models.get()
+
+        load.assert_called_once()
+        self.assertEqual(models.get().name, 'default')
+
 
 # @override_settings(MEDIA_ROOT=MEDIA_ROOT)
 # class TestModelViewSet(APITestCase):
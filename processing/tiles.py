@@ -0,0 +1,292 @@
+import io
+import math
+
+from PIL import Image as PILImage
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+from processing.models import Picture, Mask
+
+TILE_FORMATS = {
+    'pictures': ('jpg', 'JPEG', 'image/jpeg'),
+    'masks': ('png', 'PNG', 'image/png'),
+}
+
+
+def get_kind(instance: Picture | Mask) -> str:
+    return 'masks' if isinstance(instance, Mask) else 'pictures'
+
+
+def get_pyramid_root(dataset_id: int, picture_id: int = None, kind: str = None) -> str:
+    """
+    Returns the storage directory of the tile pyramids of a dataset, of a picture and its mask, or of one of them.
+
+    Parameters:
+        dataset_id (int): The dataset.
+        picture_id (int, optional): The picture, or the picture of the mask.
+        kind (str, optional): Either ``'pictures'`` or ``'masks'``.
+
+    Returns:
+        str: The directory.
+    """
+
+    parts = ['pyramids', str(dataset_id)]
+    if picture_id is not None:
+        parts.append(str(picture_id))
+        if kind is not None:
+            parts.append(kind)
+
+    return '/'.join(parts)
+
+
+def get_pyramid_path(instance: Picture | Mask) -> str:
+    """
+    Returns the storage directory of the current tile pyramid of a picture or mask. The directory changes whenever
+    the image is updated, so that stale tiles are never served.
+
+    Parameters:
+        instance (Picture | Mask): The picture or mask.
+
+    Returns:
+        str: The directory.
+    """
+
+    picture = instance.picture if isinstance(instance, Mask) else instance
+    version = int(instance.updated.timestamp() * 1000)
+
+    return f'{get_pyramid_root(picture.dataset_id, picture.id, get_kind(instance))}/{version}'
+
+
+def get_level_count(width: int, height: int) -> int:
+    """
+    Returns the number of levels of a Deep Zoom pyramid, from a single pixel up to the full resolution.
+
+    Parameters:
+        width (int): The width of the image.
+        height (int): The height of the image.
+
+    Returns:
+        int: The number of levels.
+    """
+
+    return math.ceil(math.log2(max(width, height, 1))) + 1
+
+
+def get_level_size(width: int, height: int, level: int) -> tuple[int, int]:
+    """
+    Returns the size of the image at a level of its Deep Zoom pyramid, each level halving the next one.
+
+    Parameters:
+        width (int): The width of the image.
+        height (int): The height of the image.
+        level (int): The level, the last one being the full resolution.
+
+    Returns:
+        tuple[int, int]: The width and height at the level.
+    """
+
+    scale = 2 ** (get_level_count(width, height) - 1 - level)
+
+    return math.ceil(width / scale), math.ceil(height / scale)
+
+
+def get_descriptor(instance: Picture | Mask, url: str) -> dict:
+    """
+    Describes the tile pyramid of a picture or mask as a Deep Zoom image, in the JSON form OpenSeadragon reads.
+
+    Only the header of the image is read.
+
+    Parameters:
+        instance (Picture | Mask): The picture or mask.
+        url (str): The URL tiles are requested from, followed by ``<level>/<column>_<row>.<format>``.
+
+    Returns:
+        dict: The Deep Zoom descriptor.
+    """
+
+    with instance.image.open('rb') as f:
+        width, height = PILImage.open(f).size
+
+    return {
+        'Image': {
+            'xmlns': 'http://schemas.microsoft.com/deepzoom/2008',
+            'Url': url,
+            'Format': TILE_FORMATS[get_kind(instance)][0],
+            'Overlap': 0,
+            'TileSize': settings.PYRAMID_TILE_SIZE,
+            'Size': {'Width': width, 'Height': height},
+        }
+    }
+
+
+def save_level(image: PILImage.Image, path: str, level: int, image_format: str, extension: str) -> None:
+    """
+    Cuts an image into the tiles of a pyramid level and stores the ones that are not stored yet.
+
+    Parameters:
+        image (PIL.Image.Image): The image at the size of the level.
+        path (str): The storage directory of the pyramid.
+        level (int): The level.
+        image_format (str): The Pillow format of the tiles.
+        extension (str): The file extension of the tiles.
+    """
+
+    tile_size = settings.PYRAMID_TILE_SIZE
+
+    for row in range(math.ceil(image.height / tile_size)):
+        for column in range(math.ceil(image.width / tile_size)):
+            tile = image.crop((column * tile_size, row * tile_size,
+                               min((column + 1) * tile_size, image.width), min((row + 1) * tile_size, image.height)))
+
+            tile_bytes = io.BytesIO()
+            tile.save(tile_bytes, format=image_format)
+
+            name = f'{path}/{level}/{column}_{row}.{extension}'
+            if not default_storage.exists(name):
+                default_storage.save(name, ContentFile(tile_bytes.getvalue()))
+
+
+def build_levels(instance: Picture | Mask, level: int) -> None:
+    """
+    Cuts a level of the tile pyramid of a picture or mask, and every smaller level that is not stored yet, into
+    tiles and stores them, replacing older pyramids.
+
+    The image is decoded once, at the lowest resolution the level allows for JPEG pictures, and each smaller level
+    is halved from the one above it, so a first view of a large image does not decode it once per level. Masks are
+    shown white on black and their downscaled levels are greyscale, so that thin roots stay visible.
+
+    Parameters:
+        instance (Picture | Mask): The picture or mask.
+        level (int): The largest level to build.
+    """
+
+    kind = get_kind(instance)
+    extension, image_format, _ = TILE_FORMATS[kind]
+
+    with instance.image.open('rb') as f:
+        image = PILImage.open(f)
+        width, height = image.size
+        level_size = get_level_size(width, height, level)
+
+        if kind == 'masks':
+            image = image.convert('L').point(lambda value: 255 if value else 0)
+        else:
+            image.draft('RGB', level_size)
+            image = image.convert('RGB')
+
+    if image.size == (width, height):
+        image = image.reduce(2 ** (get_level_count(width, height) - 1 - level))
+    elif image.size != level_size:
+        # JPEG drafts are decoded at a power of two between the level and the full resolution.
+        image = image.resize(level_size, PILImage.Resampling.BOX)
+
+    delete_stale_pyramids(instance)
+
+    path = get_pyramid_path(instance)
+    while True:
+        if not default_storage.exists(f'{path}/{level}/0_0.{extension}'):
+            save_level(image, path, level, image_format, extension)
+
+        if level == 0:
+            break
+
+        image = image.reduce(2)
+        level -= 1
+
+
+def get_tile(instance: Picture | Mask, level: int, column: int, row: int) -> str:
+    """
+    Returns the stored tile of a picture or mask, building its level on the first request.
+
+    Parameters:
+        instance (Picture | Mask): The picture or mask.
+        level (int): The level.
+        column (int): The column of the tile.
+        row (int): The row of the tile.
+
+    Returns:
+        str: The storage name of the tile.
+
+    Raises:
+        ValueError: If the level or tile is outside of the pyramid.
+    """
+
+    name = f'{get_pyramid_path(instance)}/{level}/{column}_{row}.{TILE_FORMATS[get_kind(instance)][0]}'
+
+    if not default_storage.exists(name):
+        with instance.image.open('rb') as f:
+            width, height = PILImage.open(f).size
+
+        level_width, level_height = get_level_size(width, height, level)
+        tile_size = settings.PYRAMID_TILE_SIZE
+
+        if not 0 <= level < get_level_count(width, height) or column * tile_size >= level_width \
+                or row * tile_size >= level_height:
+            raise ValueError(f'Tile {column}_{row} is outside of level {level}.')
+
+        build_levels(instance, level)
+
+    return name
+
+
+def delete_tree(path: str) -> None:
+    """
+    Deletes a directory of the default storage and everything in it.
+
+    Parameters:
+        path (str): The directory.
+    """
+
+    try:
+        directories, files = default_storage.listdir(path)
+    except FileNotFoundError:
+        return
+
+    for directory in directories:
+        delete_tree(f'{path}/{directory}')
+
+    for file in files:
+        default_storage.delete(f'{path}/{file}')
+
+    default_storage.delete(path)
+
+
+def delete_stale_pyramids(instance: Picture | Mask) -> None:
+    """
+    Deletes the pyramids of older versions of a picture or mask.
+
+    Parameters:
+        instance (Picture | Mask): The picture or mask.
+    """
+
+    current = get_pyramid_path(instance)
+    root = current.rsplit('/', 1)[0]
+
+    try:
+        versions, _ = default_storage.listdir(root)
+    except FileNotFoundError:
+        return
+
+    for version in versions:
+        if f'{root}/{version}' != current:
+            delete_tree(f'{root}/{version}')
+
+
+def delete_pyramids(dataset_id: int, picture_ids: list[int] = None, kind: str = None) -> None:
+    """
+    Deletes the tile pyramids of a dataset, or of some of its pictures or of their masks.
+
+    Parameters:
+        dataset_id (int): The dataset.
+        picture_ids (list[int], optional): The pictures. Defaults to every picture of the dataset.
+        kind (str, optional): Either ``'pictures'`` or ``'masks'``. Defaults to both.
+    """
+
+    if picture_ids is None:
+        delete_tree(get_pyramid_root(dataset_id))
+        return
+
+    for picture_id in picture_ids:
+        delete_tree(get_pyramid_root(dataset_id, picture_id, kind))
@@ -0,0 +1,309 @@
+import hashlib
+import itertools
+import os
+import shutil
+import tarfile
+import tempfile
+import zipfile
+from collections.abc import Iterable, Iterator
+from typing import IO
+
+from PIL import Image as PILImage
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import UploadedFile
+from django.core.validators import get_available_image_extensions
+from django.db import connection, transaction
+from django.db.models import Max
+
+from processing.models import Dataset, Picture, Model, PredictionJob
+
+CHUNK_SIZE = 64 * 1024
+
+
+class UploadError(Exception):
+    pass
+
+
+def is_archive(upload: UploadedFile) -> bool:
+    """
+    Tells whether an uploaded file is a zip or tar archive rather than an image, from its content.
+
+    Parameters:
+        upload (UploadedFile): The uploaded file.
+
+    Returns:
+        bool: Whether the file is an archive.
+    """
+
+    upload.seek(0)
+    archive = zipfile.is_zipfile(upload)
+
+    if not archive:
+        upload.seek(0)
+        try:
+            with tarfile.open(fileobj=upload, mode='r:*'):
+                archive = True
+        except tarfile.TarError:
+            pass
+
+    upload.seek(0)
+    return archive
+
+
+def iter_archive(upload: UploadedFile) -> Iterator[tuple[str, IO[bytes]]]:
+    """
+    Reads the files of a zip or tar archive one at a time, without extracting the archive.
+
+    Directories, links and hidden files, such as the ``__MACOSX`` folders of archives made on macOS, are skipped.
+    Only the name of a file is kept, so that its path in the archive cannot point outside the storage.
+
+    Parameters:
+        upload (UploadedFile): The archive.
+
+    Yields:
+        tuple[str, IO[bytes]]: The name of the next file and a stream of its content, valid until the next file.
+    """
+
+    def is_hidden(path: str) -> bool:
+        return any(part.startswith('.') or part == '__MACOSX' for part in path.split('/'))
+
+    if zipfile.is_zipfile(upload):
+        upload.seek(0)
+        with zipfile.ZipFile(upload) as archive:
+            for info in archive.infolist():
+                if info.is_dir() or is_hidden(info.filename):
+                    continue
+
+                with archive.open(info) as f:
+                    yield os.path.basename(info.filename), f
+    else:
+        upload.seek(0)
+        with tarfile.open(fileobj=upload, mode='r|*') as archive:
+            for info in archive:
+                if not info.isfile() or is_hidden(info.name):
+                    continue
+
+                yield os.path.basename(info.name), archive.extractfile(info)
+
+
+def iter_uploads(uploads: Iterable[UploadedFile]) -> Iterator[tuple[str, IO[bytes]]]:
+    """
+    Reads uploaded images and the files of uploaded archives one at a time.
+
+    Parameters:
+        uploads (Iterable[UploadedFile]): The uploaded images and archives.
+
+    Yields:
+        tuple[str, IO[bytes]]: The name of the next file and a stream of its content, valid until the next file.
+    """
+
+    for upload in uploads:
+        if is_archive(upload):
+            yield from iter_archive(upload)
+        else:
+            yield upload.name, upload
+
+
+def validate_image(name: str, f: IO[bytes]) -> None:
+    """
+    Checks that a file is an image Pillow can read, from its extension, header and, for formats that have them,
+    checksums, without decoding its pixels.
+
+    Parameters:
+        name (str): The name of the file.
+        f (IO[bytes]): The seekable content of the file.
+
+    Raises:
+        UploadError: If the file is not a readable image, or is larger than ``PIL.Image.MAX_IMAGE_PIXELS``.
+    """
+
+    extension = os.path.splitext(name)[1][1:].lower()
+    if extension not in get_available_image_extensions():
+        raise UploadError(f'File extension "{extension}" is not allowed.')
+
+    try:
+        with PILImage.open(f) as image:
+            image.verify()
+    except Exception:
+        raise UploadError('Upload a valid image. The file is either not an image or a corrupted image.')
+    finally:
+        f.seek(0)
+
+
+def hash_file(f: IO[bytes]) -> str:
+    """
+    Returns the SHA-256 digest of a file, read in chunks.
+
+    Parameters:
+        f (IO[bytes]): The seekable content of the file, which is rewound afterwards.
+
+    Returns:
+        str: The hexadecimal digest.
+    """
+
+    digest = hashlib.sha256()
+
+    f.seek(0)
+    while chunk := f.read(CHUNK_SIZE):
+        digest.update(chunk)
+    f.seek(0)
+
+    return digest.hexdigest()
+
+
+def store_image(picture: Picture, f: File, pending: dict[str, str] = None) -> None:
+    """
+    Sets the image of an unsaved picture, storing it only if no picture with the same content is stored already.
+
+    Pictures with the same content share one stored file, which is deleted with the last of them, and keep the name
+    they were uploaded with. The picture whose file is reused is locked until the end of the transaction, so that
+    it cannot be deleted, taking the file with it, before the new picture is inserted. The picture must therefore be
+    stored and inserted in the same transaction. SQLite does not lock rows, so there concurrent uploads and
+    deletions of the same content may still leave a picture without its file.
+
+    Parameters:
+        picture (Picture): The unsaved picture.
+        f (File): The content of the image.
+        pending (dict[str, str], optional): The stored images of pictures that are not saved yet, by content hash.
+            Updated with the image of the picture.
+    """
+
+    picture.name = os.path.basename(f.name)
+    picture.content_hash = hash_file(f)
+
+    if pending is not None and picture.content_hash in pending:
+        stored = pending[picture.content_hash]
+    else:
+        stored = Picture.objects.select_for_update().filter(
+            content_hash=picture.content_hash).values_list('image', flat=True).first()
+
+    if stored and default_storage.exists(stored):
+        picture.image = stored
+    else:
+        picture.image.save(picture.name, f, save=False)
+
+    if pending is not None:
+        pending[picture.content_hash] = picture.image.name
+
+
+def ingest_pictures(dataset: Dataset, files: Iterable[tuple[str, IO[bytes]]],
+                    batch_size: int = None) -> tuple[list[Picture], list[dict]]:
+    """
+    Validates and stores a stream of images, inserting the pictures of those that are valid in batches.
+
+    Every file is copied to a temporary file, which stays in memory unless it is larger than
+    ``settings.FILE_UPLOAD_MAX_MEMORY_SIZE``, so that only one image is held at a time whatever the size of the
+    upload. Images stored already are not stored again, see ``store_image``, and each batch is stored and inserted
+    in its own transaction. Invalid files, and the files after the first ``settings.BULK_UPLOAD_MAX_FILES``, are
+    reported instead of failing the upload. The content of the files after the limit is skipped without being read.
+
+    Parameters:
+        dataset (Dataset): The dataset the pictures are added to.
+        files (Iterable[tuple[str, IO[bytes]]]): The names and content of the files, see ``iter_uploads``.
+        batch_size (int, optional): The number of pictures inserted at a time.
+            Defaults to ``settings.BULK_UPLOAD_BATCH_SIZE``.
+
+    Returns:
+        tuple[list[Picture], list[dict]]: The pictures created, and the name of every rejected file with the
+        reason.
+    """
+
+    if batch_size is None:
+        batch_size = settings.BULK_UPLOAD_BATCH_SIZE
+
+    pictures = []
+    errors = []
+
+    def read_images() -> Iterator[File]:
+        for index, (name, f) in enumerate(files):
+            if index >= settings.BULK_UPLOAD_MAX_FILES:
+                errors.append({'name': name, 'detail': f'Only the first {settings.BULK_UPLOAD_MAX_FILES} files of '
+                                                       'an upload are read.'})
+                continue
+
+            with tempfile.SpooledTemporaryFile(max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE) as spooled:
+                shutil.copyfileobj(f, spooled, CHUNK_SIZE)
+                spooled.seek(0)
+
+                try:
+                    validate_image(name, spooled)
+                except UploadError as e:
+                    errors.append({'name': name, 'detail': str(e)})
+                    continue
+
+                yield File(spooled, name=name)
+
+    images = read_images()
+
+    while True:
+        with transaction.atomic():
+            batch = []
+            pending = {}
+
+            for image in itertools.islice(images, batch_size):
+                picture = Picture(dataset=dataset)
+                store_image(picture, image, pending)
+                batch.append(picture)
+
+            if not batch:
+                break
+
+            pictures += create_pictures(dataset, batch)
+
+    return pictures, errors
+
+
+def create_pictures(dataset: Dataset, pictures: list[Picture]) -> list[Picture]:
+    """
+    Inserts pictures whose images are stored already in a single query.
+
+    Backends that do not return the ids of inserted rows, such as MySQL, get them back with a second query for the
+    rows of the dataset with the same images inserted after the last row that existed before. Rows with the same
+    image in a dataset have the same content, so which of them is returned does not matter.
+
+    Parameters:
+        dataset (Dataset): The dataset of the pictures.
+        pictures (list[Picture]): The unsaved pictures.
+
+    Returns:
+        list[Picture]: The saved pictures.
+    """
+
+    last_id = None
+    if not connection.features.can_return_rows_from_bulk_insert:
+        last_id = Picture.objects.aggregate(last_id=Max('id'))['last_id'] or 0
+
+    pictures = Picture.objects.bulk_create(pictures)
+
+    if any(picture.pk is None for picture in pictures):
+        pictures = list(Picture.objects.filter(
+            dataset=dataset, id__gt=last_id, image__in=[picture.image.name for picture in pictures]
+        ).order_by('id')[:len(pictures)])
+
+    return pictures
+
+
+def queue_prediction(dataset: Dataset, pictures: list[Picture], owner: User, threshold: int = 0,
+                     model: Model = None) -> PredictionJob:
+    """
+    Queues the masks of uploaded pictures to be predicted by the job workers.
+
+    Parameters:
+        dataset (Dataset): The dataset of the pictures.
+        pictures (list[Picture]): The pictures.
+        owner (User): The owner of the job.
+        threshold (int, optional): The area threshold of the masks. Defaults to 0.
+        model (Model, optional): The model to predict with. Defaults to the default model.
+
+    Returns:
+        PredictionJob: The pending job.
+    """
+
+    ids = [picture.id for picture in pictures]
+
+    return PredictionJob.objects.create(dataset=dataset, owner=owner, model=model, picture_ids=ids, total=len(ids),
+                                        threshold=threshold)
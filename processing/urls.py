@@ -1,4 +1,4 @@
-from django.urls import path
+from django.urls import path, re_path
 from django.urls.conf import include
 from rest_framework_nested.routers import SimpleRouter, NestedSimpleRouter
 
@@ -12,15 +12,25 @@ router.register('models', views.ModelViewSet, basename='models')
 image_router = BulkNestedRouter(router, 'datasets', lookup='dataset')
 image_router.register('images', views.PictureViewSet, basename='images')
 
+job_router = NestedSimpleRouter(router, 'datasets', lookup='dataset')
+job_router.register('jobs', views.PredictionJobViewSet, basename='jobs')
+
 mask_router = NestedSimpleRouter(image_router, 'images', lookup='image')
 mask_router.register('masks', views.MaskViewSet, basename='masks')
 
+# Deep Zoom viewers request tiles without a trailing slash, which the routers would add.
+tile_path = r'tiles/(?P<level>\d+)/(?P<column>\d+)_(?P<row>\d+)\.(?P<extension>jpg|png)$'
 
 app_name = 'segmentation'
 urlpatterns = [
     path('api/', include(router.urls)),
     path('api/', include(image_router.urls)),
     path('api/', include(mask_router.urls)),
+    path('api/', include(job_router.urls)),
+    re_path(r'^api/datasets/(?P<dataset_pk>[^/.]+)/images/(?P<pk>[^/.]+)/' + tile_path,
+            views.PictureViewSet.as_view({'get': 'tile'}), name='images-tile'),
+    re_path(r'^api/datasets/(?P<dataset_pk>[^/.]+)/images/(?P<image_pk>[^/.]+)/masks/(?P<pk>[^/.]+)/' + tile_path,
+            views.MaskViewSet.as_view({'get': 'tile'}), name='masks-tile'),
 
 
     # path('api/segmentation/', views.SegmentationAPIView.as_view()),
@@ -1,25 +1,39 @@
 import io
-import os
-import zipfile
 import json
 from PIL import Image as PILImage
 import numpy as np
 
-from django.http import HttpResponse, HttpRequest
-from django.db.models import Q
+from django.http import FileResponse, HttpResponse, HttpRequest, StreamingHttpResponse
+from django.db import transaction
+from django.db.models import Prefetch, Q
+from django.utils import timezone
+from django.utils.text import slugify
 from django.db.models.query import QuerySet
 from django.core.files import File
+from django.core.files.storage import default_storage
 from rest_framework import viewsets, permissions, status
 from rest_framework.serializers import Serializer
 from rest_framework.decorators import action
+from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
 from drf_spectacular.utils import extend_schema, extend_schema_view, OpenApiParameter, OpenApiTypes
 
-from processing.models import Dataset, Picture, Mask, Model
-from processing.serializers import DatasetSerializer, PictureSerializer, MaskSerializer, LabelMeSerializer, ModelSerializer
+from processing.models import Dataset, Picture, Mask, Model, PredictionJob
+from processing.serializers import (DatasetSerializer, PictureSerializer, MaskSerializer, LabelMeSerializer,
+                                    ModelSerializer, PredictionJobSerializer, DatasetAnalyticsSerializer,
+                                    BulkUploadSerializer)
 from processing.permissions import IsOwnerOrReadOnly
-from processing.apps import ProcessingConfig
-from segmentation import predict, masks, calculate_metrics
+from processing.analytics import get_analytics
+from processing.caching import (check_conditions, delete_artifacts, get_artifact, get_artifact_root, get_version,
+                                set_validators, stream_artifact)
+from processing.exports import build_labelme_archive, find_contours, get_dataset_version, stream_dataset_archive
+from processing.model_registry import registry, get_model_name
+from processing.prediction import predict_masks
+from processing.probability_cache import get_probability_map, invalidate_probability_maps
+from processing.tiles import TILE_FORMATS, delete_pyramids, get_descriptor, get_pyramid_path, get_tile
+from processing.uploads import ingest_pictures, iter_uploads, queue_prediction
+import segmentation
+from segmentation.utils.instrumentation import get_model_type, use_model_type
 
 
 @extend_schema(tags=['datasets'])
@@ -31,7 +45,7 @@ from segmentation import predict, masks, calculate_metrics
     destroy=extend_schema(summary='Delete a dataset'),
 )
 class DatasetViewSet(viewsets.ModelViewSet):
-    queryset = Dataset.objects.all()
+    queryset = Dataset.objects.prefetch_related(Prefetch('pictures', queryset=Picture.objects.only('id', 'dataset')))
     serializer_class = DatasetSerializer
     permission_classes = [
         permissions.IsAuthenticatedOrReadOnly, IsOwnerOrReadOnly]
@@ -45,6 +59,46 @@ class DatasetViewSet(viewsets.ModelViewSet):
         serializer.save(owner=request.user)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
+    @extend_schema(responses={(200, 'application/zip'): OpenApiTypes.BINARY},
+                   summary='Export the images, masks, LabelMe annotations and metrics of a dataset')
+    @action(detail=True, methods=['get'], url_path='export')
+    def export(self, request: HttpRequest, pk: int = None) -> HttpResponse:
+        dataset = self.get_object()
+
+        version, last_modified = get_dataset_version(dataset)
+        not_modified = check_conditions(request, version, last_modified)
+        if not_modified is not None:
+            return not_modified
+
+        name = f'{get_artifact_root(dataset.id)}/archive/{version}.zip'
+        if default_storage.exists(name):
+            response = FileResponse(default_storage.open(name, 'rb'), content_type='application/zip')
+        else:
+            response = StreamingHttpResponse(stream_artifact(name, stream_dataset_archive(dataset)),
+                                             content_type='application/zip')
+
+        response['Content-Disposition'] = f'attachment; filename={slugify(dataset.name) or dataset.id}.zip'
+
+        return set_validators(response, version, last_modified, dataset.public)
+
+    @extend_schema(parameters=[DatasetAnalyticsSerializer], responses={200: OpenApiTypes.OBJECT},
+                   summary='Summarize the metrics of the masks of a dataset')
+    @action(detail=True, methods=['get'], url_path='analytics')
+    def analytics(self, request: HttpRequest, pk: int = None) -> Response:
+        dataset = self.get_object()
+
+        serializer = DatasetAnalyticsSerializer(data=request.query_params)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(get_analytics(dataset, **serializer.validated_data), status=status.HTTP_200_OK)
+
+    def perform_destroy(self, instance: Dataset) -> None:
+        delete_pyramids(instance.id)
+        delete_artifacts(instance.id)
+
+        instance.delete()
+
     def get_queryset(self) -> QuerySet[Dataset]:
         if self.request.user.is_anonymous:
             return self.queryset.filter(public=True)
@@ -78,6 +132,48 @@ class PictureViewSet(viewsets.ModelViewSet):
         serializer.save(dataset=dataset)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
+    def retrieve(self, request: HttpRequest, dataset_pk: int = None, pk: int = None) -> Response:
+        picture = self.get_object()
+
+        version = get_version('picture', picture.id, picture.updated, request.accepted_renderer.format)
+        not_modified = check_conditions(request, version, picture.updated)
+        if not_modified is not None:
+            return not_modified
+
+        return set_validators(Response(self.get_serializer(picture).data, status=status.HTTP_200_OK), version,
+                              picture.updated, picture.public)
+
+    @extend_schema(request=BulkUploadSerializer, responses={201: OpenApiTypes.OBJECT},
+                   summary='Upload multiple images, or zip and tar archives of images')
+    @action(detail=False, methods=['post'], url_path='upload', parser_classes=[MultiPartParser],
+            serializer_class=BulkUploadSerializer)
+    def bulk_upload(self, request: HttpRequest, dataset_pk: int = None) -> Response:
+        dataset = Dataset.objects.filter(pk=dataset_pk, owner=request.user).first()
+
+        if dataset is None:
+            return Response({'detail': 'Dataset does not exist.'}, status=status.HTTP_404_NOT_FOUND)
+
+        serializer = BulkUploadSerializer(data=request.data, context=self.get_serializer_context())
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        pictures, errors = ingest_pictures(dataset, iter_uploads(serializer.validated_data['images']))
+
+        if not pictures:
+            return Response({'detail': 'No valid images were uploaded.', 'errors': errors},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        job = None
+        if serializer.validated_data['predict']:
+            job = queue_prediction(dataset, pictures, request.user, serializer.validated_data['threshold'],
+                                   serializer.validated_data['model'])
+
+        return Response({
+            'pictures': PictureSerializer(pictures, many=True, context=self.get_serializer_context()).data,
+            'errors': errors,
+            'job': PredictionJobSerializer(job).data if job is not None else None,
+        }, status=status.HTTP_201_CREATED)
+
     @extend_schema(summary='Delete multiple images',
                    parameters=[OpenApiParameter(name='ids', type=str, location='query', required=True)])
     def bulk_destroy(self, request: HttpRequest, dataset_pk: int = None, format: str = None) -> Response:
@@ -87,6 +183,8 @@ class PictureViewSet(viewsets.ModelViewSet):
         if len(ids) != len(images):
             return Response({'detail': 'Some images do not exist.'}, status=status.HTTP_400_BAD_REQUEST)
 
+        delete_pyramids(dataset_pk, ids)
+        delete_artifacts(dataset_pk, ids)
         images.delete()
 
         return Response(status=status.HTTP_204_NO_CONTENT)
@@ -106,27 +204,16 @@ class PictureViewSet(viewsets.ModelViewSet):
         if len(ids) != len(images):
             return Response({'detail': 'Some images do not exist.'}, status=status.HTTP_400_BAD_REQUEST)
 
-        for image in images:
-            if hasattr(image, 'mask') and image.mask is not None:
-                return Response({'detail': 'Mask already exists for some images.'}, status=status.HTTP_400_BAD_REQUEST)
+        if images.filter(mask__isnull=False).exists():
+            return Response({'detail': 'Mask already exists for some images.'}, status=status.HTTP_400_BAD_REQUEST)
 
-        area_threshold = int(request.data.get('threshold', 0))
-
-        masks = []
-        for image in images:
-            mask = predict(ProcessingConfig.model, image.image, area_threshold)
-
-            mask_arr = np.array(mask) / 255
-            mask_arr = mask_arr.astype(np.uint8)
-
-            metrics = calculate_metrics(mask_arr, 0.2581)
+        serializer = MaskSerializer(data=request.data, context=self.get_serializer_context())
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-            mask_byte_arr = io.BytesIO()
-            mask.save(mask_byte_arr, format='PNG')
+        area_threshold = serializer.validated_data['threshold']
 
-            mask = File(mask_byte_arr, name=f'{image.filename_noext}_mask.png')
-            masks.append(Mask(picture=image, image=mask,
-                         threshold=area_threshold, **metrics))
+        masks = predict_masks(list(images), area_threshold, serializer.validated_data.get('model'))
 
         masks = Mask.objects.bulk_create(masks)
 
@@ -150,17 +237,60 @@ class PictureViewSet(viewsets.ModelViewSet):
 
         predictions = Mask.objects.filter(
             picture__dataset=dataset_pk, picture__id__in=ids)
+        delete_pyramids(dataset_pk, ids, 'masks')
+        delete_artifacts(dataset_pk, ids)
         predictions.delete()
 
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+    @extend_schema(responses={200: OpenApiTypes.OBJECT},
+                   summary='Describe the tile pyramid of an image as a Deep Zoom image')
+    @action(detail=True, methods=['get'], url_path='tiles')
+    def tiles(self, request: HttpRequest, dataset_pk: int = None, pk: int = None) -> Response:
+        picture = self.get_object()
+
+        return Response(get_descriptor(picture, request.build_absolute_uri(request.path)), status=status.HTTP_200_OK)
+
+    @extend_schema(responses={(200, 'image/*'): OpenApiTypes.BINARY}, summary='Retrieve a tile of an image',
+                   parameters=[OpenApiParameter(name=name, type=int, location='path')
+                               for name in ['level', 'column', 'row']])
+    def tile(self, request: HttpRequest, dataset_pk: int = None, pk: int = None, level: str = None,
+             column: str = None, row: str = None, extension: str = None) -> FileResponse:
+        picture = self.get_object()
+
+        tile_extension, _, content_type = TILE_FORMATS['pictures']
+        if extension != tile_extension:
+            return Response({'detail': 'Tile does not exist.'}, status=status.HTTP_404_NOT_FOUND)
+
+        version = get_version('tile', get_pyramid_path(picture), level, column, row)
+        not_modified = check_conditions(request, version, picture.updated)
+        if not_modified is not None:
+            return not_modified
+
+        try:
+            tile = get_tile(picture, int(level), int(column), int(row))
+        except ValueError:
+            return Response({'detail': 'Tile does not exist.'}, status=status.HTTP_404_NOT_FOUND)
+
+        response = FileResponse(default_storage.open(tile, 'rb'), content_type=content_type)
+
+        return set_validators(response, version, picture.updated, picture.public)
+
+    def perform_destroy(self, instance: Picture) -> None:
+        delete_pyramids(instance.dataset_id, [instance.id])
+        delete_artifacts(instance.dataset_id, [instance.id])
+
+        instance.delete()
+
     def get_queryset(self) -> QuerySet[Picture]:
+        queryset = self.queryset.select_related('dataset')
+
         if self.request.user.is_anonymous:
-            return self.queryset.filter(dataset=self.kwargs['dataset_pk'], public=True)
+            return queryset.filter(dataset=self.kwargs['dataset_pk'], dataset__public=True)
 
         is_owner_or_public = Q(dataset__owner=self.request.user) | Q(dataset__public=True)
 
-        return self.queryset.filter(is_owner_or_public, dataset=self.kwargs['dataset_pk'])
+        return queryset.filter(is_owner_or_public, dataset=self.kwargs['dataset_pk'])
 
 
 @extend_schema(tags=['masks'])
@@ -179,11 +309,23 @@ class MaskViewSet(viewsets.ModelViewSet):
     http_method_names = ['get', 'post', 'delete', 'patch']
 
     def list(self, request: HttpRequest, dataset_pk: int = None, image_pk: int = None) -> Response:
-        queryset = self.queryset.filter(picture=image_pk)
+        queryset = self.get_queryset()
 
         serializer = self.get_serializer(queryset, many=True)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
+    def retrieve(self, request: HttpRequest, dataset_pk: int = None, image_pk: int = None,
+                 pk: int = None) -> Response:
+        mask = self.get_object()
+
+        version = get_version('mask', mask.id, mask.updated, request.accepted_renderer.format)
+        not_modified = check_conditions(request, version, mask.updated)
+        if not_modified is not None:
+            return not_modified
+
+        return set_validators(Response(self.get_serializer(mask).data, status=status.HTTP_200_OK), version,
+                              mask.updated, mask.public)
+
     def create(self, request, dataset_pk=None, image_pk=None) -> Response:
         original = Picture.objects.get(pk=image_pk)
 
@@ -196,19 +338,10 @@ class MaskViewSet(viewsets.ModelViewSet):
 
         area_threshold = serializer.validated_data['threshold']
 
-        image = predict(ProcessingConfig.model, original.image, area_threshold)
-
-        mask_arr = np.array(image) / 255
-        mask_arr = mask_arr.astype(np.uint8)
-
-        metrics = calculate_metrics(mask_arr, 0.2581)
-
-        mask_byte_arr = io.BytesIO()
-        image.save(mask_byte_arr, format='PNG')
+        mask = predict_masks([original], area_threshold, serializer.validated_data.get('model'))[0]
+        mask.save()
 
-        mask = File(mask_byte_arr, name=original.filename)
-        serializer.save(picture=original, image=mask, **metrics)
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
+        return Response(self.get_serializer(mask).data, status=status.HTTP_201_CREATED)
 
     def partial_update(self, request: HttpRequest, dataset_pk: int = None,
                        image_pk: int = None, pk: int = None) -> Response:
@@ -218,29 +351,38 @@ class MaskViewSet(viewsets.ModelViewSet):
         if not serializer.is_valid():
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-        area_threshold = serializer.validated_data['threshold']
+        area_threshold = serializer.validated_data.get('threshold', original_mask.threshold)
+        model = serializer.validated_data.get('model', original_mask.model)
 
-        image = predict(ProcessingConfig.model,
-                        original_mask.picture.image, area_threshold)
+        network, model_name, model_version = registry.get(model)
+        with use_model_type(get_model_type(network)):
+            probability_map = get_probability_map(original_mask.picture, network, model_name, model_version)
+            image = segmentation.threshold_probabilities(probability_map, area_threshold)
 
-        mask_arr = np.array(image) / 255
-        mask_arr = mask_arr.astype(np.uint8)
+            mask_arr = np.array(image) // 255
 
-        metrics = calculate_metrics(np.array(mask_arr, dtype=np.uint8), 0.2581)
+            metrics = segmentation.calculate_metrics(mask_arr, 0.2581)
 
         mask_byte_arr = io.BytesIO()
         image.save(mask_byte_arr, format='PNG')
 
-        original_mask.image = File(mask_byte_arr)
+        previous_image = original_mask.image.name
+        original_mask.image.save(f'{original_mask.picture.filename_noext}_mask.png', File(mask_byte_arr), save=False)
+        original_mask.contours = find_contours(mask_arr)
         original_mask.threshold = area_threshold
+        original_mask.model = model
+        original_mask.model_version = model_version
         original_mask.root_count = metrics['root_count']
         original_mask.average_root_diameter = metrics['average_root_diameter']
         original_mask.total_root_length = metrics['total_root_length']
         original_mask.total_root_area = metrics['total_root_area']
         original_mask.total_root_volume = metrics['total_root_volume']
-        new_mask = original_mask.save()
+        original_mask.save()
+
+        if previous_image:
+            transaction.on_commit(lambda: default_storage.delete(previous_image))
 
-        serializer = self.get_serializer(new_mask)
+        serializer = self.get_serializer(original_mask)
 
         return Response(serializer.data, status=status.HTTP_200_OK)
 
@@ -261,18 +403,17 @@ class MaskViewSet(viewsets.ModelViewSet):
         labelme_data = json.loads(
             serializer.validated_data['json'].read().decode('utf-8'))
 
-        mask = masks.from_labelme(np.array(image), labelme_data)
+        mask = segmentation.masks.from_labelme(np.array(image), labelme_data)
 
-        mask_arr = np.array(mask) / 255
-        mask_arr = mask_arr.astype(np.uint8)
-        metrics = calculate_metrics(mask_arr, 0.2581)
+        mask_arr = np.array(mask) // 255
+        metrics = segmentation.calculate_metrics(mask_arr, 0.2581)
 
         mask_image = PILImage.fromarray(mask_arr)
         mask_byte_arr = io.BytesIO()
         mask_image.save(mask_byte_arr, format='PNG')
         mask = File(mask_byte_arr, name=original.filename)
 
-        instance = serializer.save(picture=original, image=mask, **metrics)
+        instance = serializer.save(picture=original, image=mask, contours=find_contours(mask_arr), **metrics)
         instance_serializer = MaskSerializer(instance)
 
         return Response(instance_serializer.data, status=status.HTTP_201_CREATED)
@@ -282,37 +423,70 @@ class MaskViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['get'], url_path='labelme')
     def export_labelme(self, request: HttpRequest, dataset_pk: int = None,
                        image_pk: int = None, pk: int = None) -> HttpResponse:
-        prediction = Mask.objects.get(pk=pk)
+        prediction = self.get_object()
+        picture = prediction.picture
+
+        version = get_version('labelme', prediction.id, prediction.updated, picture.id, picture.updated)
+        not_modified = check_conditions(request, version, prediction.updated)
+        if not_modified is not None:
+            return not_modified
+
+        name = get_artifact(f'{get_artifact_root(picture.dataset_id, picture.id)}/labelme/{version}.zip',
+                            lambda: build_labelme_archive(picture, prediction))
+
+        response = FileResponse(default_storage.open(name, 'rb'), content_type='application/octet-stream')
+        response['Content-Disposition'] = f'attachment; filename={picture.filename_noext}_labelme.zip'
+
+        return set_validators(response, version, prediction.updated, picture.public)
+
+    @extend_schema(responses={200: OpenApiTypes.OBJECT},
+                   summary='Describe the tile pyramid of a prediction as a Deep Zoom image')
+    @action(detail=True, methods=['get'], url_path='tiles')
+    def tiles(self, request: HttpRequest, dataset_pk: int = None, image_pk: int = None, pk: int = None) -> Response:
+        mask = self.get_object()
+
+        return Response(get_descriptor(mask, request.build_absolute_uri(request.path)), status=status.HTTP_200_OK)
+
+    @extend_schema(responses={(200, 'image/*'): OpenApiTypes.BINARY}, summary='Retrieve a tile of a prediction',
+                   parameters=[OpenApiParameter(name=name, type=int, location='path')
+                               for name in ['level', 'column', 'row']])
+    def tile(self, request: HttpRequest, dataset_pk: int = None, image_pk: int = None, pk: int = None,
+             level: str = None, column: str = None, row: str = None, extension: str = None) -> FileResponse:
+        mask = self.get_object()
 
-        image = PILImage.open(prediction.picture.image)
-        mask = PILImage.open(prediction.image).convert('L')
+        tile_extension, _, content_type = TILE_FORMATS['masks']
+        if extension != tile_extension:
+            return Response({'detail': 'Tile does not exist.'}, status=status.HTTP_404_NOT_FOUND)
 
-        mask_arr = np.array(mask) / 255
-        mask_arr = mask_arr.astype(np.uint8)
+        version = get_version('tile', get_pyramid_path(mask), level, column, row)
+        not_modified = check_conditions(request, version, mask.updated)
+        if not_modified is not None:
+            return not_modified
 
-        labelme_data = masks.to_labelme(prediction.picture.filename, mask_arr)
+        try:
+            tile = get_tile(mask, int(level), int(column), int(row))
+        except ValueError:
+            return Response({'detail': 'Tile does not exist.'}, status=status.HTTP_404_NOT_FOUND)
 
-        outfile = io.BytesIO()
-        with zipfile.ZipFile(outfile, 'w') as zf:
-            with zf.open('labelme.json', 'w') as f:
-                f.write(labelme_data.encode('utf-8'))
+        response = FileResponse(default_storage.open(tile, 'rb'), content_type=content_type)
 
-            with zf.open(os.path.basename(prediction.picture.filename), 'w') as f:
-                image.save(f, format='PNG')
+        return set_validators(response, version, mask.updated, mask.public)
 
-        response = HttpResponse(
-            outfile.getvalue(), content_type='application/octet-stream')
-        response['Content-Disposition'] = f'attachment; filename={prediction.picture.filename_noext}_labelme.zip'
+    def perform_destroy(self, instance: Mask) -> None:
+        delete_pyramids(instance.picture.dataset_id, [instance.picture_id], 'masks')
+        delete_artifacts(instance.picture.dataset_id, [instance.picture_id])
 
-        return response
+        instance.delete()
 
     def get_queryset(self) -> QuerySet[Mask]:
+        queryset = self.queryset.select_related('picture__dataset')
+
         if self.request.user.is_anonymous:
-            return self.queryset.filter(picture=self.kwargs['image_pk'], public=True)
+            return queryset.filter(picture=self.kwargs['image_pk'], picture__dataset__public=True)
 
         is_owner_or_public = Q(picture__dataset__owner=self.request.user) | Q(picture__dataset__public=True)
 
-        return self.queryset.filter(is_owner_or_public, picture=self.kwargs['image_pk'],)
+        return queryset.filter(is_owner_or_public, picture=self.kwargs['image_pk'],)
 
     def get_serializer_class(self) -> Serializer:
         if self.action == 'create_labelme':
@@ -320,6 +494,76 @@ class MaskViewSet(viewsets.ModelViewSet):
         return MaskSerializer
 
 
+@extend_schema(tags=['jobs'])
+@extend_schema_view(
+    list=extend_schema(summary='List all prediction jobs for a dataset'),
+    create=extend_schema(summary='Queue masks to be predicted for multiple images',
+                         parameters=[OpenApiParameter(name='ids', type=str, location='query', required=True)]),
+    retrieve=extend_schema(summary='Retrieve the progress of a prediction job'),
+)
+class PredictionJobViewSet(viewsets.ModelViewSet):
+    serializer_class = PredictionJobSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    queryset = PredictionJob.objects.all()
+    http_method_names = ['get', 'post']
+
+    def create(self, request: HttpRequest, dataset_pk: int = None) -> Response:
+        image_ids = request.query_params.get('ids')
+
+        if image_ids is None:
+            return Response({'detail': 'No image ids provided.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        dataset = Dataset.objects.filter(pk=dataset_pk, owner=request.user).first()
+
+        if dataset is None:
+            return Response({'detail': 'Dataset does not exist.'}, status=status.HTTP_404_NOT_FOUND)
+
+        ids = [int(id) for id in image_ids.split(',')]
+        images = Picture.objects.filter(dataset=dataset, id__in=ids)
+
+        if len(ids) != len(images):
+            return Response({'detail': 'Some images do not exist.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        if images.filter(mask__isnull=False).exists():
+            return Response({'detail': 'Mask already exists for some images.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        serializer = self.get_serializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        serializer.save(dataset=dataset, owner=request.user, picture_ids=ids, total=len(ids))
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    @extend_schema(summary='List the masks a prediction job has saved so far',
+                   responses={200: MaskSerializer(many=True)})
+    @action(detail=True, methods=['get'], url_path='results')
+    def results(self, request: HttpRequest, dataset_pk: int = None, pk: int = None) -> Response:
+        job = self.get_object()
+
+        masks = Mask.objects.filter(picture__in=job.picture_ids, picture__dataset=job.dataset_id)
+
+        return Response(MaskSerializer(masks, many=True).data, status=status.HTTP_200_OK)
+
+    @extend_schema(request=None, summary='Cancel a prediction job')
+    @action(detail=True, methods=['post'], url_path='cancel')
+    def cancel(self, request: HttpRequest, dataset_pk: int = None, pk: int = None) -> Response:
+        job = self.get_object()
+
+        cancelled = self.queryset.filter(
+            pk=job.pk, status__in=[PredictionJob.PENDING, PredictionJob.RUNNING]).update(
+                status=PredictionJob.CANCELLED, updated=timezone.now())
+
+        if not cancelled:
+            return Response({'detail': f'Job is already {job.status}.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        job.refresh_from_db()
+
+        return Response(self.get_serializer(job).data, status=status.HTTP_200_OK)
+
+    def get_queryset(self) -> QuerySet[PredictionJob]:
+        return self.queryset.filter(dataset=self.kwargs['dataset_pk'], owner=self.request.user)
+
+
 @extend_schema(tags=['models'])
 @extend_schema_view(
     list=extend_schema(summary='List all models'),
@@ -342,6 +586,12 @@ class ModelViewSet(viewsets.ModelViewSet):
         serializer.save(owner=request.user)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
+    def perform_destroy(self, instance: Model) -> None:
+        registry.discard(instance)
+        invalidate_probability_maps(get_model_name(instance))
+
+        instance.delete()
+
     def get_queryset(self) -> QuerySet[Model]:
         if self.request.user.is_anonymous:
             return self.queryset.filter(public=True)
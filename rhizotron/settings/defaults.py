@@ -89,6 +89,33 @@ MEDIA_ROOT = BASE_DIR / 'media'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+PROBABILITY_CACHE_MAX_BYTES = 1024 ** 3
+
+DEFAULT_MODEL_CHECKPOINT = BASE_DIR / 'segmentation' / 'models' / 'saved_models' / 'unet_saved_v2.pth'
+MODEL_REGISTRY_MAX_BYTES = 1024 ** 3
+INFERENCE_BACKEND = 'eager'
+INFERENCE_PRECISION = 'fp32'
+INFERENCE_CALIBRATION_DIR = None
+INFERENCE_CALIBRATION_IMAGES = 16
+INFERENCE_MEMORY_BUDGET = None
+INFERENCE_TILE_OVERLAP = 32
+WARM_UP_MODELS = True
+
+PREDICTION_BATCH_SIZE = 8
+PREDICTION_WORKERS = 2
+
+PREDICTION_JOB_CHUNK_SIZE = 32
+PREDICTION_JOB_STALE_SECONDS = 300
+PREDICTION_JOB_POLL_SECONDS = 5
+
+ANALYTICS_CACHE_SECONDS = 24 * 60 * 60
+
+PYRAMID_TILE_SIZE = 256
+
+BULK_UPLOAD_BATCH_SIZE = 100
+BULK_UPLOAD_MAX_FILES = 5000
+DATA_UPLOAD_MAX_NUMBER_FILES = BULK_UPLOAD_MAX_FILES
+
 REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.DjangoModelPermissionsOrAnonReadOnly',
@@ -1,3 +1,28 @@
-from .utils import file_management, masks
-from .utils.root_analysis import calculate_metrics
-from .utils.predict import predict
+import importlib
+
+# The submodules pull in torch, torchvision, OpenCV and scikit-image, so they are only imported on first use.
+_attributes = {
+    'file_management': ('.utils.file_management', None),
+    'masks': ('.utils.masks', None),
+    'calculate_metrics': ('.utils.root_analysis', 'calculate_metrics'),
+    'predict': ('.utils.predict', 'predict'),
+    'predict_probabilities': ('.utils.predict', 'predict_probabilities'),
+    'predict_probabilities_batched': ('.utils.predict', 'predict_probabilities_batched'),
+    'threshold_probabilities': ('.utils.predict', 'threshold_probabilities'),
+}
+
+__all__ = list(_attributes)
+
+
+def __getattr__(name: str):
+    if name not in _attributes:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+    module_name, attribute = _attributes[name]
+    value = importlib.import_module(module_name, __name__)
+
+    if attribute is not None:
+        value = getattr(value, attribute)
+
+    globals()[name] = value
+    return value
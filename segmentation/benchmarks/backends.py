@@ -0,0 +1,69 @@
+import tempfile
+from pathlib import Path
+
+import torch
+
+from segmentation.models import ModelType
+from segmentation.utils.backends import (BACKENDS, ARTIFACT_SUFFIXES, export_onnx, export_torchscript, load_backend,
+                                         check_parity, measure_latency)
+from .synthetic import generate_root_image
+
+
+def benchmark_backends(model_type: ModelType = ModelType.UNET,
+                       sizes: list[tuple[int, int]] = ((512, 512), (1024, 1024)), batch_size: int = 1,
+                       repeats: int = 5) -> list[dict]:
+    """
+    Exports an untrained model to every backend and compares their latency and outputs against eager PyTorch.
+
+    Backends whose runtime is not installed are reported as unavailable instead of failing the benchmark.
+
+    Parameters:
+        model_type (ModelType, optional): The architecture to benchmark. Defaults to UNet.
+        sizes (list[tuple[int, int]], optional): The image sizes to time. Defaults to 512x512 and 1024x1024.
+        batch_size (int, optional): The number of images in a forward pass. Defaults to 1.
+        repeats (int, optional): The number of timed passes per backend and size. Defaults to 5.
+
+    Returns:
+        list[dict]: One result per backend and size, with the median latency in seconds, the speedup over eager
+        and the parity of the outputs.
+    """
+
+    model = model_type.get_model(3, 1).eval()
+    example = torch.rand(1, 3, model_type.input_multiple * 4, model_type.input_multiple * 4)
+
+    with tempfile.TemporaryDirectory() as directory:
+        models = {'eager': model}
+        for backend, export in (('torchscript', export_torchscript), ('onnx', export_onnx)):
+            artifact_path = Path(directory, 'model').with_suffix(ARTIFACT_SUFFIXES[backend])
+
+            try:
+                export(model, artifact_path, example)
+                models[backend] = load_backend(backend, model_type, artifact_path)
+            except ImportError as e:
+                models[backend] = e
+
+        results = []
+        for height, width in sizes:
+            images = torch.stack([
+                torch.from_numpy(generate_root_image(height, width, density=20, seed=index)).permute(2, 0, 1) / 255
+                for index in range(batch_size)])
+
+            eager_seconds = measure_latency(model, images, repeats)
+
+            for backend in BACKENDS:
+                result = {'backend': backend, 'size': f'{height}x{width}', 'batch_size': batch_size}
+
+                if isinstance(models[backend], ImportError):
+                    results.append({**result, 'unavailable': str(models[backend])})
+                    continue
+
+                seconds = eager_seconds if backend == 'eager' else measure_latency(models[backend], images, repeats)
+
+                results.append({
+                    **result,
+                    'seconds': round(seconds, 4),
+                    'speedup': round(eager_seconds / seconds, 2),
+                    **check_parity(model, models[backend], images),
+                })
+
+    return results
@@ -0,0 +1,83 @@
+import io
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image as PILImage
+from torch import nn
+
+from segmentation.models import ModelType
+from segmentation.utils import predict
+from segmentation.utils.root_analysis import calculate_metrics
+from .synthetic import generate_root_image
+
+
+def _postprocess(probability_map: np.ndarray, area_threshold: int) -> tuple[dict, bytes]:
+    mask = predict.threshold_probabilities(probability_map, area_threshold)
+    metrics = calculate_metrics(np.array(mask) // 255, 0.2581)
+
+    mask_bytes = io.BytesIO()
+    mask.save(mask_bytes, format='PNG')
+
+    return metrics, mask_bytes.getvalue()
+
+
+def _write_images(directory: str, image_count: int, sizes: list[tuple[int, int]]) -> list[str]:
+    image_paths = []
+    for index in range(image_count):
+        height, width = sizes[index % len(sizes)]
+        image_path = os.path.join(directory, f'{index}.png')
+        PILImage.fromarray(generate_root_image(height, width, density=20, seed=index)).save(image_path)
+        image_paths.append(image_path)
+
+    return image_paths
+
+
+def benchmark_bulk_predict(model: nn.Module = None, image_count: int = 200,
+                           sizes: list[tuple[int, int]] = ((256, 256), (256, 384)), batch_size: int = 8,
+                           workers: int = 2, area_threshold: int = 15) -> list[dict]:
+    """
+    Times bulk prediction one image at a time against batched inference with overlapped post-processing.
+
+    Parameters:
+        model (nn.Module, optional): The model to run. Defaults to an untrained UNet.
+        image_count (int, optional): The number of images in the request. Defaults to 200.
+        sizes (list[tuple[int, int]], optional): The image sizes to cycle through. Defaults to two sizes.
+        batch_size (int, optional): The largest number of images in a forward pass. Defaults to 8.
+        workers (int, optional): The number of post-processing threads. Defaults to 2.
+        area_threshold (int, optional): The threshold for filtering small regions in the masks. Defaults to 15.
+
+    Returns:
+        list[dict]: One result per mode, with the total time in seconds and the throughput in images per second.
+    """
+
+    if model is None:
+        model = ModelType.UNET.get_model(3, 1)
+    model.eval()
+
+    with tempfile.TemporaryDirectory() as directory:
+        image_paths = _write_images(directory, image_count, sizes)
+
+        start = time.perf_counter()
+        for image_path in image_paths:
+            _postprocess(predict.predict_probabilities(model, image_path), area_threshold)
+        sequential_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(_postprocess, probability_map, area_threshold)
+                for _, probability_map in predict.predict_probabilities_batched(model, image_paths, batch_size)
+            ]
+            for future in futures:
+                future.result()
+        batched_seconds = time.perf_counter() - start
+
+    return [
+        {'mode': 'sequential', 'images': image_count, 'seconds': sequential_seconds,
+         'images_per_second': image_count / sequential_seconds},
+        {'mode': 'batched', 'images': image_count, 'batch_size': batch_size, 'workers': workers,
+         'seconds': batched_seconds, 'images_per_second': image_count / batched_seconds},
+    ]
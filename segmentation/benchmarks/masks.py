@@ -0,0 +1,112 @@
+import time
+
+import numpy as np
+import cv2
+
+from segmentation.utils import masks
+from .synthetic import generate_fragment_mask, shape_for_megapixels
+
+
+def contour_threshold(mask: np.ndarray, threshold_area: int = 50) -> np.ndarray:
+    """
+    Applies the area threshold by walking the contour hierarchy and drawing every kept contour and hole.
+
+    This is the original contour-based filter, kept as the reference for ``masks.threshold``. Its areas are those
+    of the polygons through the border pixels, so single pixels and one pixel wide lines have no area, and filling
+    the holes also clears the pixels around them and the components inside them.
+
+    Parameters:
+        mask (np.ndarray): Binary mask image.
+        threshold_area (int, optional): Minimum contour area threshold. Defaults to 50.
+
+    Returns:
+        np.ndarray: Thresholded mask image.
+    """
+
+    output_contours, hierarchy = cv2.findContours(mask, cv2.RETR_CCOMP, cv2.CHAIN_APPROX_NONE)
+
+    if len(output_contours) == 0:
+        return mask
+
+    hierarchy = hierarchy.squeeze(0)
+
+    threshold_contours = []
+    threshold_heirarchy = []
+    for i in range(len(output_contours)):
+        if hierarchy[i][3] != -1:
+            continue
+
+        current_index = hierarchy[i][2]
+        contour_area = cv2.contourArea(output_contours[i])
+        while current_index != -1:
+            contour_area -= cv2.contourArea(output_contours[current_index])
+            current_index = hierarchy[current_index][0]
+
+        if contour_area < threshold_area:
+            continue
+
+        threshold_contours.append(output_contours[i])
+        threshold_heirarchy.append(hierarchy[i])
+
+        current_index = hierarchy[i][2]
+        while current_index != -1:
+            threshold_contours.append(output_contours[current_index])
+            threshold_heirarchy.append(hierarchy[current_index])
+            current_index = hierarchy[current_index][0]
+
+    thresholded_mask = np.zeros(mask.shape, dtype=np.uint8)
+
+    for i in range(len(threshold_contours)):
+        if threshold_heirarchy[i][3] != -1:
+            continue
+
+        cv2.drawContours(thresholded_mask, threshold_contours, i, 255, cv2.FILLED)
+
+    for i in range(len(threshold_contours)):
+        if threshold_heirarchy[i][3] == -1:
+            continue
+
+        cv2.drawContours(thresholded_mask, threshold_contours, i, 0, cv2.FILLED)
+
+    return thresholded_mask
+
+
+def benchmark_threshold(megapixels: list[float], fragments_per_megapixel: int = 10000,
+                        threshold_area: int = 15) -> list[dict]:
+    """
+    Times the connected component area filter against the contour-based reference on masks made of many small
+    fragments.
+
+    Parameters:
+        megapixels (list[float]): The mask sizes to run, in millions of pixels.
+        fragments_per_megapixel (int, optional): The number of fragments drawn per million pixels. Defaults to
+            10,000.
+        threshold_area (int, optional): The minimum area of the kept fragments. Defaults to 15.
+
+    Returns:
+        list[dict]: One result per size, with timings in seconds and the number of pixels on which both filters
+        disagree.
+    """
+
+    results = []
+    for size in megapixels:
+        mask = generate_fragment_mask(*shape_for_megapixels(size), int(size * fragments_per_megapixel))
+
+        start = time.perf_counter()
+        thresholded = masks.threshold(mask, threshold_area)
+        components_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        reference = contour_threshold(mask, threshold_area)
+        reference_seconds = time.perf_counter() - start
+
+        results.append({
+            'megapixels': size,
+            'components': cv2.connectedComponents(mask)[0] - 1,
+            'components_seconds': components_seconds,
+            'reference_seconds': reference_seconds,
+            'speedup': reference_seconds / components_seconds,
+            'differing_pixels': int(np.count_nonzero(thresholded != reference)),
+        })
+
+    return results
@@ -0,0 +1,49 @@
+import numpy as np
+import torch
+
+from segmentation.models import ModelType
+from segmentation.utils.backends import load_eager
+from segmentation.utils.precision import PRECISIONS, validate_precision
+from .synthetic import generate_root_image, generate_root_mask
+
+
+def benchmark_precision(model_type: ModelType = ModelType.UNET, checkpoint: str = None, size: int = 512,
+                        image_count: int = 4, calibration_count: int = 8, density: float = 20,
+                        mask_threshold: float = 1.0, repeats: int = 3) -> list[dict]:
+    """
+    Validates every reduced-precision mode against float32 on synthetic scans with known root masks.
+
+    Parameters:
+        model_type (ModelType, optional): The architecture to validate. Defaults to UNet.
+        checkpoint (str, optional): The weights to load. Defaults to an untrained model.
+        size (int, optional): The height and width of the images. Defaults to 512.
+        image_count (int, optional): The number of validation images. Defaults to 4.
+        calibration_count (int, optional): The number of images to calibrate int8 quantization with. Defaults to 8.
+        density (float, optional): The number of roots per 100,000 pixels. Defaults to 20.
+        mask_threshold (float, optional): The probability from which a pixel is a root. Defaults to 1, the rule
+        used by the API.
+        repeats (int, optional): The number of timed forward passes. Defaults to 3.
+
+    Returns:
+        list[dict]: One result per precision, see ``validate_precision``.
+    """
+
+    if checkpoint is None:
+        model = model_type.get_model(3, 1).eval()
+    else:
+        model = load_eager(model_type, checkpoint)
+
+    def to_tensor(image: np.ndarray) -> torch.Tensor:
+        return torch.from_numpy(image).permute(2, 0, 1).float() / 255
+
+    images = torch.stack([to_tensor(generate_root_image(size, size, density, seed=index))
+                          for index in range(image_count)])
+    masks = np.stack([generate_root_mask(size, size, density, seed=index) > 0 for index in range(image_count)])
+
+    calibration_images = [to_tensor(generate_root_image(size, size, density, seed=image_count + index))
+                          for index in range(calibration_count)]
+
+    return [
+        validate_precision(model, model_type, precision, images, masks, calibration_images, mask_threshold, repeats)
+        for precision in PRECISIONS if precision != 'fp32'
+    ]
@@ -0,0 +1,120 @@
+import time
+
+import numpy as np
+import cv2
+from skimage.morphology import skeletonize
+
+from segmentation.utils import root_analysis
+from .synthetic import generate_fragment_mask, generate_root_mask, shape_for_megapixels
+
+
+def brute_force_root_radii(image: np.ndarray) -> np.ndarray:
+    """
+    Calculates the root radius at every skeleton pixel by comparing it against every contour point.
+
+    This is the original O(skeleton x contour) search, kept as the reference for ``root_analysis.find_root_radii``.
+
+    Parameters:
+    image (numpy.ndarray): The root image.
+
+    Returns:
+    numpy.ndarray: The unscaled radius at each skeleton pixel, in row-major order.
+    """
+
+    skeleton = skeletonize(image).astype(np.uint8)
+
+    image_contours, _ = cv2.findContours(image, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_NONE)
+
+    y, x = np.where(skeleton == 1)
+
+    if len(x) == 0:
+        return np.zeros(0)
+
+    image_contour_points = np.vstack(image_contours).squeeze(axis=1)
+
+    radii = []
+    for point in zip(x, y):
+        point = np.array(point)[np.newaxis, :]
+        distances = np.linalg.norm(image_contour_points - point, axis=1)
+        radii.append(np.min(distances))
+
+    return np.array(radii)
+
+
+def benchmark_root_radii(megapixels: list[float], reference_max_megapixels: float = 1,
+                         density: float = 1.0) -> list[dict]:
+    """
+    Times the distance transform radii against the brute-force reference on synthetic masks.
+
+    Parameters:
+    megapixels (list[float]): The mask sizes to run, in millions of pixels.
+    reference_max_megapixels (float, optional): The largest size the brute-force reference is run on. Defaults to 1.
+    density (float, optional): The number of roots per 100,000 pixels. Defaults to 1.
+
+    Returns:
+    list[dict]: One result per size, with timings in seconds. Reference timings are None when skipped.
+    """
+
+    results = []
+    for size in megapixels:
+        mask = generate_root_mask(*shape_for_megapixels(size), density=density)
+        skeleton = skeletonize(mask)
+
+        start = time.perf_counter()
+        radii = root_analysis.find_root_radii(mask, skeleton=skeleton)
+        distance_transform_seconds = time.perf_counter() - start
+
+        reference_seconds = None
+        max_error = None
+        if size <= reference_max_megapixels:
+            start = time.perf_counter()
+            reference = brute_force_root_radii(mask)
+            reference_seconds = time.perf_counter() - start
+            max_error = float(np.max(np.abs(reference - radii), initial=0))
+
+        results.append({
+            'megapixels': size,
+            'skeleton_pixels': int(np.count_nonzero(skeleton)),
+            'distance_transform_seconds': distance_transform_seconds,
+            'reference_seconds': reference_seconds,
+            'speedup': reference_seconds / distance_transform_seconds if reference_seconds is not None else None,
+            'max_error': max_error,
+        })
+
+    return results
+
+
+def benchmark_root_table(megapixels: list[float], fragments_per_megapixel: int = 10000) -> list[dict]:
+    """
+    Times the per-root table on synthetic masks made of many small fragments.
+
+    Parameters:
+    megapixels (list[float]): The mask sizes to run, in millions of pixels.
+    fragments_per_megapixel (int, optional): The number of fragments drawn per million pixels. Defaults to 10,000.
+
+    Returns:
+    list[dict]: One result per size, with timings in seconds.
+    """
+
+    results = []
+    for size in megapixels:
+        mask = generate_fragment_mask(*shape_for_megapixels(size), int(size * fragments_per_megapixel))
+        root_image = root_analysis.RootImage(mask)
+
+        start = time.perf_counter()
+        root_image.skeleton
+        root_image.distance_map
+        intermediates_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        table = root_analysis.find_root_table(root_image, 1.0)
+        table_seconds = time.perf_counter() - start
+
+        results.append({
+            'megapixels': size,
+            'roots': len(table),
+            'intermediates_seconds': intermediates_seconds,
+            'table_seconds': table_seconds,
+        })
+
+    return results
@@ -0,0 +1,87 @@
+import json
+import os
+import subprocess
+import sys
+import time
+
+HEAVY_MODULES = ('torch', 'torchvision', 'lightning', 'cv2', 'skimage')
+
+ENTRY_POINTS = {
+    'import segmentation': 'import segmentation',
+    'django.setup': 'import django; django.setup()',
+    'url configuration': (
+        'import django; django.setup(); from django.urls import get_resolver; get_resolver().url_patterns'),
+    'wsgi': 'from django.core.wsgi import get_wsgi_application; get_wsgi_application()',
+    'wsgi with warm-up': 'import rhizotron.wsgi; from processing.model_registry import registry; registry.warm_up()',
+}
+
+_SCRIPT = '''
+import json, sys, time
+start = time.perf_counter()
+{code}
+seconds = time.perf_counter() - start
+print(json.dumps({{'seconds': seconds, 'modules': [m for m in {modules!r} if m in sys.modules]}}))
+'''
+
+
+def time_entry_point(code: str, settings_module: str) -> dict:
+    """
+    Runs an entry point in a fresh interpreter and times it.
+
+    Parameters:
+        code (str): The Python code of the entry point.
+        settings_module (str): The Django settings module to run it with.
+
+    Returns:
+        dict: The time spent in the entry point, the time including interpreter startup and the heavy modules
+            that ended up imported.
+    """
+
+    environment = dict(os.environ, DJANGO_SETTINGS_MODULE=settings_module)
+    script = _SCRIPT.format(code=code, modules=HEAVY_MODULES)
+
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, check=True,
+                            env=environment)
+    total_seconds = time.perf_counter() - start
+
+    measurement = json.loads(result.stdout.strip().splitlines()[-1])
+
+    return {'import_seconds': measurement['seconds'], 'total_seconds': total_seconds,
+            'heavy_modules': measurement['modules']}
+
+
+def benchmark_startup(entry_points: list[str] = None, repeats: int = 3) -> list[dict]:
+    """
+    Times how long each entry point of the project takes to start, in fresh interpreters.
+
+    The WSGI application is timed both without and with model warm-up, so that the boot time of a worker can be
+    told apart from the time it takes to load the default model and run it once.
+
+    Parameters:
+        entry_points (list[str], optional): The names of the entry points in ``ENTRY_POINTS``. Defaults to all.
+        repeats (int, optional): The number of runs per entry point, the fastest of which is reported. Defaults to 3.
+
+    Returns:
+        list[dict]: One result per entry point, with its import and total times in seconds and the heavy modules
+            it imports.
+    """
+
+    if entry_points is None:
+        entry_points = list(ENTRY_POINTS)
+
+    settings_module = os.environ.get('DJANGO_SETTINGS_MODULE', 'rhizotron.settings')
+
+    results = []
+    for name in entry_points:
+        runs = [time_entry_point(ENTRY_POINTS[name], settings_module) for _ in range(repeats)]
+        fastest = min(runs, key=lambda run: run['total_seconds'])
+
+        results.append({
+            'entry_point': name,
+            'import_seconds': round(fastest['import_seconds'], 3),
+            'total_seconds': round(fastest['total_seconds'], 3),
+            'heavy_modules': ','.join(fastest['heavy_modules']) or 'none',
+        })
+
+    return results
@@ -0,0 +1,183 @@
+import json
+import platform
+import statistics
+import time
+import tracemalloc
+from collections.abc import Callable, Iterator
+from datetime import datetime, timezone
+
+import torch
+
+from segmentation.models import ModelType
+from segmentation.utils import masks
+from segmentation.utils.root_analysis import calculate_metrics
+from .synthetic import generate_root_image, generate_root_mask, shape_for_megapixels
+
+# Measurements below these are too noisy to be compared against a baseline.
+MIN_COMPARED = {'seconds': 0.001, 'peak_bytes': 64 * 1024}
+
+
+def measure(function: Callable[[], object], repeats: int = 5) -> dict:
+    """
+    Times a function and records the peak memory it allocates.
+
+    The function is run once to warm up, then ``repeats`` times for the timing, and once more with ``tracemalloc``
+    on for the memory, so that tracing does not slow down the timed runs. ``tracemalloc`` sees Python and NumPy
+    allocations, but not the buffers OpenCV and PyTorch allocate natively.
+
+    Parameters:
+        function (Callable[[], object]): The function to measure.
+        repeats (int, optional): The number of timed runs. Defaults to 5.
+
+    Returns:
+        dict: The median and fastest run in seconds and the peak traced memory in bytes.
+    """
+
+    function()
+
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        function()
+        _, peak_bytes = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {'seconds': statistics.median(timings), 'min_seconds': min(timings), 'peak_bytes': peak_bytes}
+
+
+def get_cases(megapixels: list[float], densities: list[float],
+              image_sizes: list[int]) -> Iterator[tuple[dict, Callable[[], object]]]:
+    """
+    Builds the synthetic inputs of every benchmarked function.
+
+    Parameters:
+        megapixels (list[float]): The mask sizes, in millions of pixels.
+        densities (list[float]): The numbers of roots per 100,000 pixels of the masks.
+        image_sizes (list[int]): The square image sizes of the UNet forward pass.
+
+    Yields:
+        tuple[dict, Callable[[], object]]: The name and parameters of a case, and the call to measure.
+    """
+
+    for size in megapixels:
+        for density in densities:
+            mask = generate_root_mask(*shape_for_megapixels(size), density=density)
+            binary = mask // 255
+            labelme = json.loads(masks.to_labelme('image.png', mask))
+            parameters = {'megapixels': size, 'density': density}
+
+            yield {'function': 'calculate_metrics', **parameters}, lambda: calculate_metrics(mask, 0.2581)
+            yield {'function': 'masks.threshold', **parameters}, lambda: masks.threshold(binary, 15)
+            yield {'function': 'masks.to_labelme', **parameters}, lambda: masks.to_labelme('image.png', mask)
+            yield {'function': 'masks.from_labelme', **parameters}, lambda: masks.from_labelme(mask, labelme)
+
+    model = ModelType.UNET.get_model(3, 1).eval()
+    for image_size in image_sizes:
+        image = generate_root_image(image_size, image_size, density=5)
+        batch = torch.from_numpy(image).permute(2, 0, 1).unsqueeze(0).float() / 255
+
+        def forward(batch: torch.Tensor = batch) -> torch.Tensor:
+            with torch.no_grad():
+                return model(batch)
+
+        yield {'function': 'unet.forward', 'megapixels': image_size ** 2 / 1e6, 'density': 5}, forward
+
+
+def get_case_name(case: dict) -> str:
+    return f'{case["function"]}[{case["megapixels"]:g}mp,density={case["density"]:g}]'
+
+
+def run_suite(megapixels: list[float] = (0.25, 1, 4), densities: list[float] = (1, 5),
+              image_sizes: list[int] = (256, 512), repeats: int = 5) -> list[dict]:
+    """
+    Times root analysis, thresholding, LabelMe conversion and a UNet forward pass on synthetic masks and images of
+    several sizes and root densities.
+
+    Parameters:
+        megapixels (list[float], optional): The mask sizes, in millions of pixels. Defaults to 0.25, 1 and 4.
+        densities (list[float], optional): The numbers of roots per 100,000 pixels. Defaults to 1 and 5.
+        image_sizes (list[int], optional): The square image sizes of the forward pass. Defaults to 256 and 512.
+        repeats (int, optional): The number of timed runs of each case. Defaults to 5.
+
+    Returns:
+        list[dict]: One result per case, see ``measure``, named by ``get_case_name``.
+    """
+
+    torch.manual_seed(0)
+
+    return [{'name': get_case_name(case), **case, **measure(function, repeats)}
+            for case, function in get_cases(megapixels, densities, image_sizes)]
+
+
+def save_results(results: list[dict], path: str) -> None:
+    """
+    Writes benchmark results as JSON, together with the machine they were measured on.
+
+    Parameters:
+        results (list[dict]): The results, see ``run_suite``.
+        path (str): The path of the JSON file.
+    """
+
+    with open(path, 'w') as f:
+        json.dump({
+            'created': datetime.now(timezone.utc).isoformat(),
+            'machine': {'platform': platform.platform(), 'processor': platform.processor(),
+                        'python': platform.python_version(), 'torch': torch.__version__,
+                        'threads': torch.get_num_threads()},
+            'results': results,
+        }, f, indent=2)
+
+
+def load_results(path: str) -> list[dict]:
+    """
+    Reads benchmark results written by ``save_results``.
+
+    Parameters:
+        path (str): The path of the JSON file.
+
+    Returns:
+        list[dict]: The results.
+    """
+
+    with open(path) as f:
+        return json.load(f)['results']
+
+
+def find_regressions(results: list[dict], baseline: list[dict], margin: float = 0.2) -> list[dict]:
+    """
+    Compares benchmark results with a baseline.
+
+    A case regresses when its median time or its peak memory grows by more than the margin. Cases missing from
+    either side are ignored, and so are baseline values below ``MIN_COMPARED``.
+
+    Parameters:
+        results (list[dict]): The new results, see ``run_suite``.
+        baseline (list[dict]): The baseline results.
+        margin (float, optional): The allowed relative growth. Defaults to 0.2, i.e. 20%.
+
+    Returns:
+        list[dict]: The name, metric, baseline value, new value and relative change of every regression.
+    """
+
+    baseline = {result['name']: result for result in baseline}
+
+    regressions = []
+    for result in results:
+        reference = baseline.get(result['name'])
+        if reference is None:
+            continue
+
+        for metric, minimum in MIN_COMPARED.items():
+            if reference[metric] >= minimum and result[metric] > reference[metric] * (1 + margin):
+                regressions.append({
+                    'name': result['name'], 'metric': metric, 'baseline': reference[metric], 'value': result[metric],
+                    'change': result[metric] / reference[metric] - 1,
+                })
+
+    return regressions
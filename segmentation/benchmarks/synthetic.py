@@ -0,0 +1,103 @@
+import numpy as np
+import cv2
+
+
+def shape_for_megapixels(megapixels: float, aspect_ratio: float = 1.0) -> tuple[int, int]:
+    """
+    Calculates an image shape with roughly the given number of pixels.
+
+    Parameters:
+    megapixels (float): The number of pixels, in millions.
+    aspect_ratio (float, optional): The ratio of width to height. Defaults to 1.
+
+    Returns:
+    tuple[int, int]: The height and width of the image.
+    """
+
+    height = max(1, int(round(np.sqrt(megapixels * 1e6 / aspect_ratio))))
+    width = max(1, int(round(megapixels * 1e6 / height)))
+
+    return height, width
+
+
+def generate_root_mask(height: int, width: int, density: float = 1.0, max_thickness: int = 9,
+                       seed: int = 0) -> np.ndarray:
+    """
+    Draws a synthetic root mask made of random walks of varying thickness.
+
+    Parameters:
+    height (int): The height of the mask.
+    width (int): The width of the mask.
+    density (float, optional): The number of roots per 100,000 pixels. Defaults to 1.
+    max_thickness (int, optional): The maximum thickness of a root in pixels. Defaults to 9.
+    seed (int, optional): The seed of the random generator. Defaults to 0.
+
+    Returns:
+    numpy.ndarray: A uint8 mask with roots set to 255.
+    """
+
+    rng = np.random.default_rng(seed)
+    mask = np.zeros((height, width), dtype=np.uint8)
+
+    root_count = max(1, int(density * height * width / 1e5))
+    for _ in range(root_count):
+        steps = rng.integers(5, 40)
+        start = rng.uniform((0, 0), (width, height))
+        angles = rng.uniform(0, 2 * np.pi) + np.cumsum(rng.normal(0, 0.3, steps))
+        lengths = rng.uniform(5, 25, steps)
+        offsets = np.cumsum(np.stack([np.cos(angles), np.sin(angles)], axis=1) * lengths[:, np.newaxis], axis=0)
+        points = np.vstack([start, start + offsets]).astype(np.int32)
+
+        thickness = int(rng.integers(1, max_thickness + 1))
+        cv2.polylines(mask, [points.reshape(-1, 1, 2)], False, 255, thickness)
+
+    return mask
+
+
+def generate_fragment_mask(height: int, width: int, count: int, seed: int = 0) -> np.ndarray:
+    """
+    Draws a synthetic mask made of many short, mostly disconnected root fragments.
+
+    Parameters:
+    height (int): The height of the mask.
+    width (int): The width of the mask.
+    count (int): The number of fragments to draw. Overlapping fragments merge, so the mask has fewer components.
+    seed (int, optional): The seed of the random generator. Defaults to 0.
+
+    Returns:
+    numpy.ndarray: A uint8 mask with roots set to 255.
+    """
+
+    rng = np.random.default_rng(seed)
+    mask = np.zeros((height, width), dtype=np.uint8)
+
+    starts = rng.integers((0, 0), (width, height), (count, 2))
+    ends = starts + rng.integers(-6, 7, (count, 2))
+    thicknesses = rng.integers(1, 3, count)
+    for start, end, thickness in zip(starts.tolist(), ends.tolist(), thicknesses.tolist()):
+        cv2.line(mask, start, end, 255, thickness)
+
+    return mask
+
+
+def generate_root_image(height: int, width: int, density: float = 1.0, seed: int = 0) -> np.ndarray:
+    """
+    Draws a synthetic RGB scan with light roots on a noisy soil background.
+
+    Parameters:
+    height (int): The height of the image.
+    width (int): The width of the image.
+    density (float, optional): The number of roots per 100,000 pixels. Defaults to 1.
+    seed (int, optional): The seed of the random generator. Defaults to 0.
+
+    Returns:
+    numpy.ndarray: A uint8 RGB image.
+    """
+
+    rng = np.random.default_rng(seed)
+    mask = generate_root_mask(height, width, density, seed=seed)
+
+    image = rng.normal(70, 20, (height, width, 3)).clip(0, 255).astype(np.uint8)
+    image[mask > 0] = (220, 210, 180)
+
+    return image
@@ -0,0 +1,85 @@
+import json
+import subprocess
+import sys
+
+_SCRIPT = '''
+import json, resource, time
+import torch
+from segmentation.models import ModelType
+from segmentation.utils.tiling import TiledModel
+
+torch.manual_seed(0)
+model_type = ModelType({model_type!r})
+model = model_type.get_model(3, 1).eval()
+if {memory_budget!r} is not None:
+    model = TiledModel(model, model_type, {memory_budget!r})
+
+image = torch.rand(1, 3, {height}, {width})
+baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+start = time.perf_counter()
+with torch.no_grad():
+    model(image)
+seconds = time.perf_counter() - start
+
+peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({{'seconds': seconds, 'peak_megabytes': (peak - baseline) / 1024}}))
+'''
+
+
+def measure_forward(model_type: str, height: int, width: int, memory_budget: int = None) -> dict:
+    """
+    Runs one forward pass in a fresh interpreter, so that its peak memory is not hidden by earlier runs.
+
+    Parameters:
+        model_type (str): The architecture of the model, see ``ModelType``.
+        height (int): The height of the image.
+        width (int): The width of the image.
+        memory_budget (int, optional): The memory budget of the tiles in bytes. Defaults to the whole image at once.
+
+    Returns:
+        dict: The time of the forward pass in seconds and the memory it added to the peak resident set, in MB, or
+            the exit code of the interpreter if it failed, e.g. when it ran out of memory.
+    """
+
+    script = _SCRIPT.format(model_type=model_type, height=height, width=width, memory_budget=memory_budget)
+    result = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True)
+
+    if result.returncode != 0:
+        return {'failed': result.returncode}
+
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def benchmark_tiling(model_type: str = 'unet', sizes: list[int] = (512, 1024, 2048),
+                     memory_budget: int = 256 * 1024 ** 2) -> list[dict]:
+    """
+    Compares the peak memory and latency of whole-image and tiled inference as images grow.
+
+    Parameters:
+        model_type (str, optional): The architecture to benchmark, see ``ModelType``. Defaults to UNet.
+        sizes (list[int], optional): The square image sizes to run. Defaults to 512, 1024 and 2048.
+        memory_budget (int, optional): The memory budget of the tiles in bytes. Defaults to 256 MB.
+
+    Returns:
+        list[dict]: One result per size and mode, with the forward time in seconds and the peak memory in MB, or
+        the exit code of the runs that failed.
+    """
+
+    results = []
+    for size in sizes:
+        for mode, budget in (('whole', None), ('tiled', memory_budget)):
+            measurement = measure_forward(str(model_type), size, size, budget)
+            result = {'mode': mode, 'size': f'{size}x{size}'}
+
+            if 'failed' in measurement:
+                results.append({**result, **measurement})
+                continue
+
+            results.append({
+                **result,
+                'seconds': round(measurement['seconds'], 3),
+                'peak_megabytes': round(measurement['peak_megabytes'], 1),
+            })
+
+    return results
@@ -0,0 +1,124 @@
+import logging
+import os
+
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+
+from segmentation.models import ModelType
+from segmentation.benchmarks.backends import benchmark_backends
+from segmentation.benchmarks.inference import benchmark_bulk_predict
+from segmentation.benchmarks.masks import benchmark_threshold
+from segmentation.benchmarks.precision import benchmark_precision
+from segmentation.benchmarks.root_analysis import benchmark_root_radii, benchmark_root_table
+from segmentation.benchmarks.startup import benchmark_startup
+from segmentation.benchmarks.suite import find_regressions, load_results, run_suite, save_results
+from segmentation.benchmarks.tiling import benchmark_tiling
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the segmentation pipeline on synthetic data.'
+
+    def __init__(self):
+        super().__init__()
+        self.logger = logging.getLogger('main')
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument('target', type=str,
+                            choices=['root_radii', 'root_table', 'bulk_predict', 'startup', 'backends', 'precision',
+                                     'tiling', 'threshold', 'suite'],
+                            help='Benchmark to run')
+        parser.add_argument('--megapixels', type=float, nargs='+', default=None,
+                            help='Image sizes to benchmark, in megapixels, 0.25, 1 and 4 for suite and 1, 10 and 100 '
+                                 'otherwise by default')
+        parser.add_argument('--density', type=float, default=5.0, help='Number of roots per 100,000 pixels')
+        parser.add_argument('--densities', type=float, nargs='+', default=[1, 5],
+                            help='Numbers of roots per 100,000 pixels of the suite')
+        parser.add_argument('--reference_max_megapixels', type=float, default=1,
+                            help='Largest image size to run the reference implementation on')
+        parser.add_argument('--image_count', type=int, default=None,
+                            help='Number of images to predict, 200 for bulk_predict and 4 for precision by default')
+        parser.add_argument('--batch_size', type=int, default=8, help='Batch size for batched inference')
+        parser.add_argument('--workers', type=int, default=2, help='Number of post-processing threads')
+        parser.add_argument('--repeats', type=int, default=3, help='Number of runs per startup entry point or backend')
+        parser.add_argument('--model', type=ModelType, default=ModelType.UNET, choices=list(ModelType),
+                            help='Model to benchmark the inference backends and precisions with')
+        parser.add_argument('--checkpoint', type=str, default=None,
+                            help='Weights to validate the inference precisions with, instead of an untrained model')
+        parser.add_argument('--calibration_count', type=int, default=8,
+                            help='Number of images to calibrate int8 quantization with')
+        parser.add_argument('--mask_threshold', type=float, default=1.0,
+                            help='Probability from which a pixel is a root when validating the inference precisions')
+        parser.add_argument('--image_size', type=int, nargs='+', default=None,
+                            help='Square image sizes to benchmark inference on, 256 and 512 for suite and 512 and 1024 '
+                                 'otherwise by default')
+        parser.add_argument('--memory_budget', type=int, default=256, help='Memory budget of tiled inference in MB')
+        parser.add_argument('--output', type=str, default=None, help='JSON file to write the suite results to')
+        parser.add_argument('--baseline', type=str, default=None,
+                            help='JSON file of suite results to compare against, if it exists')
+        parser.add_argument('--margin', type=float, default=0.2,
+                            help='Relative growth of time or peak memory over the baseline that fails the suite')
+        parser.add_argument('--update_baseline', action='store_true',
+                            help='Write the suite results to the baseline instead of comparing against it')
+
+    def handle(self, *args, **options) -> None:
+        if options['target'] == 'suite':
+            self.run_suite(options)
+            return
+
+        megapixels = options['megapixels'] or [1, 10, 100]
+        image_sizes = options['image_size'] or [512, 1024]
+
+        if options['target'] == 'root_radii':
+            results = benchmark_root_radii(megapixels, options['reference_max_megapixels'], options['density'])
+        elif options['target'] == 'root_table':
+            results = benchmark_root_table(megapixels)
+        elif options['target'] == 'threshold':
+            results = benchmark_threshold(megapixels)
+        elif options['target'] == 'bulk_predict':
+            results = benchmark_bulk_predict(
+                image_count=options['image_count'] or 200, batch_size=options['batch_size'], workers=options['workers'])
+        elif options['target'] == 'startup':
+            results = benchmark_startup(repeats=options['repeats'])
+        elif options['target'] == 'backends':
+            results = benchmark_backends(options['model'], [(size, size) for size in image_sizes],
+                                         options['batch_size'], options['repeats'])
+        elif options['target'] == 'precision':
+            results = benchmark_precision(
+                options['model'], options['checkpoint'], image_sizes[0], options['image_count'] or 4,
+                options['calibration_count'], options['density'], options['mask_threshold'], options['repeats'])
+        elif options['target'] == 'tiling':
+            results = benchmark_tiling(options['model'], image_sizes, options['memory_budget'] * 1024 ** 2)
+
+        for result in results:
+            self.logger.info(f'{options["target"]}: ' + ', '.join(f'{key}={value}' for key, value in result.items()))
+
+    def run_suite(self, options: dict) -> None:
+        results = run_suite(options['megapixels'] or [0.25, 1, 4], options['densities'],
+                            options['image_size'] or [256, 512], options['repeats'])
+
+        for result in results:
+            self.logger.info(f'{result["name"]}: seconds={result["seconds"]:.6f}, '
+                             f'min_seconds={result["min_seconds"]:.6f}, peak_bytes={result["peak_bytes"]}')
+
+        if options['output'] is not None:
+            save_results(results, options['output'])
+
+        baseline = options['baseline']
+        if baseline is None:
+            return
+
+        if options['update_baseline']:
+            save_results(results, baseline)
+            self.logger.info(f'Updated the baseline {baseline}')
+            return
+
+        if not os.path.exists(baseline):
+            self.logger.warning(f'No baseline at {baseline}, run with --update_baseline to record one')
+            return
+
+        regressions = find_regressions(results, load_results(baseline), options['margin'])
+        for regression in regressions:
+            self.logger.error(f'{regression["name"]}: {regression["metric"]} regressed by {regression["change"]:.0%}, '
+                              f'from {regression["baseline"]} to {regression["value"]}')
+
+        if regressions:
+            raise CommandError(f'{len(regressions)} benchmarks regressed by more than {options["margin"]:.0%}')
@@ -19,6 +19,8 @@ class Command(BaseCommand):
         parser.add_argument('--output', type=str, default='output', help='Output directory')
         parser.add_argument('--recursive', action='store_true', help='Recursively search for images')
         parser.add_argument('--scaling_factor', type=float, default=0.2581, help='Scaling factor')
+        parser.add_argument('--tile_size', type=int, default=1024, help='Size of the tiles metrics are calculated on')
+        parser.add_argument('--halo', type=int, default=64, help='Context around each tile, larger than any root')
 
     def handle(self, *args, **options) -> None:
         if not os.path.exists(options['output']):
@@ -51,7 +53,8 @@ class Command(BaseCommand):
 
                 for layer in range(tube_lower_end, tube_higher_end + 1):
                     segment = image[:, (layer - 1) * segment_width:layer * segment_width]
-                    metrics = root_analysis.calculate_metrics(segment, options['scaling_factor'])
+                    metrics = root_analysis.calculate_metrics_tiled(
+                        segment, options['scaling_factor'], options['tile_size'], options['halo'])
 
                     measurements.loc[len(measurements)] = {
                         'image': image_filename,
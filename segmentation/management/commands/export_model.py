@@ -5,11 +5,13 @@ import torch
 
 from django.core.management.base import BaseCommand
 
-from segmentation.models import UNet
+from segmentation.models import ModelType
+from segmentation.utils.backends import (ARTIFACT_SUFFIXES, export_onnx, export_torchscript, load_backend, load_eager,
+                                         check_parity)
 
 
 class Command(BaseCommand):
-    help = 'Export model weights to a pth file that can be loaded with torch.load().'
+    help = 'Export model weights to a pth file that can be loaded with torch.load() and to inference artifacts.'
 
     def __init__(self):
         self.logger = logging.getLogger('main')
@@ -19,24 +21,36 @@ class Command(BaseCommand):
         parser.add_argument('--output', type=str, default='segmentation/models/saved_models', help='Output directory')
 
         parser.add_argument('--name', type=str, default='saved', help='Name of the model')
-        parser.add_argument('--model', type=str, default='unet', choices=['unet'], help='Model to use')
+        parser.add_argument('--model', type=ModelType, default=ModelType.UNET, choices=list(ModelType),
+                            help='Model to use')
+
+        parser.add_argument('--formats', type=str, nargs='+', default=['eager', 'torchscript', 'onnx'],
+                            choices=list(ARTIFACT_SUFFIXES), help='Artifacts to export')
+        parser.add_argument('--size', type=int, default=512, help='Image size to trace the model and check parity with')
 
     def handle(self, *args, **options):
         if not os.path.exists(options['output']):
             os.makedirs(options['output'])
 
-        model = UNet(3, 1)
+        model = load_eager(options['model'], options['target'])
+
+        output_path = Path(options['output'], '{}_{}'.format(options["model"], options["name"]))
 
-        checkpoint = torch.load(options['target'])
-        model_weights = checkpoint['state_dict']
+        size = options['model'].input_multiple * round(options['size'] / options['model'].input_multiple)
+        example = torch.rand(1, 3, size, size)
 
-        for key in list(model_weights):
-            model_weights[key.replace('model.', '')] = model_weights.pop(key)
+        for backend in options['formats']:
+            artifact_path = output_path.with_suffix(ARTIFACT_SUFFIXES[backend])
 
-        model.load_state_dict(model_weights)
-        model.eval()
+            if backend == 'eager':
+                torch.save(model.state_dict(), artifact_path)
+            elif backend == 'torchscript':
+                export_torchscript(model, artifact_path, example)
+            elif backend == 'onnx':
+                export_onnx(model, artifact_path, example)
 
-        output_path = Path(options['output'], '{}_{}'.format(options["model"], options["name"])).with_suffix('.pth')
+            self.logger.info(f'Saved model to {artifact_path}')
 
-        torch.save(model.state_dict(), output_path)
-        self.logger.info(f'Saved model to {output_path}')
+            images = torch.rand(1, 3, size + 7, size - 5)
+            parity = check_parity(model, load_backend(backend, options['model'], artifact_path), images)
+            self.logger.info(f'Parity of {backend} with eager: {parity}')
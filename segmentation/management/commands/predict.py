@@ -1,29 +1,40 @@
+from contextlib import closing
 from pathlib import Path
+from typing import Iterator, NamedTuple
 import logging
 import os
 
-import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
 
 import cv2
 
 import torch
+from torch import nn
 from torchvision.transforms.v2 import functional as F
 
 from segmentation.models import ModelType
+from segmentation.utils import masks, file_management, root_analysis
+from segmentation.utils.backends import BACKENDS, load_backend
+from segmentation.utils.manifest import RunManifest
+from segmentation.utils.pipeline import Pipeline
+from segmentation.utils.precision import PRECISIONS, convert_precision
+from segmentation.utils.tiling import TiledModel
 
-import numpy as np
-import torch
-from torchvision.transforms.v2 import functional as F
+from django.core.management.base import BaseCommand, CommandError, CommandParser
 
-from segmentation.utils import masks, file_management, root_analysis
 
-from django.core.management.base import BaseCommand, CommandParser
+class PredictedImage(NamedTuple):
+    index: int
+    filename: str
+    image: torch.Tensor
+    mask: np.ndarray = None
+    metrics: dict = None
 
 
 class Command(BaseCommand):
     def __init__(self):
+        super().__init__()
         self.logger = logging.getLogger('main')
 
     def get_image(self, filename: str, size: int = None) -> torch.Tensor:
@@ -51,7 +62,16 @@ class Command(BaseCommand):
             default=ModelType.UNET,
             choices=list(ModelType),
             help='Model to use')
-        parser.add_argument('--checkpoint', type=str, default=None, help='Checkpoint to load')
+        parser.add_argument('--checkpoint', type=str, default=None,
+                            help='Checkpoint to load, or the artifact exported for the backend')
+        parser.add_argument('--backend', type=str, default='eager', choices=BACKENDS, help='Inference backend to use')
+        parser.add_argument('--precision', type=str, default='fp32', choices=PRECISIONS,
+                            help='Inference precision, int8 only runs on the CPU with the eager backend')
+        parser.add_argument('--calibration_images', type=int, default=16,
+                            help='Number of target images to calibrate int8 quantization with')
+        parser.add_argument('--memory_budget', type=int, default=None,
+                            help='Memory a forward pass may use in MB, runs the model on overlapping tiles when set')
+        parser.add_argument('--tile_overlap', type=int, default=32, help='Overlap between neighbouring tiles')
 
         parser.add_argument('--save_mask', action='store_true', help='Save masks')
         parser.add_argument('--save_comparison', action='store_true', help='Compare images and masks')
@@ -63,6 +83,19 @@ class Command(BaseCommand):
 
         parser.add_argument('--cuda', action='store_true', help='Use CUDA')
 
+        parser.add_argument('--batch_size', type=int, default=4,
+                            help='Largest number of same-sized images in a forward pass')
+        parser.add_argument('--decode_workers', type=int, default=2, help='Number of threads reading images')
+        parser.add_argument('--measure_workers', type=int, default=2,
+                            help='Number of threads thresholding masks and calculating metrics')
+        parser.add_argument('--write_workers', type=int, default=2, help='Number of threads writing outputs')
+        parser.add_argument('--queue_size', type=int, default=8, help='Largest number of images waiting between stages')
+
+        parser.add_argument('--resume', action='store_true',
+                            help='Skip the images an interrupted run with the same output and settings completed')
+        parser.add_argument('--flush_every', type=int, default=100,
+                            help='Number of completed images after which measurements are written out')
+
     def handle(self, *args, **options) -> None:
         if not os.path.exists(options['output']):
             os.makedirs(options['output'])
@@ -74,107 +107,144 @@ class Command(BaseCommand):
         self.logger.info(f'Running with arguments: {options}')
         self.logger.info(f'Using device: {device}')
 
-        model = options['model'].get_model(3, 1)
+        model = load_backend(options['backend'], options['model'], options['checkpoint'])
+        model.to(device)
+
+        image_filenames = file_management.get_image_filenames(options['target'], options['recursive'])
+
+        settings = {key: options[key] for key in [
+            'target', 'recursive', 'checkpoint', 'backend', 'precision', 'memory_budget', 'tile_overlap', 'size',
+            'scaling_factor', 'threshold_area']}
+        settings['model'] = str(options['model'])
 
-        checkpoint = torch.load(options['checkpoint'])
+        try:
+            manifest = RunManifest(options['output'], settings, ['image', *root_analysis.METRICS], options['resume'])
+        except ValueError as e:
+            raise CommandError(str(e))
 
-        model_weights = checkpoint['state_dict']
+        remaining = [(index, filename) for index, filename in enumerate(image_filenames)
+                     if filename not in manifest.completed]
+        if len(remaining) < len(image_filenames):
+            self.logger.info(f'Resuming after {len(image_filenames) - len(remaining)} completed images')
 
-        for key in list(model_weights):
-            model_weights[key.replace('model.', '')] = model_weights.pop(key)
+        if options['precision'] == 'int8':
+            if options['backend'] != 'eager' or device.type != 'cpu':
+                raise CommandError('int8 inference only runs on the CPU with the eager backend')
 
-        model.load_state_dict(model_weights)
-        model.eval()
-        model.to(device)
+            calibration_images = [self.get_image(filename, options['size'])
+                                  for filename in image_filenames[:options['calibration_images']]]
+            model = convert_precision(model, options['model'], 'int8', calibration_images)
+        elif options['precision'] == 'bf16':
+            model = convert_precision(model, options['model'], 'bf16')
 
-        image_filenames = file_management.get_image_filenames(options['target'], options['recursive'])
+        if options['memory_budget'] is not None:
+            model = TiledModel(model, options['model'], options['memory_budget'] * 1024 ** 2, options['tile_overlap'])
+
+        pipeline = Pipeline(options['queue_size'])
+        pipeline.add_stage('decode', lambda items: self.decode(items, len(image_filenames), options['size']),
+                           options['decode_workers'])
+        pipeline.add_stage('inference', lambda items: self.infer(items, model, device, options['batch_size']))
+        pipeline.add_stage('measure', lambda items: self.measure(items, options), options['measure_workers'])
+        pipeline.add_stage('write', lambda items: self.write(items, options), options['write_workers'])
 
-        measurements = pd.DataFrame(
-            columns=[
-                'image',
-                'root_count',
-                'average_root_diameter',
-                'total_root_length',
-                'total_root_area',
-                'total_root_volume'])
+        completed = len(image_filenames) - len(remaining)
 
         try:
-            for index, image_filename in enumerate(image_filenames):
-                self.logger.info(
-                    f'Running image {index + 1} of {len(image_filenames)}: {image_filename}')
-
-                original_image = self.get_image(image_filename, options['size'])
-
-                with torch.no_grad():
-                    image = torch.clone(original_image).to(device)
-                    image = image.unsqueeze(0)
-                    output = model(image)
-                    output = output.squeeze(0, 1)
-                    output = (output > 0.5).float()
-
-                output = output.type(torch.uint8) * 255
-                mask = output.cpu().numpy()
-
-                if options['threshold_area'] > 0:
-                    mask = masks.threshold(mask, options['threshold_area'])
-
-                if options['save_mask']:
-                    Path(os.path.join(options['output'], 'mask', os.path.relpath(
-                        os.path.dirname(image_filename), options['target']))).mkdir(parents=True, exist_ok=True)
-                    cv2.imwrite(os.path.join(options['output'], 'mask', os.path.relpath(
-                        os.path.dirname(image_filename), options['target']), os.path.basename(image_filename)), mask)
-
-                if options['save_comparison']:
-                    figure = plt.figure(figsize=(10, 10))
-
-                    figure.add_subplot(2, 1, 1)
-                    plt.title('Image')
-                    plt.imshow(image.squeeze(0).permute(1, 2, 0).cpu())
-                    figure.add_subplot(2, 1, 2)
-                    plt.title('Mask')
-                    plt.imshow(mask, cmap='gray')
-
-                    Path(os.path.join(options['output'], 'compare', os.path.relpath(
-                        os.path.dirname(image_filename), options['target']))).mkdir(parents=True, exist_ok=True)
-                    plt.savefig(os.path.join(options['output'], 'compare', os.path.relpath(
-                        os.path.dirname(image_filename), options['target']), os.path.basename(image_filename)))
-
-                    plt.close(figure)
-
-                if options['save_labelme']:
-                    Path(os.path.join(options['output'], 'labelme', os.path.relpath(
-                        os.path.dirname(image_filename), options['target']))).mkdir(parents=True, exist_ok=True)
-
-                    original_image = original_image.numpy().transpose((1, 2, 0)) * 255
-                    original_image = original_image.astype(np.uint8)
-                    original_image = cv2.cvtColor(
-                        original_image, cv2.COLOR_RGB2BGR)
-
-                    cv2.imwrite(
-                        os.path.join(
-                            options['output'],
-                            'labelme',
-                            os.path.relpath(
-                                os.path.dirname(image_filename),
-                                options['target']),
-                            os.path.basename(image_filename)),
-                        original_image)
-
-                    labelme_json = masks.to_labelme(
-                        os.path.basename(image_filename), mask)
-
-                    with open(os.path.join(options['output'], 'labelme', os.path.relpath(
-                            os.path.dirname(image_filename), options['target']), os.path.basename(image_filename).upper().replace('.PNG', '.json')), 'w') as f:
-                        f.write(labelme_json)
-
-                measurements.loc[index] = {'image': image_filename,
-                                           **root_analysis.calculate_metrics(mask, options['scaling_factor'])}
-
-                self.logger.info(
-                    f'Completed image {index + 1} of {len(image_filenames)}: {image_filename}')
+            with closing(pipeline.run(remaining)) as predictions:
+                for predicted in predictions:
+                    manifest.add(predicted.filename, predicted.metrics)
+                    completed += 1
+
+                    self.logger.info(f'Completed image {completed} of {len(image_filenames)}: {predicted.filename}')
+
+                    if len(manifest.pending) >= options['flush_every']:
+                        manifest.flush()
         except KeyboardInterrupt:
             pass
         finally:
-            measurements = measurements.round(4)
-            measurements.to_csv(os.path.join(options['output'], 'measurements.csv'), index=False)
-            self.logger.info(f'Saved measurements to {options["output"]}/measurements.csv')
+            manifest.flush()
+            self.logger.info(f'Saved measurements to {manifest.measurements_path}')
+
+            for stage in pipeline.get_utilization():
+                self.logger.info(f'{stage["stage"]}: {stage["workers"]} workers, {stage["items"]} images, '
+                                 f'{stage["busy_seconds"]:.1f}s busy, {stage["utilization"]:.0%} utilization')
+
+    def get_output_path(self, options: dict, kind: str, image_filename: str) -> str:
+        directory = os.path.join(options['output'], kind, os.path.relpath(
+            os.path.dirname(image_filename), options['target']))
+        Path(directory).mkdir(parents=True, exist_ok=True)
+
+        return os.path.join(directory, os.path.basename(image_filename))
+
+    def decode(self, items: Iterator[tuple[int, str]], total: int, size: int = None) -> Iterator[PredictedImage]:
+        for index, image_filename in items:
+            self.logger.info(f'Running image {index + 1} of {total}: {image_filename}')
+
+            yield PredictedImage(index, image_filename, self.get_image(image_filename, size))
+
+    def infer(self, items: Iterator[PredictedImage], model: nn.Module, device: torch.device,
+              batch_size: int) -> Iterator[PredictedImage]:
+        def run(batch: list[PredictedImage]) -> Iterator[PredictedImage]:
+            with torch.no_grad():
+                output = model(torch.stack([predicted.image for predicted in batch]).to(device))
+                output = (output[:, 0] > 0.5).type(torch.uint8) * 255
+
+            for predicted, mask in zip(batch, output.cpu().numpy()):
+                yield predicted._replace(mask=mask)
+
+        batch = []
+        for predicted in items:
+            if batch and (len(batch) >= batch_size or predicted.image.shape != batch[0].image.shape):
+                yield from run(batch)
+                batch = []
+
+            batch.append(predicted)
+
+        if batch:
+            yield from run(batch)
+
+    def measure(self, items: Iterator[PredictedImage], options: dict) -> Iterator[PredictedImage]:
+        for predicted in items:
+            mask = predicted.mask
+            if options['threshold_area'] > 0:
+                mask = masks.threshold(mask, options['threshold_area'])
+
+            yield predicted._replace(mask=mask,
+                                     metrics=root_analysis.calculate_metrics(mask, options['scaling_factor']))
+
+    def write(self, items: Iterator[PredictedImage], options: dict) -> Iterator[PredictedImage]:
+        for predicted in items:
+            image_filename = predicted.filename
+
+            if options['save_mask']:
+                cv2.imwrite(self.get_output_path(options, 'mask', image_filename), predicted.mask)
+
+            if options['save_comparison']:
+                # Figures are drawn without pyplot, whose global state is not thread-safe.
+                figure = Figure(figsize=(10, 10))
+
+                axes = figure.add_subplot(2, 1, 1)
+                axes.set_title('Image')
+                axes.imshow(predicted.image.permute(1, 2, 0))
+                axes = figure.add_subplot(2, 1, 2)
+                axes.set_title('Mask')
+                axes.imshow(predicted.mask, cmap='gray')
+
+                figure.savefig(self.get_output_path(options, 'compare', image_filename))
+
+            if options['save_labelme']:
+                labelme_path = self.get_output_path(options, 'labelme', image_filename)
+
+                original_image = predicted.image.numpy().transpose((1, 2, 0)) * 255
+                original_image = original_image.astype(np.uint8)
+                original_image = cv2.cvtColor(original_image, cv2.COLOR_RGB2BGR)
+
+                cv2.imwrite(labelme_path, original_image)
+
+                labelme_json = masks.to_labelme(os.path.basename(image_filename), predicted.mask)
+
+                with open(os.path.join(os.path.dirname(labelme_path),
+                                       os.path.basename(image_filename).upper().replace('.PNG', '.json')), 'w') as f:
+                    f.write(labelme_json)
+
+            yield predicted._replace(image=None, mask=None)
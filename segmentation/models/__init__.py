@@ -1,4 +1,22 @@
-from .unet import UNet
-from .resnet import ResNet
+import importlib
 
-from .lightning import TrainingModel, ModelType
+# Django imports this package as the models module of the segmentation app, so the networks, which pull in torch
+# and Lightning, are only imported on first use.
+_attributes = {
+    'UNet': '.unet',
+    'ResNet': '.resnet',
+    'TrainingModel': '.lightning',
+    'ModelType': '.model_types',
+}
+
+__all__ = list(_attributes)
+
+
+def __getattr__(name: str):
+    if name not in _attributes:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+    value = getattr(importlib.import_module(_attributes[name], __name__), name)
+
+    globals()[name] = value
+    return value
@@ -16,6 +16,20 @@ class ModelType(Enum):
     def __str__(self) -> str:
         return self.value
 
+    @property
+    def input_multiple(self) -> int:
+        return 16 if self == ModelType.UNET else 32
+
+    @property
+    def activation_bytes_per_pixel(self) -> int:
+        # Measured peak memory of a float32 forward pass on the CPU, per input pixel.
+        if self == ModelType.UNET:
+            return 2560
+        elif self in (ModelType.RESNET18, ModelType.RESNET34):
+            return 768
+        else:
+            return 1024
+
     def get_model(self, in_channels: int, out_channels: int, dropout: float = 0.2) -> nn.Module:
         if self == ModelType.UNET:
             return UNet(in_channels, out_channels)
@@ -158,6 +158,13 @@ class ResNet(nn.Module):
     def forward(self, x: torch.Tensor) -> torch.Tensor:
         x, original_dims = self._pad_input(x)
 
+        output = self.forward_padded(x)
+
+        output = self._unpad_output(output, original_dims)
+
+        return output
+
+    def forward_padded(self, x: torch.Tensor) -> torch.Tensor:
         x1 = self.conv1(x)
         x1 = self.dropout(x1)
 
@@ -171,7 +178,10 @@ class ResNet(nn.Module):
         x4 = self.layer3(x3)
         x4 = self.dropout(x4)
 
-        encoder_output = checkpoint(self.layer4, x4, use_reentrant=False)
+        if self.training:
+            encoder_output = checkpoint(self.layer4, x4, use_reentrant=False)
+        else:
+            encoder_output = self.layer4(x4)
 
         y4 = self.up_step1(encoder_output)
         y4 = torch.cat([x4, y4], dim=1)
@@ -195,6 +205,4 @@ class ResNet(nn.Module):
 
         output = F.sigmoid(y1)
 
-        output = self._unpad_output(output, original_dims)
-
         return output
@@ -63,6 +63,13 @@ class UNet(nn.Module):
     def forward(self, x: torch.Tensor) -> torch.Tensor:
         x, original_dims = self._pad_input(x)
 
+        output = self.forward_padded(x)
+
+        output = self._unpad_output(output, original_dims)
+
+        return output
+
+    def forward_padded(self, x: torch.Tensor) -> torch.Tensor:
         x1 = self.down_step1(x)
         x1_pooled = self.maxpool(x1)
         x1_pooled = self.dropout(x1_pooled)
@@ -79,8 +86,11 @@ class UNet(nn.Module):
         x4_pooled = self.maxpool(x4)
         x4_pooled = self.dropout(x4_pooled)
 
-        encoder_output = checkpoint(
-            self.encoder_output, x4_pooled, use_reentrant=False)
+        if self.training:
+            encoder_output = checkpoint(
+                self.encoder_output, x4_pooled, use_reentrant=False)
+        else:
+            encoder_output = self.encoder_output(x4_pooled)
 
         y4 = self.up_step1(encoder_output)
         y4 = torch.cat([x4, y4], dim=1)
@@ -106,6 +116,4 @@ class UNet(nn.Module):
 
         output = F.sigmoid(output)
 
-        output = self._unpad_output(output, original_dims)
-
         return output
@@ -0,0 +1,49 @@
+import json
+import os
+import tempfile
+from unittest import TestCase
+
+from segmentation.benchmarks.suite import find_regressions, load_results, run_suite, save_results
+
+
+class SuiteTest(TestCase):
+    def test_results_round_trip(self):
+        results = run_suite(megapixels=[0.01], densities=[5], image_sizes=[32], repeats=1)
+
+        self.assertEqual([result['function'] for result in results],
+                         ['calculate_metrics', 'masks.threshold', 'masks.to_labelme', 'masks.from_labelme',
+                          'unet.forward'])
+        for result in results:
+            self.assertGreater(result['seconds'], 0)
+            self.assertGreater(result['peak_bytes'], 0)
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'results.json')
+            save_results(results, path)
+
+            with open(path) as f:
+                self.assertIn('machine', json.load(f))
+            self.assertEqual(load_results(path), results)
+
+
+class RegressionTest(TestCase):
+    baseline = [
+        {'name': 'slow', 'seconds': 1.0, 'peak_bytes': 1 << 20},
+        {'name': 'fast', 'seconds': 1e-5, 'peak_bytes': 100},
+    ]
+
+    def test_within_margin(self):
+        results = [{'name': 'slow', 'seconds': 1.15, 'peak_bytes': 1 << 20},
+                   {'name': 'new', 'seconds': 10.0, 'peak_bytes': 1 << 30}]
+
+        self.assertEqual(find_regressions(results, self.baseline, margin=0.2), [])
+
+    def test_regressions(self):
+        results = [{'name': 'slow', 'seconds': 1.5, 'peak_bytes': 2 << 20},
+                   {'name': 'fast', 'seconds': 1e-3, 'peak_bytes': 1000}]
+
+        regressions = find_regressions(results, self.baseline, margin=0.2)
+
+        self.assertEqual([(regression['name'], regression['metric']) for regression in regressions],
+                         [('slow', 'seconds'), ('slow', 'peak_bytes')])
+        self.assertAlmostEqual(regressions[0]['change'], 0.5)
@@ -0,0 +1,51 @@
+import importlib.util
+import os
+import tempfile
+from unittest import TestCase, skipUnless
+
+import torch
+
+from segmentation.models import ModelType
+from segmentation.utils.backends import check_parity, export_onnx, export_torchscript, load_backend
+
+
+class TorchScriptBackendTest(TestCase):
+    def test_matches_eager(self):
+        for model_type in (ModelType.UNET, ModelType.RESNET18):
+            model = model_type.get_model(3, 1).eval()
+
+            with tempfile.TemporaryDirectory() as directory:
+                artifact_path = os.path.join(directory, 'model.pt')
+                export_torchscript(model, artifact_path, torch.rand(1, 3, 64, 64))
+                backend = load_backend('torchscript', model_type, artifact_path)
+
+            parity = check_parity(model, backend, torch.rand(2, 3, 70, 90))
+
+            self.assertLess(parity['max_abs_difference'], 1e-5)
+            self.assertEqual(parity['mask_mismatch'], 0)
+
+    def test_eager_loads_training_checkpoint(self):
+        model = ModelType.UNET.get_model(3, 1).eval()
+        checkpoint = {'state_dict': {f'model.{key}': value for key, value in model.state_dict().items()}}
+
+        with tempfile.TemporaryDirectory() as directory:
+            checkpoint_path = os.path.join(directory, 'model.ckpt')
+            torch.save(checkpoint, checkpoint_path)
+            backend = load_backend('eager', ModelType.UNET, checkpoint_path)
+
+        self.assertEqual(check_parity(model, backend, torch.rand(1, 3, 32, 32))['max_abs_difference'], 0)
+
+
+@skipUnless(importlib.util.find_spec('onnxruntime'), 'ONNX Runtime is not installed')
+class OnnxBackendTest(TestCase):
+    def test_matches_eager(self):
+        model = ModelType.UNET.get_model(3, 1).eval()
+
+        with tempfile.TemporaryDirectory() as directory:
+            artifact_path = os.path.join(directory, 'model.onnx')
+            export_onnx(model, artifact_path, torch.rand(1, 3, 64, 64))
+            backend = load_backend('onnx', ModelType.UNET, artifact_path)
+
+        parity = check_parity(model, backend, torch.rand(2, 3, 70, 90))
+
+        self.assertLess(parity['max_abs_difference'], 1e-4)
@@ -0,0 +1,78 @@
+from unittest import TestCase
+
+import numpy as np
+from prometheus_client import REGISTRY
+import torch
+
+from segmentation.benchmarks.synthetic import generate_root_image
+from segmentation.models import ModelType
+from segmentation.models.unet import UNet
+from segmentation.utils.backends import PaddedModel
+from segmentation.utils.instrumentation import get_model_type, get_size_bucket, time_stage, use_model_type
+from segmentation.utils.predict import predict_probabilities_batch, threshold_probabilities
+from segmentation.utils.root_analysis import calculate_metrics
+from segmentation.utils.tiling import TiledModel
+
+
+def get_sample(name: str, stage: str, model_type: str, size: str) -> float:
+    return REGISTRY.get_sample_value(name, {'stage': stage, 'model_type': model_type, 'size': size}) or 0
+
+
+class SizeBucketTest(TestCase):
+    def test_buckets(self):
+        self.assertEqual(get_size_bucket(512, 512), 'lt1mp')
+        self.assertEqual(get_size_bucket(1000, 1000), '1to4mp')
+        self.assertEqual(get_size_bucket(2550, 3510), '4to16mp')
+        self.assertEqual(get_size_bucket(4000, 4000), 'gte16mp')
+
+
+class ModelTypeTest(TestCase):
+    def test_unwraps_models(self):
+        model = UNet(3, 1)
+
+        self.assertEqual(get_model_type(model), 'unet')
+        self.assertEqual(get_model_type(PaddedModel(model)), 'unet')
+        self.assertEqual(get_model_type(TiledModel(model, ModelType.RESNET18, 1 << 20)), 'resnet18')
+        self.assertEqual(get_model_type(object()), 'unknown')
+
+
+class StageTest(TestCase):
+    def test_counts_images_and_failures(self):
+        images = get_sample('segmentation_stage_images_total', 'test', 'unet', 'lt1mp')
+        failures = get_sample('segmentation_stage_failures_total', 'test', 'unet', 'lt1mp')
+        count = get_sample('segmentation_stage_seconds_count', 'test', 'unet', 'lt1mp')
+
+        with use_model_type('unet'):
+            with time_stage('test', 'lt1mp', images=3):
+                pass
+
+            with self.assertRaises(ValueError), time_stage('test', 'lt1mp'):
+                raise ValueError
+
+        self.assertEqual(get_sample('segmentation_stage_images_total', 'test', 'unet', 'lt1mp'), images + 3)
+        self.assertEqual(get_sample('segmentation_stage_failures_total', 'test', 'unet', 'lt1mp'), failures + 1)
+        self.assertEqual(get_sample('segmentation_stage_seconds_count', 'test', 'unet', 'lt1mp'), count + 2)
+
+    def test_pipeline_stages(self):
+        stages = ('forward', 'quantize', 'threshold', 'calculate_metrics', 'skeletonize', 'distance_transform')
+        before = {stage: get_sample('segmentation_stage_images_total', stage, 'unet', 'lt1mp') for stage in stages}
+
+        model = UNet(3, 1)
+        model.eval()
+        image = torch.from_numpy(generate_root_image(32, 32, density=500)).permute(2, 0, 1).float() / 255
+
+        probability_maps = predict_probabilities_batch(model, [image, image])
+
+        with use_model_type('unet'):
+            mask = threshold_probabilities(probability_maps[0], 0)
+            root_image = np.zeros((32, 32), dtype=np.uint8)
+            root_image[8:24, 14:18] = 255
+            calculate_metrics(root_image, 1)
+
+        self.assertIsNotNone(mask)
+        for stage in stages:
+            expected = 2 if stage in ('forward', 'quantize') else 1
+            self.assertEqual(get_sample('segmentation_stage_images_total', stage, 'unet', 'lt1mp'),
+                             before[stage] + expected, stage)
+
+        self.assertEqual(REGISTRY.get_sample_value('segmentation_inferences_in_progress', {'model_type': 'unet'}), 0)
@@ -0,0 +1,60 @@
+import tempfile
+from unittest import TestCase
+
+import pandas as pd
+
+from segmentation.utils.manifest import RunManifest
+
+COLUMNS = ['image', 'root_count', 'total_root_length']
+SETTINGS = {'target': 'images', 'threshold_area': 15}
+
+
+class RunManifestTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def record(self, manifest: RunManifest, *images: str) -> None:
+        for image in images:
+            manifest.add(image, {'root_count': 1, 'total_root_length': 2.123456})
+        manifest.flush()
+
+    def read(self, manifest: RunManifest) -> list[str]:
+        return list(pd.read_csv(manifest.measurements_path)['image'])
+
+    def test_appends_measurements(self):
+        manifest = RunManifest(self.directory.name, SETTINGS, COLUMNS)
+        self.record(manifest, 'a.png', 'b.png')
+        self.record(manifest, 'c.png')
+
+        self.assertEqual(self.read(manifest), ['a.png', 'b.png', 'c.png'])
+        self.assertEqual(pd.read_csv(manifest.measurements_path)['total_root_length'][0], 2.1235)
+
+        restarted = RunManifest(self.directory.name, SETTINGS, COLUMNS)
+        self.assertEqual(restarted.completed, set())
+        self.assertEqual(self.read(restarted), [])
+
+    def test_resume(self):
+        manifest = RunManifest(self.directory.name, SETTINGS, COLUMNS)
+        self.record(manifest, 'a.png', 'b.png')
+
+        # A crash after the measurements of c.png were written but before the manifest was.
+        with open(manifest.measurements_path, 'a') as f:
+            f.write('c.png,1,2\n')
+        with open(manifest.manifest_path, 'a') as f:
+            f.write('{"ima')
+
+        resumed = RunManifest(self.directory.name, SETTINGS, COLUMNS, resume=True)
+        self.assertEqual(resumed.completed, {'a.png', 'b.png'})
+        self.assertEqual(self.read(resumed), ['a.png', 'b.png'])
+
+        self.record(resumed, 'c.png')
+        self.assertEqual(RunManifest(self.directory.name, SETTINGS, COLUMNS, resume=True).completed,
+                         {'a.png', 'b.png', 'c.png'})
+        self.assertEqual(self.read(resumed), ['a.png', 'b.png', 'c.png'])
+
+    def test_resume_with_other_settings(self):
+        RunManifest(self.directory.name, SETTINGS, COLUMNS)
+
+        with self.assertRaisesRegex(ValueError, 'threshold_area'):
+            RunManifest(self.directory.name, {**SETTINGS, 'threshold_area': 0}, COLUMNS, resume=True)
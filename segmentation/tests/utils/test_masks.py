@@ -0,0 +1,90 @@
+from unittest import TestCase
+
+import cv2
+import numpy as np
+
+from segmentation.benchmarks.masks import contour_threshold
+from segmentation.benchmarks.synthetic import generate_fragment_mask, generate_root_mask
+from segmentation.utils import masks
+
+
+def fill_holes(mask: np.ndarray) -> np.ndarray:
+    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_NONE)
+    filled = np.zeros_like(mask)
+    cv2.drawContours(filled, contours, -1, 255, cv2.FILLED)
+
+    return filled
+
+
+def contour_areas(mask: np.ndarray, labels: np.ndarray) -> dict:
+    contours, hierarchy = cv2.findContours(mask, cv2.RETR_CCOMP, cv2.CHAIN_APPROX_NONE)
+    hierarchy = hierarchy.squeeze(0)
+
+    areas = {}
+    for i, contour in enumerate(contours):
+        if hierarchy[i][3] != -1:
+            continue
+
+        area = cv2.contourArea(contour)
+        hole = hierarchy[i][2]
+        while hole != -1:
+            area -= cv2.contourArea(contours[hole])
+            hole = hierarchy[hole][0]
+
+        x, y = contour[0, 0]
+        areas[labels[y, x]] = area
+
+    return areas
+
+
+class ThresholdTest(TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+
+        self.masks = [
+            generate_fragment_mask(500, 400, 2000),
+            generate_root_mask(400, 500, density=10),
+            np.where(rng.random((200, 200)) > 0.45, 255, 0).astype(np.uint8),
+        ]
+
+    def test_areas_match_contours(self):
+        for mask in self.masks:
+            count, labels = cv2.connectedComponents(mask, connectivity=8)
+            areas = masks.find_component_areas(labels, count)
+
+            expected = contour_areas(mask, labels)
+            self.assertEqual(len(expected), count - 1)
+            for label, area in expected.items():
+                self.assertAlmostEqual(areas[label], area)
+
+    def test_matches_contour_filter(self):
+        for mask in self.masks:
+            mask = fill_holes(mask)
+
+            for threshold_area in (1, 15, 50, 500):
+                np.testing.assert_array_equal(masks.threshold(mask, threshold_area),
+                                              contour_threshold(mask, threshold_area))
+
+    def test_keeps_holes(self):
+        mask = np.zeros((40, 40), dtype=np.uint8)
+        mask[2:38, 2:38] = 255
+        mask[10:30, 10:30] = 0
+        mask[15:25, 15:25] = 255
+        mask[0, 0] = 255
+
+        expected = mask.copy()
+        expected[0, 0] = 0
+        np.testing.assert_array_equal(masks.threshold(mask, 50), expected)
+
+        reference = contour_threshold(mask, 50)
+        self.assertTrue(np.all(masks.threshold(mask, 50)[reference > 0] == 255))
+
+    def test_small_and_empty(self):
+        mask = np.zeros((10, 10), dtype=np.uint8)
+        np.testing.assert_array_equal(masks.threshold(mask, 1), mask)
+
+        mask[2, 2:8] = 255
+        mask[5, 5] = 255
+        mask[7:9, 7:9] = 255
+        np.testing.assert_array_equal(masks.threshold(mask, 1), contour_threshold(mask, 1))
+        self.assertEqual(np.count_nonzero(masks.threshold(mask, 1)), 4)
@@ -0,0 +1,70 @@
+import threading
+import time
+from unittest import TestCase
+
+from segmentation.utils.pipeline import Pipeline
+
+
+def batched(items, size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+
+    if batch:
+        yield batch
+
+
+class PipelineTest(TestCase):
+    def test_runs_every_item_through_every_stage(self):
+        pipeline = Pipeline(queue_size=2)
+        pipeline.add_stage('square', lambda items: (item * item for item in items), workers=3)
+        pipeline.add_stage('batch', lambda items: batched(items, 4))
+        pipeline.add_stage('sum', lambda batches: (sum(batch) for batch in batches), workers=2)
+
+        self.assertEqual(sum(pipeline.run(range(100))), sum(item * item for item in range(100)))
+        self.assertEqual([stage['items'] for stage in pipeline.get_utilization()], [100, 100, 25])
+
+    def test_stages_overlap(self):
+        def sleep(items):
+            for item in items:
+                time.sleep(0.05)
+                yield item
+
+        pipeline = Pipeline()
+        pipeline.add_stage('first', sleep)
+        pipeline.add_stage('second', sleep)
+
+        start = time.perf_counter()
+        self.assertEqual(list(pipeline.run(range(10))), list(range(10)))
+
+        self.assertLess(time.perf_counter() - start, 0.05 * 20 * 0.75)
+        for stage in pipeline.get_utilization():
+            self.assertGreater(stage['utilization'], 0.5)
+            self.assertLessEqual(stage['utilization'], 1)
+
+    def test_error_is_raised(self):
+        def fail(items):
+            for item in items:
+                if item == 5:
+                    raise ValueError(item)
+                yield item
+
+        pipeline = Pipeline(queue_size=1)
+        pipeline.add_stage('fail', fail, workers=2)
+        pipeline.add_stage('identity', lambda items: items)
+
+        with self.assertRaises(ValueError):
+            list(pipeline.run(range(100)))
+
+    def test_stopping_early_stops_workers(self):
+        pipeline = Pipeline(queue_size=1)
+        pipeline.add_stage('identity', lambda items: items, workers=2)
+
+        threads = threading.active_count()
+        for item in pipeline.run(iter(int, 1)):
+            break
+
+        self.assertEqual(threading.active_count(), threads)
@@ -0,0 +1,64 @@
+from unittest import TestCase
+
+import numpy as np
+import torch
+
+from segmentation.models import ModelType
+from segmentation.utils.precision import convert_precision, validate_precision
+from segmentation.utils.predict import predict_probabilities_batch, threshold_probabilities
+
+
+class PrecisionTest(TestCase):
+    def test_outputs_stay_close(self):
+        for model_type in (ModelType.UNET, ModelType.RESNET18):
+            model = model_type.get_model(3, 1).eval()
+            images = torch.rand(2, 3, 70, 90)
+
+            with torch.no_grad():
+                expected = model(images)
+
+            calibration_images = [torch.rand(3, 70, 90) for _ in range(4)]
+            for precision in ('bf16', 'int8'):
+                converted = convert_precision(model, model_type, precision, calibration_images)
+
+                with torch.no_grad():
+                    actual = converted(images)
+
+                self.assertEqual(actual.dtype, torch.float32)
+                self.assertEqual(actual.shape, expected.shape)
+                self.assertLess((actual - expected).abs().max().item(), 0.05)
+
+            with torch.no_grad():
+                np.testing.assert_array_equal(model(images).numpy(), expected.numpy())
+
+    def test_int8_needs_calibration(self):
+        with self.assertRaises(ValueError):
+            convert_precision(ModelType.UNET.get_model(3, 1).eval(), ModelType.UNET, 'int8')
+
+    def test_int8_keeps_saturated_pixels(self):
+        model = ModelType.UNET.get_model(3, 1).eval()
+        with torch.no_grad():
+            model.decoder_output.weight.zero_()
+            model.decoder_output.bias.fill_(50)
+
+        calibration_images = [torch.rand(3, 64, 64) for _ in range(2)]
+        converted = convert_precision(model, ModelType.UNET, 'int8', calibration_images)
+
+        image = torch.rand(3, 64, 64)
+        expected = np.array(threshold_probabilities(predict_probabilities_batch(model, [image])[0]))
+        actual = np.array(threshold_probabilities(predict_probabilities_batch(converted, [image])[0]))
+
+        self.assertTrue(actual.any())
+        np.testing.assert_array_equal(actual, expected)
+
+    def test_validation_report(self):
+        model = ModelType.UNET.get_model(3, 1).eval()
+        images = torch.rand(2, 3, 32, 32)
+
+        result = validate_precision(model, ModelType.UNET, 'bf16', images, mask_threshold=0.5, repeats=1)
+
+        self.assertEqual(result['baseline_dice'], 1)
+        self.assertAlmostEqual(result['dice_change'], result['dice'] - 1, places=4)
+        self.assertGreater(result['speedup'], 0)
+        self.assertGreaterEqual(result['root_fraction'], 0)
+        self.assertLessEqual(result['root_fraction'], 1)
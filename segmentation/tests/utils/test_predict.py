@@ -0,0 +1,45 @@
+import os
+import tempfile
+from unittest import TestCase
+
+import numpy as np
+from PIL import Image as PILImage
+
+from segmentation.benchmarks.synthetic import generate_root_image
+from segmentation.models.unet import UNet
+from segmentation.utils.predict import (predict_probabilities, predict_probabilities_batched, quantize_probabilities,
+                                        threshold_probabilities)
+
+
+class ProbabilityMapTest(TestCase):
+    def test_quantize(self):
+        probabilities = np.array([0, 0.5, 1 - 1e-7, 1], dtype=np.float32)
+
+        np.testing.assert_array_equal(quantize_probabilities(probabilities), [0, 127, 254, 255])
+
+    def test_threshold_matches_float_output(self):
+        probabilities = np.random.default_rng(0).uniform(0, 1, (64, 64)).astype(np.float32)
+        probabilities[16:48, 16:48] = 1
+
+        mask = np.array(threshold_probabilities(quantize_probabilities(probabilities), 0))
+
+        np.testing.assert_array_equal(mask > 0, probabilities.astype(np.uint8) > 0)
+
+
+class BatchedPredictionTest(TestCase):
+    def test_matches_single_predictions(self):
+        model = UNet(3, 1)
+        model.eval()
+
+        with tempfile.TemporaryDirectory() as directory:
+            image_paths = []
+            for index, size in enumerate([(32, 32), (32, 48), (32, 32), (32, 32)]):
+                image_path = os.path.join(directory, f'{index}.png')
+                PILImage.fromarray(generate_root_image(*size, density=500, seed=index)).save(image_path)
+                image_paths.append(image_path)
+
+            batched = dict(predict_probabilities_batched(model, image_paths, batch_size=2))
+
+            self.assertEqual(sorted(batched), [0, 1, 2, 3])
+            for index, image_path in enumerate(image_paths):
+                np.testing.assert_allclose(batched[index], predict_probabilities(model, image_path), atol=1)
@@ -0,0 +1,147 @@
+from unittest import TestCase
+
+import numpy as np
+import cv2
+from skimage.morphology import skeletonize
+
+from segmentation.benchmarks.root_analysis import brute_force_root_radii
+from segmentation.benchmarks.synthetic import generate_fragment_mask, generate_root_mask
+from segmentation.utils import root_analysis
+
+
+class RootRadiiTest(TestCase):
+    def test_matches_brute_force(self):
+        for seed in range(3):
+            mask = generate_root_mask(200, 300, density=20, seed=seed)
+            radii = root_analysis.find_root_radii(mask)
+            reference = brute_force_root_radii(mask)
+            np.testing.assert_allclose(radii, reference, atol=1e-4)
+
+    def test_empty_mask(self):
+        mask = np.zeros((50, 50), dtype=np.uint8)
+        self.assertEqual(len(root_analysis.find_root_radii(mask)), 0)
+        self.assertEqual(root_analysis.find_root_diameter(mask, 1.0), 0)
+        self.assertEqual(root_analysis.find_total_root_volume(mask, 1.0), 0)
+
+    def test_diameter_and_volume(self):
+        mask = generate_root_mask(200, 300, density=20, seed=0)
+        reference = brute_force_root_radii(mask)
+
+        self.assertAlmostEqual(root_analysis.find_root_diameter(mask, 0.5), 2 * np.mean(reference) * 0.5, 4)
+        self.assertAlmostEqual(root_analysis.find_total_root_volume(mask, 0.5),
+                               np.sum(np.pi * (reference * 0.5) ** 2), 2)
+
+
+class CalculateMetricsTest(TestCase):
+    def test_matches_individual_metrics(self):
+        mask = generate_root_mask(200, 300, density=20, seed=1)
+        reference = brute_force_root_radii(mask)
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_TC89_L1)
+
+        metrics = root_analysis.calculate_metrics(mask, 0.5)
+
+        self.assertEqual(metrics['root_count'], len(contours))
+        self.assertAlmostEqual(metrics['average_root_diameter'], 2 * np.mean(reference) * 0.5, 4)
+        self.assertAlmostEqual(metrics['total_root_length'], np.sum(skeletonize(mask)) * 0.5, 4)
+        self.assertAlmostEqual(metrics['total_root_area'], np.sum(mask / 255) * 0.5 ** 2, 4)
+        self.assertAlmostEqual(metrics['total_root_volume'], np.sum(np.pi * (reference * 0.5) ** 2), 2)
+
+    def test_subset(self):
+        mask = generate_root_mask(200, 300, density=20, seed=1)
+
+        metrics = root_analysis.calculate_metrics(mask, 0.5, metrics=['root_count', 'total_root_area'])
+
+        self.assertEqual(set(metrics), {'root_count', 'total_root_area'})
+        self.assertEqual(metrics, {key: root_analysis.calculate_metrics(mask, 0.5)[key] for key in metrics})
+
+    def test_subset_skips_unused_intermediates(self):
+        root_image = root_analysis.RootImage(generate_root_mask(200, 300, density=20, seed=1))
+
+        root_analysis.calculate_metrics(root_image, 0.5, metrics=['total_root_length'])
+
+        self.assertIn('skeleton', vars(root_image))
+        self.assertNotIn('distance_map', vars(root_image))
+
+    def test_empty_mask(self):
+        metrics = root_analysis.calculate_metrics(np.zeros((50, 50), dtype=np.uint8), 0.5)
+
+        self.assertEqual(metrics, {metric: 0 for metric in root_analysis.METRICS})
+
+    def test_invalid_metric(self):
+        with self.assertRaises(ValueError):
+            root_analysis.calculate_metrics(np.zeros((50, 50), dtype=np.uint8), 0.5, metrics=['root_width'])
+
+
+class TiledMetricsTest(TestCase):
+    def assertMetricsAlmostEqual(self, first: dict, second: dict):
+        self.assertEqual(set(first), set(second))
+        for metric in first:
+            self.assertAlmostEqual(float(first[metric]), float(second[metric]), 3, msg=metric)
+
+    def test_matches_untiled(self):
+        for seed in range(3):
+            mask = generate_root_mask(300, 700, density=3, max_thickness=5, seed=seed)
+
+            self.assertMetricsAlmostEqual(root_analysis.calculate_metrics_tiled(mask, 0.5, tile_size=100, halo=20),
+                                          root_analysis.calculate_metrics(mask, 0.5))
+
+    def test_roots_across_tile_corners(self):
+        mask = np.zeros((200, 200), dtype=np.uint8)
+        cv2.line(mask, (0, 0), (199, 199), 255, 1)
+        cv2.line(mask, (0, 199), (199, 0), 255, 3)
+
+        self.assertMetricsAlmostEqual(root_analysis.calculate_metrics_tiled(mask, 0.5, tile_size=50, halo=10),
+                                      root_analysis.calculate_metrics(mask, 0.5))
+
+    def test_holes_across_tiles(self):
+        mask = np.zeros((200, 200), dtype=np.uint8)
+        cv2.circle(mask, (100, 100), 70, 255, 5)
+        cv2.circle(mask, (100, 100), 10, 255, 3)
+
+        tiled = root_analysis.calculate_metrics_tiled(mask, 0.5, tile_size=64, halo=64)
+
+        self.assertEqual(tiled['root_count'], 1)
+        self.assertMetricsAlmostEqual(tiled, root_analysis.calculate_metrics(mask, 0.5))
+
+    def test_subset(self):
+        mask = generate_root_mask(300, 700, density=3, max_thickness=5, seed=0)
+
+        metrics = root_analysis.calculate_metrics_tiled(mask, 0.5, tile_size=100, halo=20,
+                                                        metrics=['total_root_area', 'total_root_length'])
+
+        self.assertEqual(set(metrics), {'total_root_area', 'total_root_length'})
+
+    def test_empty_mask(self):
+        metrics = root_analysis.calculate_metrics_tiled(np.zeros((300, 300), dtype=np.uint8), 0.5, tile_size=100)
+
+        self.assertEqual(metrics, {metric: 0 for metric in root_analysis.METRICS})
+
+
+class RootTableTest(TestCase):
+    def test_totals_match_metrics(self):
+        mask = generate_fragment_mask(500, 500, 2000)
+
+        table = root_analysis.find_root_table(mask, 0.5)
+        metrics = root_analysis.calculate_metrics(mask, 0.5)
+
+        self.assertEqual(len(table), cv2.connectedComponents(mask, connectivity=8)[0] - 1)
+        self.assertAlmostEqual(np.sum(table['area']), metrics['total_root_area'], 4)
+        self.assertAlmostEqual(np.sum(table['length']), metrics['total_root_length'], 4)
+        self.assertAlmostEqual(np.sum(table['volume']), metrics['total_root_volume'], 4)
+
+    def test_single_root(self):
+        mask = np.zeros((50, 60), dtype=np.uint8)
+        mask[10:15, 5:45] = 255
+
+        table = root_analysis.find_root_table(mask, 0.5)
+
+        self.assertEqual(len(table), 1)
+        self.assertEqual((table['x'][0], table['y'][0], table['width'][0], table['height'][0]), (5, 10, 40, 5))
+        self.assertAlmostEqual(table['area'][0], 200 * 0.25)
+        self.assertAlmostEqual(table['average_diameter'][0], root_analysis.find_root_diameter(mask, 0.5), 4)
+
+    def test_empty_mask(self):
+        table = root_analysis.find_root_table(np.zeros((50, 50), dtype=np.uint8), 0.5)
+
+        self.assertEqual(len(table), 0)
+        self.assertEqual(table.dtype, root_analysis.ROOT_TABLE_DTYPE)
@@ -0,0 +1,67 @@
+from unittest import TestCase
+
+import torch
+from torch import nn
+
+from segmentation.models import ModelType
+from segmentation.utils.tiling import TiledModel, blending_ramp, choose_tile_size, tile_starts
+
+
+class ConstantModel(nn.Module):
+    def __init__(self, value: float):
+        super().__init__()
+        self.value = value
+
+    def forward_padded(self, x: torch.Tensor) -> torch.Tensor:
+        return torch.full((x.shape[0], 1, *x.shape[2:]), self.value)
+
+
+class TilingTest(TestCase):
+    def test_tile_size_fits_budget(self):
+        for model_type in (ModelType.UNET, ModelType.RESNET18):
+            for budget in (16 * 1024 ** 2, 256 * 1024 ** 2):
+                height, width = choose_tile_size(model_type, 5000, 7000, budget)
+
+                self.assertEqual(height % model_type.input_multiple, 0)
+                self.assertEqual(width % model_type.input_multiple, 0)
+                self.assertLessEqual(height * width * model_type.activation_bytes_per_pixel, budget)
+
+    def test_tile_size_follows_image(self):
+        self.assertEqual(choose_tile_size(ModelType.UNET, 90, 70, 1024 ** 3), (96, 80))
+
+        height, width = choose_tile_size(ModelType.UNET, 100, 20000, 256 * 1024 ** 2)
+        self.assertEqual(height, 112)
+        self.assertGreater(width, height)
+
+    def test_tiles_cover_image(self):
+        for length, tile, overlap in ((1000, 256, 32), (256, 256, 32), (300, 64, 0)):
+            starts = tile_starts(length, tile, overlap)
+
+            self.assertEqual(starts[0], 0)
+            self.assertEqual(starts[-1] + tile, length)
+            for previous, start in zip(starts, starts[1:]):
+                self.assertGreaterEqual(previous + tile - start, overlap)
+
+        self.assertTrue((blending_ramp(64, 16) > 0).all())
+
+    def test_certain_pixels_stay_certain(self):
+        model = TiledModel(ConstantModel(1.0), ModelType.UNET, 2560 * 64 * 64, overlap=16)
+
+        output = model(torch.rand(2, 3, 150, 170))
+
+        self.assertEqual(output.shape, (2, 1, 150, 170))
+        self.assertTrue((output == 1).all())
+
+    def test_matches_model(self):
+        model = ModelType.UNET.get_model(3, 1).eval()
+        images = torch.rand(1, 3, 96, 80)
+
+        with torch.no_grad():
+            torch.testing.assert_close(TiledModel(model, ModelType.UNET, 1024 ** 3)(images),
+                                       model.forward_padded(images))
+
+            images = torch.rand(1, 3, 150, 170)
+            tiled = TiledModel(model, ModelType.UNET, 2560 * 64 * 64)(images)
+
+        self.assertEqual(tiled.shape, (1, 1, 150, 170))
+        self.assertLess((tiled - model(images)).abs().max().item(), 0.05)
@@ -0,0 +1,256 @@
+import time
+from pathlib import Path
+from typing import BinaryIO
+
+import numpy as np
+import torch
+from torch import nn
+from torchvision.transforms.v2 import functional as F
+
+from segmentation.models import ModelType
+
+BACKENDS = ('eager', 'torchscript', 'onnx')
+
+ARTIFACT_SUFFIXES = {
+    'eager': '.pth',
+    'torchscript': '.pt',
+    'onnx': '.onnx',
+}
+
+
+class PaddedModel(nn.Module):
+    """
+    The part of a segmentation model that runs on inputs already resized to a multiple of its downsampling factor.
+
+    Only this part is exported, since the resizing around it depends on the input size and would otherwise be
+    frozen into the exported graph.
+    """
+
+    def __init__(self, model: nn.Module):
+        super().__init__()
+        self.model = model
+
+    def forward(self, x: torch.Tensor) -> torch.Tensor:
+        return self.model.forward_padded(x)
+
+
+class ArtifactModel(nn.Module):
+    """
+    Runs an exported model with the same input and output resizing as the eager model it was exported from.
+
+    Args:
+        model_type (ModelType): The architecture the artifact was exported from.
+    """
+
+    def __init__(self, model_type: ModelType):
+        super().__init__()
+        self.model_type = model_type
+        self.input_multiple = model_type.input_multiple
+
+    def run(self, x: torch.Tensor) -> torch.Tensor:
+        raise NotImplementedError
+
+    def forward_padded(self, x: torch.Tensor) -> torch.Tensor:
+        return self.run(x)
+
+    def pad(self, x: torch.Tensor) -> torch.Tensor:
+        height = int(self.input_multiple * round(x.shape[2] / self.input_multiple))
+        width = int(self.input_multiple * round(x.shape[3] / self.input_multiple))
+
+        return F.resize(x, (height, width), antialias=None)
+
+    def forward(self, x: torch.Tensor) -> torch.Tensor:
+        output = self.run(self.pad(x))
+
+        return F.resize(output, (x.shape[2], x.shape[3]), antialias=None)
+
+
+class TorchScriptModel(ArtifactModel):
+    """
+    Runs a frozen TorchScript artifact, optimized for inference on the CPU when it is loaded.
+
+    Args:
+        model_type (ModelType): The architecture the artifact was exported from.
+        artifact_path (str | Path): The path to the artifact.
+    """
+
+    def __init__(self, model_type: ModelType, artifact_path: str | Path):
+        super().__init__(model_type)
+        self.module = torch.jit.optimize_for_inference(torch.jit.load(str(artifact_path), map_location='cpu'))
+
+    def run(self, x: torch.Tensor) -> torch.Tensor:
+        return self.module(x)
+
+
+class OnnxModel(ArtifactModel):
+    """
+    Runs an ONNX artifact with the CPU executor of ONNX Runtime.
+
+    Args:
+        model_type (ModelType): The architecture the artifact was exported from.
+        artifact_path (str | Path): The path to the artifact.
+    """
+
+    def __init__(self, model_type: ModelType, artifact_path: str | Path):
+        super().__init__(model_type)
+
+        import onnxruntime
+
+        self.session = onnxruntime.InferenceSession(str(artifact_path), providers=['CPUExecutionProvider'])
+
+    def run(self, x: torch.Tensor) -> torch.Tensor:
+        output, = self.session.run(None, {'image': x.cpu().numpy()})
+
+        return torch.from_numpy(output).to(x.device)
+
+
+def export_torchscript(model: nn.Module, artifact_path: str | Path, example: torch.Tensor) -> None:
+    """
+    Traces a segmentation model and saves it as a frozen TorchScript graph.
+
+    Args:
+        model (nn.Module): The segmentation model, in evaluation mode.
+        artifact_path (str | Path): The path to save the artifact to.
+        example (torch.Tensor): An input batch to trace the model with. Its size must be a multiple of the
+            downsampling factor of the model.
+    """
+    with torch.no_grad():
+        traced = torch.jit.trace(PaddedModel(model).eval(), example)
+
+    torch.jit.save(torch.jit.freeze(traced), str(artifact_path))
+
+
+def export_onnx(model: nn.Module, artifact_path: str | Path, example: torch.Tensor) -> None:
+    """
+    Exports a segmentation model to ONNX, with a dynamic batch size and image size.
+
+    Args:
+        model (nn.Module): The segmentation model, in evaluation mode.
+        artifact_path (str | Path): The path to save the artifact to.
+        example (torch.Tensor): An input batch to trace the model with. Its size must be a multiple of the
+            downsampling factor of the model.
+    """
+    axes = {0: 'batch', 2: 'height', 3: 'width'}
+
+    with torch.no_grad():
+        torch.onnx.export(PaddedModel(model).eval(), example, str(artifact_path), input_names=['image'],
+                          output_names=['probabilities'], dynamic_axes={'image': axes, 'probabilities': axes},
+                          opset_version=17)
+
+
+def load_state_dict(f: str | Path | BinaryIO) -> dict[str, torch.Tensor]:
+    """
+    Reads the weights of a model without unpickling anything but tensors and containers, since uploaded weights
+    cannot be trusted.
+
+    Both plain state dicts, as written by the ``export_model`` command, and training checkpoints are accepted.
+
+    Args:
+        f (str | Path | BinaryIO): The weights, or the file holding them.
+
+    Returns:
+        dict[str, torch.Tensor]: The state dict, without the ``model.`` prefix of training checkpoints.
+
+    Raises:
+        ValueError: If the file is not a state dict of tensors.
+    """
+    try:
+        checkpoint = torch.load(f, map_location='cpu', weights_only=True)
+    except Exception as e:
+        raise ValueError('The weights could not be read as a state dict of tensors.') from e
+
+    model_weights = checkpoint.get('state_dict', checkpoint) if isinstance(checkpoint, dict) else None
+
+    if not isinstance(model_weights, dict) or not model_weights or not all(
+            isinstance(key, str) and isinstance(value, torch.Tensor) for key, value in model_weights.items()):
+        raise ValueError('The weights are not a state dict of tensors.')
+
+    return {key.removeprefix('model.'): value for key, value in model_weights.items()}
+
+
+def load_eager(model_type: ModelType, f: str | Path | BinaryIO) -> nn.Module:
+    """
+    Builds a model architecture and loads its weights, see ``load_state_dict``.
+
+    Args:
+        model_type (ModelType): The architecture of the model.
+        f (str | Path | BinaryIO): The weights, or the file holding them.
+
+    Returns:
+        nn.Module: The model in evaluation mode.
+    """
+    model = model_type.get_model(3, 1)
+
+    model.load_state_dict(load_state_dict(f))
+    model.eval()
+
+    return model
+
+
+def load_backend(backend: str, model_type: ModelType, artifact_path: str | Path) -> nn.Module:
+    """
+    Loads a model to run with one of the inference backends.
+
+    Args:
+        backend (str): One of ``BACKENDS``.
+        model_type (ModelType): The architecture of the model.
+        artifact_path (str | Path): The weights for the eager backend, or the exported artifact for the others.
+
+    Returns:
+        nn.Module: A model that takes and returns the same tensors as the eager model.
+    """
+    if backend == 'eager':
+        return load_eager(model_type, artifact_path)
+    elif backend == 'torchscript':
+        return TorchScriptModel(model_type, artifact_path)
+    elif backend == 'onnx':
+        return OnnxModel(model_type, artifact_path)
+    else:
+        raise ValueError(f'Invalid backend: {backend}')
+
+
+def check_parity(reference: nn.Module, candidate: nn.Module, images: torch.Tensor) -> dict:
+    """
+    Compares the outputs of a backend against the eager model on the same images.
+
+    Args:
+        reference (nn.Module): The eager model.
+        candidate (nn.Module): The model loaded with another backend.
+        images (torch.Tensor): A batch of images.
+
+    Returns:
+        dict: The largest absolute difference between the probabilities, and the fraction of pixels whose
+            thresholded mask differs.
+    """
+    with torch.no_grad():
+        expected = reference(images).numpy()
+        actual = candidate(images).numpy()
+
+    return {
+        'max_abs_difference': float(np.abs(expected - actual).max()),
+        'mask_mismatch': float(np.mean((expected >= 1) != (actual >= 1))),
+    }
+
+
+def measure_latency(model: nn.Module, images: torch.Tensor, repeats: int = 5) -> float:
+    """
+    Measures the median time of a forward pass, after one warm-up pass.
+
+    Args:
+        model (nn.Module): The model.
+        images (torch.Tensor): A batch of images.
+        repeats (int, optional): The number of timed passes. Defaults to 5.
+
+    Returns:
+        float: The median latency in seconds.
+    """
+    timings = []
+    with torch.no_grad():
+        model(images)
+
+        for _ in range(repeats):
+            start = time.perf_counter()
+            model(images)
+            timings.append(time.perf_counter() - start)
+
+    return float(np.median(timings))
@@ -0,0 +1,119 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator
+
+from prometheus_client import Counter, Gauge, Histogram
+
+# The upper bound in pixels of each image size bucket, the last bucket being unbounded.
+SIZE_BUCKETS = (
+    (1_000_000, 'lt1mp'),
+    (4_000_000, '1to4mp'),
+    (16_000_000, '4to16mp'),
+    (None, 'gte16mp'),
+)
+
+LABELS = ('stage', 'model_type', 'size')
+
+STAGE_SECONDS = Histogram(
+    'segmentation_stage_seconds', 'Time spent in each stage of the segmentation pipeline.', LABELS,
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 60))
+STAGE_IMAGES = Counter('segmentation_stage_images', 'Images that went through each stage of the segmentation pipeline.',
+                       LABELS)
+STAGE_FAILURES = Counter('segmentation_stage_failures', 'Stages of the segmentation pipeline that raised an error.',
+                         LABELS)
+
+INFERENCES_IN_PROGRESS = Gauge('segmentation_inferences_in_progress', 'Forward passes currently running.',
+                               ['model_type'])
+
+_model_type = ContextVar('model_type', default='unknown')
+
+
+def get_size_bucket(height: int, width: int) -> str:
+    """
+    Returns the size bucket an image is counted in, so that stage timings of small and large images are kept apart.
+
+    Args:
+        height (int): The height of the image.
+        width (int): The width of the image.
+
+    Returns:
+        str: The label of the bucket.
+    """
+    pixels = height * width
+
+    for limit, label in SIZE_BUCKETS:
+        if limit is None or pixels < limit:
+            return label
+
+
+def get_model_type(model) -> str:
+    """
+    Returns the architecture of a segmentation model, looking through the wrappers added for inference.
+
+    Args:
+        model (nn.Module): The model, possibly tiled, converted to another precision or loaded from an artifact.
+
+    Returns:
+        str: The model type, see ``ModelType``, or ``'unknown'``.
+    """
+    from segmentation.models import ResNet, UNet
+
+    while model is not None:
+        model_type = getattr(model, 'model_type', None)
+        if model_type is not None:
+            return str(model_type)
+
+        if isinstance(model, UNet):
+            return 'unet'
+        if isinstance(model, ResNet):
+            return f'resnet{model.num_layers}'
+
+        model = getattr(model, 'model', None)
+
+    return 'unknown'
+
+
+@contextmanager
+def use_model_type(model_type: str) -> Iterator[None]:
+    """
+    Labels the stages run in the block that do not know which model they serve, such as thresholding and metrics,
+    with a model type.
+
+    Args:
+        model_type (str): The model type.
+    """
+    token = _model_type.set(model_type)
+
+    try:
+        yield
+    finally:
+        _model_type.reset(token)
+
+
+@contextmanager
+def time_stage(stage: str, size: str, images: int = 1, model_type: str = None) -> Iterator[None]:
+    """
+    Records the duration of a stage of the segmentation pipeline and counts the images that went through it.
+
+    Stages may be nested, e.g. ``calculate_metrics`` contains ``skeletonize``, so their durations do not add up to
+    the duration of the pipeline.
+
+    Args:
+        stage (str): The name of the stage.
+        size (str): The size bucket of the images, see ``get_size_bucket``.
+        images (int, optional): The number of images processed together. Defaults to 1.
+        model_type (str, optional): The model type. Defaults to the one set with ``use_model_type``.
+    """
+    labels = (stage, model_type or _model_type.get(), size)
+    start = time.perf_counter()
+
+    try:
+        yield
+    except BaseException:
+        STAGE_FAILURES.labels(*labels).inc()
+        raise
+    finally:
+        STAGE_SECONDS.labels(*labels).observe(time.perf_counter() - start)
+
+    STAGE_IMAGES.labels(*labels).inc(images)
@@ -0,0 +1,120 @@
+import json
+import os
+
+import pandas as pd
+
+
+class RunManifest:
+    """
+    Records the settings of a prediction run and the images it completed, so that an interrupted run can be resumed.
+
+    Measurements are appended to a CSV file and the completed images to a JSON lines manifest, whose first line
+    holds the settings of the run. Both are only appended to, a batch of images at a time, so a crash loses at most
+    the images since the last flush. The manifest is written after the measurements, so it never lists an image
+    whose measurements were lost. When a run is resumed, measurements of images missing from the manifest, which
+    were written just before a crash, are dropped, since these images are predicted again.
+
+    Args:
+        directory (str): The output directory of the run.
+        settings (dict): The settings the measurements depend on. A run can only be resumed with the same settings.
+        columns (list[str]): The columns of the measurements, starting with ``'image'``.
+        resume (bool, optional): Whether to continue the run recorded in the directory instead of starting over.
+            Defaults to False.
+
+    Raises:
+        ValueError: If the recorded run has other settings.
+    """
+
+    manifest_name = 'manifest.jsonl'
+    measurements_name = 'measurements.csv'
+
+    def __init__(self, directory: str, settings: dict, columns: list[str], resume: bool = False):
+        self.manifest_path = os.path.join(directory, self.manifest_name)
+        self.measurements_path = os.path.join(directory, self.measurements_name)
+        self.settings = settings
+        self.columns = columns
+
+        self.completed = set()
+        self.pending = []
+
+        if resume and os.path.exists(self.manifest_path):
+            self.load()
+        else:
+            self.write(pd.DataFrame(columns=columns))
+
+    def load(self) -> None:
+        """
+        Reads the run recorded in the directory, dropping the measurements of images the manifest does not list.
+        """
+        with open(self.manifest_path) as f:
+            lines = f.read().splitlines()
+
+        settings = json.loads(lines[0])['settings']
+        if settings != self.settings:
+            changed = sorted(key for key in settings.keys() | self.settings.keys()
+                             if settings.get(key) != self.settings.get(key))
+            raise ValueError(f'The run in {os.path.dirname(self.manifest_path)} was started with other settings: '
+                             f'{", ".join(changed)}')
+
+        for line in lines[1:]:
+            try:
+                self.completed.add(json.loads(line)['image'])
+            except json.JSONDecodeError:
+                # The last line is cut off if the run crashed while writing it.
+                break
+
+        try:
+            measurements = pd.read_csv(self.measurements_path, on_bad_lines='skip')
+        except (FileNotFoundError, pd.errors.EmptyDataError):
+            measurements = pd.DataFrame(columns=self.columns)
+
+        measurements = measurements[measurements['image'].isin(self.completed)].drop_duplicates('image')
+        self.completed = set(measurements['image'])
+        self.write(measurements)
+
+    def write(self, measurements: pd.DataFrame) -> None:
+        """
+        Replaces the files of the run with the given measurements and the images they belong to.
+        """
+        for path, write in [
+            (self.measurements_path, lambda f: measurements.to_csv(f, index=False)),
+            (self.manifest_path, lambda f: f.writelines(
+                [json.dumps({'settings': self.settings}) + '\n'] +
+                [json.dumps({'image': image}) + '\n' for image in measurements['image']])),
+        ]:
+            with open(path + '.tmp', 'w', newline='') as f:
+                write(f)
+
+            os.replace(path + '.tmp', path)
+
+    def add(self, image: str, measurements: dict) -> None:
+        """
+        Records the measurements of a completed image, to be written with the next ``flush``.
+
+        Args:
+            image (str): The image.
+            measurements (dict): The measurements, by column.
+        """
+        self.pending.append({'image': image, **measurements})
+        self.completed.add(image)
+
+    def flush(self) -> None:
+        """
+        Appends the recorded measurements and images to the files of the run.
+        """
+        if not self.pending:
+            return
+
+        measurements = pd.DataFrame(self.pending, columns=self.columns).round(4)
+
+        with open(self.measurements_path, 'a', newline='') as f:
+            measurements.to_csv(f, header=False, index=False)
+            f.flush()
+            os.fsync(f.fileno())
+
+        with open(self.manifest_path, 'a') as f:
+            f.writelines(json.dumps({'image': row['image']}) + '\n' for row in self.pending)
+            f.flush()
+            os.fsync(f.fileno())
+
+        self.pending = []
@@ -3,33 +3,43 @@ import numpy as np
 import cv2
 
 
-def to_labelme(image_filename: str, image: np.ndarray) -> str:
+def find_polygons(image: np.ndarray) -> list[list[list[int]]]:
     """
-    Convert an image with contours to a LabelMe JSON string.
+    Find the outer contours of the regions of a mask as polygons.
 
     Parameters:
-        image_filename (str): The filename of the image.
-        image (np.ndarray): The image with contours.
+        image (np.ndarray): The mask, non-zero pixels being foreground.
 
     Returns:
-        str: The LabelMe JSON string.
+        list[list[list[int]]]: The x and y coordinates of the vertices of every polygon with at least 3 vertices.
     """
 
     contours, _ = cv2.findContours(image, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_TC89_L1)
-    shapes = []
-    for contour in contours:
-        points = contour.squeeze(1).tolist()
 
-        if len(points) < 3:
-            continue
+    return [points for points in (contour.squeeze(1).tolist() for contour in contours) if len(points) >= 3]
+
+
+def polygons_to_labelme(image_filename: str, polygons: list[list[list[int]]], height: int, width: int) -> str:
+    """
+    Convert polygons to a LabelMe JSON string.
+
+    Parameters:
+        image_filename (str): The filename of the image.
+        polygons (list[list[list[int]]]): The polygons, as returned by ``find_polygons``.
+        height (int): The height of the image.
+        width (int): The width of the image.
+
+    Returns:
+        str: The LabelMe JSON string.
+    """
 
-        shapes.append({
-            'label': 'root',
-            'points': points,
-            'group_id': None,
-            'shape_type': 'polygon',
-            'flags': {}
-        })
+    shapes = [{
+        'label': 'root',
+        'points': points,
+        'group_id': None,
+        'shape_type': 'polygon',
+        'flags': {}
+    } for points in polygons]
 
     labelme_json = json.dumps({
         'version': '4.6.0',
@@ -37,13 +47,28 @@ def to_labelme(image_filename: str, image: np.ndarray) -> str:
         'shapes': shapes,
         'imagePath': image_filename,
         'imageData': None,
-        'imageHeight': image.shape[0],
-        'imageWidth': image.shape[1]
+        'imageHeight': height,
+        'imageWidth': width
     })
 
     return labelme_json
 
 
+def to_labelme(image_filename: str, image: np.ndarray) -> str:
+    """
+    Convert an image with contours to a LabelMe JSON string.
+
+    Parameters:
+        image_filename (str): The filename of the image.
+        image (np.ndarray): The image with contours.
+
+    Returns:
+        str: The LabelMe JSON string.
+    """
+
+    return polygons_to_labelme(image_filename, find_polygons(image), image.shape[0], image.shape[1])
+
+
 def from_labelme(image: np.ndarray, mask_json: str) -> np.ndarray:
     """
     Save a new mask from a LabelMe JSON string.
@@ -68,61 +93,51 @@ def from_labelme(image: np.ndarray, mask_json: str) -> np.ndarray:
     return mask
 
 
-def threshold(mask: np.ndarray, threshold_area: int = 50) -> np.ndarray:
+def find_component_areas(labels: np.ndarray, count: int) -> np.ndarray:
     """
-    Apply thresholding to a binary mask based on contour area.
+    Calculate the contour area of labelled components, without their holes.
+
+    The area is that of the polygon through the centers of the border pixels, as given by ``cv2.contourArea``. Every
+    2x2 block of pixels contributes the part of its square that lies inside the polygon to the component of its
+    corners: all of it with four foreground corners, half of it with three, which the border cuts diagonally, and
+    none of it otherwise.
 
     Parameters:
-        mask (np.ndarray): Binary mask image.
-        threshold_area (int, optional): Minimum contour area threshold. Defaults to 50.
+        labels (np.ndarray): The 8-connected component labels, 0 being the background.
+        count (int): The number of labels, including the background.
 
     Returns:
-        np.ndarray: Thresholded mask image.
+        np.ndarray: The area of each label, that of the background being meaningless.
     """
 
-    output_contours, hierarchy = cv2.findContours(mask, cv2.RETR_CCOMP, cv2.CHAIN_APPROX_NONE)
-
-    if len(output_contours) == 0:
-        return mask
+    foreground = (labels > 0).astype(np.uint8)
+    corners = foreground[:-1, :-1] + foreground[1:, :-1] + foreground[:-1, 1:] + foreground[1:, 1:]
 
-    hierarchy = hierarchy.squeeze(0)
+    inside = corners >= 3
+    owners = np.maximum(np.maximum(labels[:-1, :-1], labels[1:, :-1]), np.maximum(labels[:-1, 1:], labels[1:, 1:]))
 
-    threshold_contours = []
-    threshold_heirarchy = []
-    for i in range(len(output_contours)):
-        if hierarchy[i][3] != -1:
-            continue
+    return np.bincount(owners[inside], weights=np.where(corners[inside] == 4, 1.0, 0.5), minlength=count)
 
-        current_index = hierarchy[i][2]
-        contour_area = cv2.contourArea(output_contours[i])
-        while current_index != -1:
-            contour_area -= cv2.contourArea(output_contours[current_index])
-            current_index = hierarchy[current_index][0]
 
-        if contour_area < threshold_area:
-            continue
-
-        threshold_contours.append(output_contours[i])
-        threshold_heirarchy.append(hierarchy[i])
-
-        current_index = hierarchy[i][2]
-        while current_index != -1:
-            threshold_contours.append(output_contours[current_index])
-            threshold_heirarchy.append(hierarchy[current_index])
-            current_index = hierarchy[current_index][0]
+def threshold(mask: np.ndarray, threshold_area: int = 50) -> np.ndarray:
+    """
+    Apply thresholding to a binary mask based on contour area.
 
-    thresholded_mask = np.zeros(mask.shape, dtype=np.uint8)
+    Components are 8-connected, like the contours found by ``cv2.findContours``, and their area is that of their
+    contour minus that of their holes, see ``find_component_areas``. Kept components are copied as is, with their
+    holes and any components inside them.
 
-    for i in range(len(threshold_contours)):
-        if threshold_heirarchy[i][3] != -1:
-            continue
+    Parameters:
+        mask (np.ndarray): Binary mask image.
+        threshold_area (int, optional): Minimum contour area threshold. Defaults to 50.
 
-        cv2.drawContours(thresholded_mask, threshold_contours, i, 255, cv2.FILLED)
+    Returns:
+        np.ndarray: Thresholded mask image.
+    """
 
-    for i in range(len(threshold_contours)):
-        if threshold_heirarchy[i][3] == -1:
-            continue
+    count, labels = cv2.connectedComponents(mask, connectivity=8)
 
-        cv2.drawContours(thresholded_mask, threshold_contours, i, 0, cv2.FILLED)
+    lookup = np.where(find_component_areas(labels, count) >= threshold_area, 255, 0).astype(np.uint8)
+    lookup[0] = 0
 
-    return thresholded_mask
+    return lookup[labels]
@@ -0,0 +1,203 @@
+import queue
+import threading
+import time
+from collections.abc import Callable, Iterable, Iterator
+
+_DONE = object()
+
+# How often threads blocked on a queue check whether the pipeline was stopped, in seconds.
+_POLL_SECONDS = 0.1
+
+
+class Stage:
+    """
+    A step of a ``Pipeline``, run by a pool of worker threads.
+
+    Args:
+        name (str): The name the stage is reported under.
+        function (Callable[[Iterator], Iterator]): Turns the items a worker takes from the stage's input queue into
+            the items it passes on. It may hold items back, e.g. to batch them.
+        workers (int): The number of worker threads.
+    """
+
+    def __init__(self, name: str, function: Callable[[Iterator], Iterator], workers: int):
+        self.name = name
+        self.function = function
+        self.workers = workers
+
+        self.items = 0
+        self.busy_seconds = 0.0
+        self.lock = threading.Lock()
+
+
+class Pipeline:
+    """
+    Runs stages concurrently, each on its own worker threads, connected by bounded queues.
+
+    Every stage works on the next items while the stages after it process the previous ones, so slow disk reads
+    and writes overlap with compute as long as the work releases the GIL, like OpenCV, NumPy and PyTorch do. The
+    queues hold at most ``queue_size`` items each, so a slow stage holds back the stages before it instead of
+    letting items pile up in memory. Items leave a stage with several workers in the order they are done.
+
+    Args:
+        queue_size (int, optional): The largest number of items waiting between two stages. Defaults to 8.
+    """
+
+    def __init__(self, queue_size: int = 8):
+        self.queue_size = queue_size
+        self.stages = []
+        self.elapsed_seconds = 0.0
+
+        self.stopped = threading.Event()
+        self.errors = []
+
+    def add_stage(self, name: str, function: Callable[[Iterator], Iterator], workers: int = 1) -> 'Pipeline':
+        """
+        Appends a stage to the pipeline.
+
+        Args:
+            name (str): The name the stage is reported under.
+            function (Callable[[Iterator], Iterator]): Turns the items a worker takes into the items it passes on.
+            workers (int, optional): The number of worker threads. Defaults to 1.
+
+        Returns:
+            Pipeline: The pipeline.
+        """
+        self.stages.append(Stage(name, function, workers))
+
+        return self
+
+    def run(self, items: Iterable) -> Iterator:
+        """
+        Feeds items through the stages.
+
+        Stopping the iteration early stops the workers. An error raised by a stage stops the pipeline and is raised
+        again here.
+
+        Args:
+            items (Iterable): The inputs of the first stage.
+
+        Yields:
+            The outputs of the last stage.
+        """
+        self.stopped.clear()
+        self.errors = []
+
+        queues = [queue.Queue(self.queue_size) for _ in range(len(self.stages) + 1)]
+        threads = [threading.Thread(target=self._feed, args=(items, queues[0], self.stages[0].workers), daemon=True)]
+
+        for index, stage in enumerate(self.stages):
+            consumers = self.stages[index + 1].workers if index + 1 < len(self.stages) else 1
+            running = [stage.workers]
+
+            for _ in range(stage.workers):
+                threads.append(threading.Thread(
+                    target=self._work, args=(stage, queues[index], queues[index + 1], running, consumers),
+                    daemon=True))
+
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+
+        try:
+            while (item := self._get(queues[-1])) is not _DONE:
+                yield item
+        finally:
+            self.stopped.set()
+            for thread in threads:
+                thread.join()
+
+            self.elapsed_seconds = time.perf_counter() - start
+
+        if self.errors:
+            raise self.errors[0]
+
+    def get_utilization(self) -> list[dict]:
+        """
+        Reports how busy the workers of each stage were during the last run, leaving out the time they spent waiting
+        on the queues. The stage with the highest utilization is the bottleneck.
+
+        Returns:
+            list[dict]: The name, worker count, item count, busy time and utilization of every stage.
+        """
+        return [{
+            'stage': stage.name,
+            'workers': stage.workers,
+            'items': stage.items,
+            'busy_seconds': stage.busy_seconds,
+            'utilization': stage.busy_seconds / (self.elapsed_seconds * stage.workers) if self.elapsed_seconds else 0,
+        } for stage in self.stages]
+
+    def _get(self, inputs: queue.Queue):
+        while not self.stopped.is_set():
+            try:
+                return inputs.get(timeout=_POLL_SECONDS)
+            except queue.Empty:
+                pass
+
+        return _DONE
+
+    def _put(self, outputs: queue.Queue, item) -> bool:
+        while not self.stopped.is_set():
+            try:
+                outputs.put(item, timeout=_POLL_SECONDS)
+                return True
+            except queue.Full:
+                pass
+
+        return False
+
+    def _feed(self, items: Iterable, outputs: queue.Queue, consumers: int) -> None:
+        try:
+            for item in items:
+                if not self._put(outputs, item):
+                    return
+        except BaseException as e:
+            self.errors.append(e)
+            self.stopped.set()
+        finally:
+            for _ in range(consumers):
+                self._put(outputs, _DONE)
+
+    def _work(self, stage: Stage, inputs: queue.Queue, outputs: queue.Queue, running: list[int],
+              consumers: int) -> None:
+        start = time.perf_counter()
+        waiting = 0.0
+        items = 0
+
+        def take() -> Iterator:
+            nonlocal waiting, items
+
+            while True:
+                wait_start = time.perf_counter()
+                item = self._get(inputs)
+                waiting += time.perf_counter() - wait_start
+
+                if item is _DONE:
+                    return
+
+                items += 1
+                yield item
+
+        try:
+            for result in stage.function(take()):
+                wait_start = time.perf_counter()
+                delivered = self._put(outputs, result)
+                waiting += time.perf_counter() - wait_start
+
+                if not delivered:
+                    return
+        except BaseException as e:
+            self.errors.append(e)
+            self.stopped.set()
+        finally:
+            with stage.lock:
+                stage.items += items
+                stage.busy_seconds += time.perf_counter() - start - waiting
+
+                running[0] -= 1
+                last = running[0] == 0
+
+            if last:
+                for _ in range(consumers):
+                    self._put(outputs, _DONE)
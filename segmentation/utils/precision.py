@@ -0,0 +1,179 @@
+import numpy as np
+import torch
+from torch import nn
+
+from segmentation.models import ModelType
+from segmentation.models.metrics import Dice
+from .backends import ArtifactModel, PaddedModel, measure_latency
+
+PRECISIONS = ('fp32', 'bf16', 'int8')
+
+
+class BFloat16Model(nn.Module):
+    """
+    Runs a model under autocast to bfloat16, returning float32 outputs.
+
+    Args:
+        model (nn.Module): The model.
+    """
+
+    def __init__(self, model: nn.Module):
+        super().__init__()
+        self.model = model
+
+    def forward(self, x: torch.Tensor) -> torch.Tensor:
+        with torch.autocast(x.device.type, dtype=torch.bfloat16):
+            output = self.model(x)
+
+        return output.float()
+
+    def forward_padded(self, x: torch.Tensor) -> torch.Tensor:
+        with torch.autocast(x.device.type, dtype=torch.bfloat16):
+            output = self.model.forward_padded(x)
+
+        return output.float()
+
+
+class QuantizedModel(ArtifactModel):
+    """
+    Runs a model statically quantized to int8, with the same input and output resizing as the eager model.
+
+    Args:
+        model_type (ModelType): The architecture of the model.
+        module (nn.Module): The quantized model, see ``quantize_static``.
+    """
+
+    def __init__(self, model_type: ModelType, module: nn.Module):
+        super().__init__(model_type)
+        self.module = module
+
+    def run(self, x: torch.Tensor) -> torch.Tensor:
+        return self.module(x)
+
+
+def quantize_static(model: nn.Module, model_type: ModelType, calibration_images: list[torch.Tensor]) -> nn.Module:
+    """
+    Quantizes the weights and activations of a model to int8, calibrating the activation ranges on sample images.
+
+    The final sigmoid runs in float32 on the dequantized logits. A quantized sigmoid cannot output more than
+    255/256, so saturated pixels would never reach the probability of 1 that ``threshold_probabilities`` requires.
+
+    Args:
+        model (nn.Module): The model, in evaluation mode.
+        model_type (ModelType): The architecture of the model.
+        calibration_images (list[torch.Tensor]): Images representative of the ones the model will run on, as
+            returned by ``load_image``.
+
+    Returns:
+        nn.Module: The quantized model.
+    """
+    from torch.ao.quantization import get_default_qconfig_mapping
+    from torch.ao.quantization.quantize_fx import convert_fx, prepare_fx
+
+    if not calibration_images:
+        raise ValueError('Static quantization needs at least one calibration image')
+
+    calibration_model = ArtifactModel(model_type)
+
+    qconfig_mapping = get_default_qconfig_mapping('x86')
+    for sigmoid in ('sigmoid', torch.sigmoid, nn.Sigmoid):
+        qconfig_mapping.set_object_type(sigmoid, None)
+
+    with torch.no_grad():
+        padded = [calibration_model.pad(image.unsqueeze(0)) for image in calibration_images]
+        prepared = prepare_fx(PaddedModel(model).eval(), qconfig_mapping, (padded[0],))
+
+        for image in padded:
+            prepared(image)
+
+    return QuantizedModel(model_type, convert_fx(prepared))
+
+
+def convert_precision(model: nn.Module, model_type: ModelType, precision: str,
+                      calibration_images: list[torch.Tensor] = None) -> nn.Module:
+    """
+    Converts a model to run in one of the inference precisions.
+
+    Args:
+        model (nn.Module): The model, in evaluation mode.
+        model_type (ModelType): The architecture of the model.
+        precision (str): One of ``PRECISIONS``.
+        calibration_images (list[torch.Tensor], optional): The images to calibrate int8 quantization with.
+
+    Returns:
+        nn.Module: A model that takes and returns the same tensors as the original one.
+    """
+    if precision == 'fp32':
+        return model
+    elif precision == 'bf16':
+        return BFloat16Model(model)
+    elif precision == 'int8':
+        return quantize_static(model, model_type, calibration_images)
+    else:
+        raise ValueError(f'Invalid precision: {precision}')
+
+
+def dice_score(masks_true: np.ndarray, masks_pred: np.ndarray) -> float:
+    """
+    Computes the Dice coefficient between two sets of binary masks.
+
+    Args:
+        masks_true (np.ndarray): The reference masks.
+        masks_pred (np.ndarray): The predicted masks.
+
+    Returns:
+        float: The Dice coefficient, 1 when both are empty.
+    """
+    return float(Dice()(torch.from_numpy(masks_true).float(), torch.from_numpy(masks_pred).float()))
+
+
+def validate_precision(model: nn.Module, model_type: ModelType, precision: str, images: torch.Tensor,
+                       masks: np.ndarray = None, calibration_images: list[torch.Tensor] = None,
+                       mask_threshold: float = 1.0, repeats: int = 3) -> dict:
+    """
+    Compares a reduced-precision model against the float32 model on validation images.
+
+    Args:
+        model (nn.Module): The float32 model, in evaluation mode.
+        model_type (ModelType): The architecture of the model.
+        precision (str): One of ``PRECISIONS``.
+        images (torch.Tensor): A batch of validation images.
+        masks (np.ndarray, optional): The ground truth masks of the images. Defaults to the float32 predictions, in
+            which case the Dice coefficient measures the agreement with the float32 model.
+        calibration_images (list[torch.Tensor], optional): The images to calibrate int8 quantization with.
+        mask_threshold (float, optional): The probability from which a pixel is a root. Defaults to 1, the rule
+            used by the API, see ``threshold_probabilities``.
+        repeats (int, optional): The number of timed forward passes. Defaults to 3.
+
+    Returns:
+        dict: The Dice coefficients of both models against the ground truth, the change in Dice, the fractions of
+            pixels each model predicts as roots, the speedup and the largest difference between the probabilities.
+            Both Dice coefficients are 1 when neither model predicts any roots, which the root fractions show.
+    """
+    converted = convert_precision(model, model_type, precision, calibration_images)
+
+    with torch.no_grad():
+        expected = model(images).squeeze(1).numpy()
+        actual = converted(images).squeeze(1).numpy()
+
+    if masks is None:
+        masks = expected >= mask_threshold
+
+    baseline_dice = dice_score(masks, expected >= mask_threshold)
+    dice = dice_score(masks, actual >= mask_threshold)
+    baseline_root_fraction = float((expected >= mask_threshold).mean())
+    root_fraction = float((actual >= mask_threshold).mean())
+
+    baseline_seconds = measure_latency(model, images, repeats)
+    seconds = measure_latency(converted, images, repeats)
+
+    return {
+        'precision': precision,
+        'baseline_dice': round(baseline_dice, 4),
+        'dice': round(dice, 4),
+        'dice_change': round(dice - baseline_dice, 4),
+        'baseline_root_fraction': round(baseline_root_fraction, 4),
+        'root_fraction': round(root_fraction, 4),
+        'speedup': round(baseline_seconds / seconds, 2),
+        'max_abs_difference': float(np.abs(expected - actual).max()),
+    }
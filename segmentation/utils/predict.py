@@ -1,12 +1,139 @@
+from typing import Iterator
+
 from PIL import Image as PILImage
 import numpy as np
 import torch
 from torch import nn
 from torchvision.transforms.v2 import functional as F
 
+from .instrumentation import INFERENCES_IN_PROGRESS, get_model_type, get_size_bucket, time_stage, use_model_type
 from .masks import threshold
 
 
+def quantize_probabilities(probabilities: np.ndarray) -> np.ndarray:
+    """
+    Quantizes the output of a segmentation model to 8 bits.
+
+    The value 255 is reserved for fully saturated outputs, so that thresholding the quantized map with
+    ``threshold_probabilities`` gives exactly the same mask as the float output it was quantized from.
+
+    Args:
+        probabilities (np.ndarray): The model output, with values between 0 and 1.
+
+    Returns:
+        np.ndarray: The quantized probabilities as a uint8 array.
+    """
+    quantized = np.minimum(probabilities * 255, 254).astype(np.uint8)
+    quantized[probabilities >= 1] = 255
+
+    return quantized
+
+
+def load_image(image_path: str) -> torch.Tensor:
+    """
+    Loads an image as the float tensor the segmentation models take as input.
+
+    Args:
+        image_path (str): The path to the image.
+
+    Returns:
+        torch.Tensor: The RGB channels of the image scaled to [0, 1], with shape (3, height, width).
+    """
+    image = PILImage.open(image_path)
+
+    with time_stage('decode', get_size_bucket(image.height, image.width)):
+        image = np.array(image)
+        image = image[:, :, :3]
+        image = F.to_image(image)
+        image = F.to_dtype(image, torch.float32, scale=True)
+
+    return image
+
+
+def predict_probabilities_batch(model: nn.Module, images: list[torch.Tensor]) -> list[np.ndarray]:
+    """
+    Runs a segmentation model on a batch of images of the same size in a single forward pass.
+
+    Args:
+        model (nn.Module): The segmentation model.
+        images (list[torch.Tensor]): The images, as returned by ``load_image``.
+
+    Returns:
+        list[np.ndarray]: The quantized probability map of each image, see ``quantize_probabilities``.
+    """
+    model_type = get_model_type(model)
+    size = get_size_bucket(*images[0].shape[1:])
+
+    with INFERENCES_IN_PROGRESS.labels(model_type).track_inprogress(), \
+            time_stage('forward', size, len(images), model_type), torch.no_grad():
+        output = model(torch.stack(images))
+
+    with time_stage('quantize', size, len(images), model_type):
+        return [quantize_probabilities(probabilities.squeeze(0).numpy()) for probabilities in output]
+
+
+def predict_probabilities_batched(model: nn.Module, image_paths: list[str],
+                                  batch_size: int = 8) -> Iterator[tuple[int, np.ndarray]]:
+    """
+    Runs a segmentation model on many images, batching together images of the same size.
+
+    Image sizes are read from the file headers, and each batch is only decoded right before its forward pass.
+    Results are yielded as soon as their batch is done, so callers can post-process a batch while the next one runs.
+
+    Args:
+        model (nn.Module): The segmentation model.
+        image_paths (list[str]): The paths to the input images.
+        batch_size (int, optional): The largest number of images in a forward pass. Defaults to 8.
+
+    Yields:
+        tuple[int, np.ndarray]: The index of an image in ``image_paths`` and its quantized probability map.
+    """
+    groups = {}
+    for index, image_path in enumerate(image_paths):
+        groups.setdefault(PILImage.open(image_path).size, []).append(index)
+
+    for indices in groups.values():
+        for start in range(0, len(indices), batch_size):
+            batch = indices[start:start + batch_size]
+            images = [load_image(image_paths[index]) for index in batch]
+
+            yield from zip(batch, predict_probabilities_batch(model, images))
+
+
+def predict_probabilities(model: nn.Module, image_path: str) -> np.ndarray:
+    """
+    Runs a segmentation model on an input image and returns its quantized output.
+
+    Args:
+        model (nn.Module): The segmentation model.
+        image_path (str): The path to the input image.
+
+    Returns:
+        np.ndarray: The quantized probability map, see ``quantize_probabilities``.
+    """
+    return predict_probabilities_batch(model, [load_image(image_path)])[0]
+
+
+def threshold_probabilities(probability_map: np.ndarray, area_threshold: int = 15) -> PILImage.Image:
+    """
+    Turns a quantized probability map into a segmentation mask.
+
+    Args:
+        probability_map (np.ndarray): The quantized probability map, see ``quantize_probabilities``.
+        area_threshold (int, optional): The threshold for filtering small regions in the segmentation mask.
+            Defaults to 15.
+
+    Returns:
+        PIL.Image.Image: The segmentation mask as a PIL image.
+    """
+    with time_stage('threshold', get_size_bucket(*probability_map.shape[:2])):
+        image = (probability_map == 255).astype(np.uint8)
+        image = threshold(image, area_threshold)
+        image = F.to_pil_image(image)
+
+    return image
+
+
 def predict(model: nn.Module, image_path: str, area_threshold: int = 15) -> PILImage.Image:
     """
     Predicts the segmentation mask for an input image using a given model.
@@ -20,17 +147,5 @@ def predict(model: nn.Module, image_path: str, area_threshold: int = 15) -> PILI
     Returns:
         PIL.Image.Image: The predicted segmentation mask as a PIL image.
     """
-    image = PILImage.open(image_path)
-    image = np.array(image)
-    image = image[:, :, :3]
-    image = F.to_image(image)
-    image = F.to_dtype(image, torch.float32, scale=True)
-
-    image = image.unsqueeze(0)
-    image = model(image).detach()
-    image = image.squeeze(0, 1)
-    image = image.numpy().astype(np.uint8)
-    image = threshold(image, area_threshold)
-    image = F.to_pil_image(image)
-
-    return image
+    with use_model_type(get_model_type(model)):
+        return threshold_probabilities(predict_probabilities(model, image_path), area_threshold)
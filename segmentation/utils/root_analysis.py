@@ -1,149 +1,580 @@
+from functools import cached_property
+
 import cv2
 from skimage.morphology import skeletonize
 import numpy as np
 
+from .instrumentation import get_size_bucket, time_stage
+
+METRICS = (
+    'root_count',
+    'average_root_diameter',
+    'total_root_length',
+    'total_root_area',
+    'total_root_volume',
+)
+
+ROOT_TABLE_DTYPE = np.dtype([
+    ('area', np.float64),
+    ('length', np.float64),
+    ('average_diameter', np.float64),
+    ('volume', np.float64),
+    ('x', np.int32),
+    ('y', np.int32),
+    ('width', np.int32),
+    ('height', np.int32),
+])
+
+
+class RootImage:
+    """
+    A root mask together with the intermediates the metrics are computed from.
+
+    Every intermediate is built on first access and reused afterwards, so each of them is computed at most once per
+    mask no matter how many metrics are requested. Building each intermediate is timed as a stage of the segmentation
+    pipeline.
 
-def find_root_count(image: np.ndarray) -> int:
+    Parameters:
+    image (numpy.ndarray): The root mask. Any non-zero pixel is treated as root.
+    """
+
+    def __init__(self, image: np.ndarray):
+        self.image = image
+        self.size = get_size_bucket(*image.shape[:2])
+
+    @cached_property
+    def binary(self) -> np.ndarray:
+        return self.image > 0
+
+    @cached_property
+    def skeleton(self) -> np.ndarray:
+        binary = self.binary
+        with time_stage('skeletonize', self.size):
+            return skeletonize(binary)
+
+    @cached_property
+    def contours(self) -> tuple[np.ndarray]:
+        with time_stage('find_contours', self.size):
+            contours, _ = cv2.findContours(self.image, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_NONE)
+        return contours
+
+    @cached_property
+    def distance_map(self) -> np.ndarray:
+        contours = self.contours
+        with time_stage('distance_transform', self.size):
+            return find_distance_map(self.image, contours)
+
+    @cached_property
+    def radii(self) -> np.ndarray:
+        skeleton, distance_map = self.skeleton, self.distance_map
+        with time_stage('root_radii', self.size):
+            return find_root_radii(self.image, skeleton, distance_map)
+
+    @cached_property
+    def components(self) -> tuple[np.ndarray, np.ndarray]:
+        binary = self.binary
+        with time_stage('label_components', self.size):
+            _, labels, stats, _ = cv2.connectedComponentsWithStats(
+                binary.view(np.uint8), connectivity=8, ltype=cv2.CV_32S)
+        return labels, stats
+
+
+def _as_root_image(image: np.ndarray | RootImage) -> RootImage:
+    return image if isinstance(image, RootImage) else RootImage(image)
+
+
+def find_root_count(image: np.ndarray | RootImage) -> int:
     """
     Counts the number of roots in the given image.
 
     Parameters:
-    image (numpy.ndarray): The input image.
+    image (numpy.ndarray | RootImage): The input image.
 
     Returns:
     int: The number of roots in the image.
     """
 
-    image_contours, _ = cv2.findContours(image, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_TC89_L1)
-
-    return len(image_contours)
+    return len(_as_root_image(image).contours)
 
 
-def find_total_root_length(image: np.ndarray, scaling_factor: float) -> float:
+def find_total_root_length(image: np.ndarray | RootImage, scaling_factor: float) -> float:
     """
     Calculates the total length of roots in an image.
 
     Parameters:
-    image (Image): The root image.
+    image (numpy.ndarray | RootImage): The root image.
     scaling_factor (float): The scaling factor to apply to the total length.
 
     Returns:
     float: The calculated root length.
     """
 
-    skeleton = skeletonize(image)
+    return np.count_nonzero(_as_root_image(image).skeleton) * scaling_factor
 
-    return np.sum(skeleton) * scaling_factor
 
-
-def find_total_root_area(image: np.ndarray, scaling_factor: float) -> float:
+def find_total_root_area(image: np.ndarray | RootImage, scaling_factor: float) -> float:
     """
     Calculates the total area of roots in an image.
 
     Parameters:
-    image (Image): The root image.
+    image (numpy.ndarray | RootImage): The root image.
     scaling_factor (float): The scaling factor to apply to the total area.
 
     Returns:
     float: The calculated root area.
     """
 
-    return np.sum(image / 255) * (scaling_factor ** 2)
+    return np.sum(_as_root_image(image).image, dtype=np.uint64) / 255 * (scaling_factor ** 2)
+
+
+def find_distance_map(image: np.ndarray, contours: tuple[np.ndarray] = None) -> np.ndarray:
+    """
+    Calculates the Euclidean distance from every pixel to the nearest external root contour pixel.
+
+    Parameters:
+    image (numpy.ndarray): The root image.
+    contours (tuple[numpy.ndarray], optional): The external contours of the image, found with
+        ``cv2.CHAIN_APPROX_NONE``. Computed from the image if not given.
+
+    Returns:
+    numpy.ndarray: A float32 array of the same shape as the image.
+    """
+
+    if contours is None:
+        contours, _ = cv2.findContours(image, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_NONE)
+
+    sources = np.ones(image.shape[:2], dtype=np.uint8)
+
+    if len(contours) > 0:
+        contour_points = np.vstack(contours).reshape(-1, 2)
+        sources[contour_points[:, 1], contour_points[:, 0]] = 0
 
+    return cv2.distanceTransform(sources, cv2.DIST_L2, cv2.DIST_MASK_PRECISE)
 
-def find_root_diameter(image: np.ndarray, scaling_factor: float) -> float:
+
+def find_root_radii(image: np.ndarray, skeleton: np.ndarray = None, distance_map: np.ndarray = None) -> np.ndarray:
+    """
+    Calculates the root radius at every skeleton pixel of an image.
+
+    The radius of a skeleton pixel is its distance to the nearest external contour pixel, read off a single
+    distance transform of the image instead of being searched for point by point.
+
+    Parameters:
+    image (numpy.ndarray): The root image.
+    skeleton (numpy.ndarray, optional): The skeleton of the image. Computed from the image if not given.
+    distance_map (numpy.ndarray, optional): The output of ``find_distance_map``. Computed from the image if not given.
+
+    Returns:
+    numpy.ndarray: The unscaled radius at each skeleton pixel, in row-major order.
+    """
+
+    if skeleton is None:
+        skeleton = skeletonize(image > 0)
+
+    if not skeleton.any():
+        return np.zeros(0, dtype=np.float32)
+
+    if distance_map is None:
+        distance_map = find_distance_map(image)
+
+    return distance_map[skeleton.astype(bool)]
+
+
+def find_root_diameter(image: np.ndarray | RootImage, scaling_factor: float) -> float:
     """
     Calculates the average diameter of roots in an image.
 
     Parameters:
-    image (Image): The root image.
+    image (numpy.ndarray | RootImage): The root image.
     scaling_factor (float): The scaling factor to apply to the total diameter.
 
     Returns:
     float: The calculated root diameter.
     """
 
-    skeleton = skeletonize(image).astype(np.uint8)
+    radii = _as_root_image(image).radii
+
+    if len(radii) == 0:
+        return 0
+
+    return 2 * np.mean(radii, dtype=np.float64) * scaling_factor
+
+
+def find_total_root_volume(image: np.ndarray | RootImage, scaling_factor: float) -> float:
+    """
+    Calculates the total volume of roots in an image.
+
+    Parameters:
+    image (numpy.ndarray | RootImage): The root image.
+    scaling_factor (float): The scaling factor to apply to the total volume.
 
-    image_contours, _ = cv2.findContours(
-        image, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_NONE)
+    Returns:
+    float: The calculated root volume.
+    """
 
-    y, x = np.where(skeleton == 1)
+    radii = _as_root_image(image).radii
 
-    if len(x) == 0 or len(y) == 0:
+    if len(radii) == 0:
         return 0
 
-    image_contour_points = np.vstack(image_contours).squeeze(axis=1)
+    return np.pi * np.sum(np.square(radii, dtype=np.float64)) * scaling_factor ** 2
+
 
-    diameters = []
-    for point in zip(x, y):
-        point = np.array(point)[np.newaxis, :]
-        distances = np.linalg.norm(image_contour_points - point, axis=1)
-        diameters.append(2 * np.min(distances))
+def calculate_metrics(image: np.ndarray | RootImage, scaling_factor: float, metrics: list[str] = None) -> dict:
+    """
+    Calculates the metrics of the given root image.
 
-    return np.mean(diameters) * scaling_factor
+    The mask, its skeleton, its contours and its distance map are each computed once and shared between the
+    metrics, and only the intermediates the requested metrics depend on are computed at all.
 
+    Parameters:
+    image (numpy.ndarray | RootImage): The root image.
+    scaling_factor (float): The scaling factor to apply to the metrics.
+    metrics (list[str], optional): The names of the metrics to calculate, from ``METRICS``. Defaults to all of them.
 
-def find_total_root_volume(image: np.ndarray, scaling_factor: float) -> float:
+    Returns:
+    dict: The calculated metrics.
     """
-    Calculates the total volume of roots in an image.
+
+    if metrics is None:
+        metrics = METRICS
+
+    unknown_metrics = set(metrics) - set(METRICS)
+    if unknown_metrics:
+        raise ValueError(f'Invalid metrics: {", ".join(sorted(unknown_metrics))}')
+
+    root_image = _as_root_image(image)
+
+    with time_stage('calculate_metrics', root_image.size):
+        if find_root_count(root_image) == 0:
+            return {metric: 0 for metric in metrics}
+
+        calculations = {
+            'root_count': lambda: find_root_count(root_image),
+            'average_root_diameter': lambda: find_root_diameter(root_image, scaling_factor),
+            'total_root_length': lambda: find_total_root_length(root_image, scaling_factor),
+            'total_root_area': lambda: find_total_root_area(root_image, scaling_factor),
+            'total_root_volume': lambda: find_total_root_volume(root_image, scaling_factor),
+        }
+
+        return {metric: calculations[metric]() for metric in metrics}
+
+
+def find_root_table(image: np.ndarray | RootImage, scaling_factor: float) -> np.ndarray:
+    """
+    Calculates the metrics of every root in the given image.
+
+    Roots are the 8-connected components of the mask, labelled once. The per-root values are aggregated from the
+    shared skeleton and distance map with ``numpy.bincount`` over the labels, so the cost does not depend on the
+    number of roots.
 
     Parameters:
-    image (Image): The root image.
-    scaling_factor (float): The scaling factor to apply to the total volume.
+    image (numpy.ndarray | RootImage): The root image.
+    scaling_factor (float): The scaling factor to apply to the metrics.
 
     Returns:
-    float: The calculated root volume.
+    numpy.ndarray: A structured array with one row per root and the fields of ``ROOT_TABLE_DTYPE``. The bounding box
+        (x, y, width, height) is in pixels.
     """
 
-    skeleton = skeletonize(image).astype(np.uint8)
+    root_image = _as_root_image(image)
+    labels, stats = root_image.components
+    count = len(stats) - 1
 
-    image_contours, _ = cv2.findContours(
-        image, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_NONE)
+    table = np.zeros(count, dtype=ROOT_TABLE_DTYPE)
+    if count == 0:
+        return table
 
-    y, x = np.where(skeleton == 1)
+    skeleton_labels = labels[root_image.skeleton]
+    skeleton_pixels = np.bincount(skeleton_labels, minlength=count + 1)[1:]
 
-    if len(x) == 0 or len(y) == 0:
-        return 0
+    radii = root_image.distance_map[root_image.skeleton].astype(np.float64)
+    radius_sums = np.bincount(skeleton_labels, weights=radii, minlength=count + 1)[1:]
+    squared_radius_sums = np.bincount(skeleton_labels, weights=np.square(radii), minlength=count + 1)[1:]
+
+    table['area'] = stats[1:, cv2.CC_STAT_AREA] * scaling_factor ** 2
+    table['length'] = skeleton_pixels * scaling_factor
+    np.divide(2 * radius_sums * scaling_factor, skeleton_pixels, out=table['average_diameter'],
+              where=skeleton_pixels > 0)
+    table['volume'] = np.pi * squared_radius_sums * scaling_factor ** 2
+    table['x'] = stats[1:, cv2.CC_STAT_LEFT]
+    table['y'] = stats[1:, cv2.CC_STAT_TOP]
+    table['width'] = stats[1:, cv2.CC_STAT_WIDTH]
+    table['height'] = stats[1:, cv2.CC_STAT_HEIGHT]
+
+    return table
 
-    image_contour_points = np.vstack(image_contours).squeeze()
 
-    radii = []
-    for point in zip(x, y):
-        point = np.array(point)[np.newaxis, :]
-        distances = np.linalg.norm(image_contour_points - point, axis=1)
-        radii.append(np.min(distances) * scaling_factor)
+class _DisjointSet:
+    def __init__(self):
+        self.parent = []
 
-    return np.sum(np.pi * (np.array(radii) ** 2))
+    def add(self, count: int) -> int:
+        start = len(self.parent)
+        self.parent.extend(range(start, start + count))
+        return start
 
+    def find(self, x: int) -> int:
+        while self.parent[x] != x:
+            self.parent[x] = self.parent[self.parent[x]]
+            x = self.parent[x]
+        return x
 
-def calculate_metrics(image: np.ndarray, scaling_factor: float) -> dict:
+    def union(self, x: int, y: int) -> bool:
+        x, y = self.find(x), self.find(y)
+        if x == y:
+            return False
+
+        self.parent[max(x, y)] = min(x, y)
+        return True
+
+
+class _TileLabeler:
+    """
+    Labels the connected components of tiles visited in column-major order, merging components across tile borders.
+
+    Only the last column of the previous tile column and the last row of the previous tile are kept, so memory
+    depends on the image height and the number of components but not on the image width.
+
+    Parameters:
+    height (int): The height of the image.
+    connectivity (int): 4 or 8, as in ``cv2.connectedComponents``.
+    """
+
+    def __init__(self, height: int, connectivity: int):
+        self.connectivity = connectivity
+        self.components = _DisjointSet()
+        self.count = 0
+
+        self.previous_column = np.zeros(height, dtype=np.int64)
+        self.current_column = np.zeros(height, dtype=np.int64)
+        self.previous_row = None
+
+    def _seam_pairs(self, labels: np.ndarray, neighbours: np.ndarray) -> list[np.ndarray]:
+        pairs = [np.stack([labels, neighbours], axis=1)]
+        if self.connectivity == 8 and len(labels) > 1:
+            pairs.append(np.stack([labels[1:], neighbours[:-1]], axis=1))
+            pairs.append(np.stack([labels[:-1], neighbours[1:]], axis=1))
+
+        return pairs
+
+    def add(self, binary: np.ndarray, row_start: int, column_start: int) -> tuple[int, np.ndarray]:
+        """
+        Labels a tile and merges its components with those of the tiles above and to the left of it.
+
+        Parameters:
+        binary (numpy.ndarray): The boolean pixels to label.
+        row_start (int): The row of the image the tile starts at.
+        column_start (int): The column of the image the tile starts at.
+
+        Returns:
+        tuple[int, numpy.ndarray]: The global label of the first component in the tile and the global labels of the
+            tile, where 0 is background and label ``n`` is element ``n - 1`` of ``components``.
+        """
+
+        if row_start == 0:
+            self.previous_column, self.current_column = self.current_column, self.previous_column
+            self.current_column[:] = 0
+            self.previous_row = None
+
+        count, labels = cv2.connectedComponents(
+            binary.view(np.uint8), connectivity=self.connectivity, ltype=cv2.CV_32S)
+        labels = labels.astype(np.int64)
+
+        offset = self.components.add(count - 1)
+        labels[labels > 0] += offset
+        self.count += count - 1
+
+        row_end = row_start + labels.shape[0]
+        pairs = []
+        if column_start > 0:
+            pairs += self._seam_pairs(labels[:, 0], self.previous_column[row_start:row_end])
+            if self.connectivity == 8 and row_start > 0:
+                pairs.append(np.array([[labels[0, 0], self.previous_column[row_start - 1]]]))
+            if self.connectivity == 8 and row_end < len(self.previous_column):
+                pairs.append(np.array([[labels[-1, 0], self.previous_column[row_end]]]))
+        if self.previous_row is not None:
+            pairs += self._seam_pairs(labels[0, :], self.previous_row)
+
+        if pairs:
+            pairs = np.concatenate(pairs)
+            pairs = np.unique(pairs[(pairs[:, 0] > 0) & (pairs[:, 1] > 0)], axis=0)
+            for a, b in pairs:
+                if self.components.union(int(a) - 1, int(b) - 1):
+                    self.count -= 1
+
+        self.previous_row = labels[-1, :]
+        self.current_column[row_start:row_end] = labels[:, -1]
+
+        return offset + 1, labels
+
+
+def _tiles(height: int, width: int, tile_size: int):
+    for column_start in range(0, width, tile_size):
+        for row_start in range(0, height, tile_size):
+            yield row_start, min(row_start + tile_size, height), column_start, min(column_start + tile_size, width)
+
+
+def _find_hole_tables(image: np.ndarray, tile_size: int) -> dict:
+    """
+    Finds the background pixels of each tile that are enclosed by roots in the whole image.
+
+    Background is labelled with 4-connectivity, matching the holes ``cv2.findContours`` finds between
+    8-connected roots, and a background component is a hole if it never touches the image border.
+
+    Parameters:
+    image (numpy.ndarray): The root image.
+    tile_size (int): The height and width of a tile.
+
+    Returns:
+    dict: A lookup table from background label to whether it is a hole for each tile that has holes, keyed by the
+        tile's top-left corner.
     """
-    Calculates the metrics of the given root image.
+
+    height, width = image.shape[:2]
+    labeler = _TileLabeler(height, connectivity=4)
+
+    tile_labels = {}
+    outside = set()
+    for row_start, row_end, column_start, column_end in _tiles(height, width, tile_size):
+        first, labels = labeler.add(image[row_start:row_end, column_start:column_end] == 0, row_start, column_start)
+        tile_labels[row_start, column_start] = (first, labels.max(initial=0))
+
+        borders = []
+        if row_start == 0:
+            borders.append(labels[0, :])
+        if row_end == height:
+            borders.append(labels[-1, :])
+        if column_start == 0:
+            borders.append(labels[:, 0])
+        if column_end == width:
+            borders.append(labels[:, -1])
+        if borders:
+            outside.update(int(label) for label in np.unique(np.concatenate(borders)) if label > 0)
+
+    outside = {labeler.components.find(label - 1) for label in outside}
+
+    hole_tables = {}
+    for key, (first, last) in tile_labels.items():
+        holes = [labeler.components.find(label - 1) not in outside for label in range(first, last + 1)]
+        if any(holes):
+            hole_tables[key] = np.array([False] + holes)
+
+    return hole_tables
+
+
+def calculate_metrics_tiled(image: np.ndarray, scaling_factor: float, tile_size: int = 1024, halo: int = 64,
+                            metrics: list[str] = None) -> dict:
+    """
+    Calculates the metrics of the given root image one tile at a time.
+
+    Each tile is analysed together with a halo of surrounding pixels so that skeletons and radii near the tile
+    borders are the same as in the whole image, and only the pixels inside the tile itself are counted. Roots and
+    holes that cross tile borders are stitched together by merging the labels on either side of each seam, so root
+    counts and the hole-aware radii of ``calculate_metrics`` are preserved. Tiles are visited column by column and
+    only three tile columns are kept at once, so apart from the image itself memory depends on the tile size and the
+    image height but not on its width, and ``image`` may be a ``numpy.memmap``.
 
     Parameters:
-    image (Image): The root image.
+    image (numpy.ndarray): The root image.
     scaling_factor (float): The scaling factor to apply to the metrics.
+    tile_size (int, optional): The height and width of a tile. Defaults to 1024.
+    halo (int, optional): The number of pixels of context around each tile. Roots thicker than the halo may get
+        smaller radii than in ``calculate_metrics``. Defaults to 64.
+    metrics (list[str], optional): The names of the metrics to calculate, from ``METRICS``. Defaults to all of them.
 
     Returns:
     dict: The calculated metrics.
     """
 
-    root_count = find_root_count(image)
+    if metrics is None:
+        metrics = METRICS
 
-    if root_count == 0:
-        return {
-            "root_count": 0,
-            "average_root_diameter": 0,
-            "total_root_length": 0,
-            "total_root_area": 0,
-            "total_root_volume": 0
-        }
+    unknown_metrics = set(metrics) - set(METRICS)
+    if unknown_metrics:
+        raise ValueError(f'Invalid metrics: {", ".join(sorted(unknown_metrics))}')
+
+    if halo > tile_size:
+        raise ValueError('The halo cannot be larger than the tile size')
+
+    needs_count = 'root_count' in metrics
+    needs_radii = bool({'average_root_diameter', 'total_root_volume'} & set(metrics))
+    needs_skeleton = needs_radii or 'total_root_length' in metrics
+
+    height, width = image.shape[:2]
+
+    hole_tables = _find_hole_tables(image, tile_size) if needs_count or needs_radii else {}
+    filled_tiles = {}
+
+    def filled_tile(row_start: int, column_start: int) -> np.ndarray:
+        if (row_start, column_start) not in filled_tiles:
+            core = image[row_start:row_start + tile_size, column_start:column_start + tile_size]
+            filled = core > 0
 
-    return {
-        "root_count": find_root_count(image),
-        "average_root_diameter": find_root_diameter(image, scaling_factor),
-        "total_root_length": find_total_root_length(image, scaling_factor),
-        "total_root_area": find_total_root_area(image, scaling_factor),
-        "total_root_volume": find_total_root_volume(image, scaling_factor)
+            if (row_start, column_start) in hole_tables:
+                _, labels = cv2.connectedComponents((~filled).view(np.uint8), connectivity=4, ltype=cv2.CV_32S)
+                filled |= hole_tables[row_start, column_start][labels]
+
+            filled_tiles[row_start, column_start] = filled
+
+        return filled_tiles[row_start, column_start]
+
+    labeler = _TileLabeler(height, connectivity=8)
+    pixel_sum = 0
+    skeleton_length = 0
+    radius_sum = 0.0
+    squared_radius_sum = 0.0
+
+    for row_start, row_end, column_start, column_end in _tiles(height, width, tile_size):
+        for key in [key for key in filled_tiles if key[1] < column_start - tile_size]:
+            del filled_tiles[key]
+
+        if 'total_root_area' in metrics:
+            pixel_sum += int(np.sum(image[row_start:row_end, column_start:column_end], dtype=np.uint64))
+
+        if needs_count:
+            labeler.add(filled_tile(row_start, column_start), row_start, column_start)
+
+        if not needs_skeleton:
+            continue
+
+        window_rows = slice(max(0, row_start - halo), min(height, row_end + halo))
+        window_columns = slice(max(0, column_start - halo), min(width, column_end + halo))
+        core_rows = slice(row_start - window_rows.start, row_end - window_rows.start)
+        core_columns = slice(column_start - window_columns.start, column_end - window_columns.start)
+
+        skeleton = skeletonize(image[window_rows, window_columns] > 0)[core_rows, core_columns]
+        skeleton_length += int(np.count_nonzero(skeleton))
+
+        if not needs_radii or not skeleton.any():
+            continue
+
+        window = np.zeros((window_rows.stop - window_rows.start, window_columns.stop - window_columns.start),
+                          dtype=np.uint8)
+        for tile_row in range(window_rows.start // tile_size * tile_size, window_rows.stop, tile_size):
+            for tile_column in range(window_columns.start // tile_size * tile_size, window_columns.stop, tile_size):
+                tile = filled_tile(tile_row, tile_column)
+
+                rows = slice(max(tile_row, window_rows.start), min(tile_row + tile.shape[0], window_rows.stop))
+                columns = slice(max(tile_column, window_columns.start),
+                                min(tile_column + tile.shape[1], window_columns.stop))
+                window[rows.start - window_rows.start:rows.stop - window_rows.start,
+                       columns.start - window_columns.start:columns.stop - window_columns.start] = tile[
+                    rows.start - tile_row:rows.stop - tile_row, columns.start - tile_column:columns.stop - tile_column]
+
+        radii = find_distance_map(window)[core_rows, core_columns][skeleton].astype(np.float64)
+        radius_sum += float(np.sum(radii))
+        squared_radius_sum += float(np.sum(np.square(radii)))
+
+    if needs_count and labeler.count == 0:
+        return {metric: 0 for metric in metrics}
+
+    calculations = {
+        'root_count': lambda: labeler.count,
+        'average_root_diameter': lambda: 2 * radius_sum / skeleton_length * scaling_factor if skeleton_length else 0,
+        'total_root_length': lambda: skeleton_length * scaling_factor,
+        'total_root_area': lambda: pixel_sum / 255 * (scaling_factor ** 2),
+        'total_root_volume': lambda: np.pi * squared_radius_sum * scaling_factor ** 2,
     }
+
+    return {metric: calculations[metric]() for metric in metrics}
@@ -0,0 +1,154 @@
+import math
+
+import torch
+from torch import nn
+from torch.nn import functional as F
+
+from segmentation.models import ModelType
+
+
+def choose_tile_size(model_type: ModelType, height: int, width: int, memory_budget: int,
+                     overlap: int = 32) -> tuple[int, int]:
+    """
+    Picks the largest tile a model can run on within a memory budget.
+
+    Tiles are multiples of the downsampling factor of the model and never larger than the image, padded up to
+    that multiple. When the image is short in one dimension, the tile gets longer in the other.
+
+    Args:
+        model_type (ModelType): The architecture of the model.
+        height (int): The height of the image.
+        width (int): The width of the image.
+        memory_budget (int): The memory a forward pass may use, in bytes.
+        overlap (int, optional): The overlap between neighbouring tiles. Defaults to 32.
+
+    Returns:
+        tuple[int, int]: The height and width of the tiles.
+    """
+    multiple = model_type.input_multiple
+    tile_pixels = memory_budget // model_type.activation_bytes_per_pixel
+    smallest = multiple * math.ceil((overlap + 1) / multiple)
+
+    def fit(length: int, limit: int) -> int:
+        return max(smallest, min(multiple * (limit // multiple), multiple * math.ceil(length / multiple)))
+
+    tile_height = fit(height, math.isqrt(tile_pixels))
+    tile_width = fit(width, tile_pixels // tile_height)
+
+    return tile_height, tile_width
+
+
+def tile_starts(length: int, tile: int, overlap: int) -> list[int]:
+    """
+    Returns the offsets of the tiles covering a dimension, the last one aligned with the end.
+
+    Args:
+        length (int): The length of the dimension, at least ``tile``.
+        tile (int): The length of the tiles.
+        overlap (int): The minimum overlap between neighbouring tiles.
+
+    Returns:
+        list[int]: The offsets of the tiles.
+    """
+    starts = list(range(0, length - tile, tile - overlap))
+    starts.append(length - tile)
+
+    return starts
+
+
+def blending_ramp(tile: int, overlap: int) -> torch.Tensor:
+    """
+    Returns the blending weights along one dimension of a tile, rising linearly over the overlap at both ends.
+
+    Args:
+        tile (int): The length of the tile.
+        overlap (int): The overlap between neighbouring tiles.
+
+    Returns:
+        torch.Tensor: The positive weights of each position in the tile.
+    """
+    ramp = torch.ones(tile)
+
+    if overlap > 0:
+        edge = torch.arange(1, overlap + 1, dtype=torch.float32) / (overlap + 1)
+        ramp[:overlap] = edge
+        ramp[-overlap:] = edge.flip(0)
+
+    return ramp
+
+
+def pad(image: torch.Tensor, height: int, width: int) -> torch.Tensor:
+    """
+    Pads an image at the bottom and right, by reflection where the image is large enough and by replication
+    otherwise.
+
+    Args:
+        image (torch.Tensor): The image, with shape (1, channels, height, width).
+        height (int): The height to pad to.
+        width (int): The width to pad to.
+
+    Returns:
+        torch.Tensor: The padded image.
+    """
+    padding = (0, width - image.shape[3], 0, height - image.shape[2])
+
+    if padding[1] < image.shape[3] and padding[3] < image.shape[2]:
+        return F.pad(image, padding, mode='reflect')
+
+    return F.pad(image, padding, mode='replicate')
+
+
+class TiledModel(nn.Module):
+    """
+    Runs a segmentation model on overlapping tiles and blends their outputs, so that its peak memory does not grow
+    with the size of the image.
+
+    Images are padded by reflection instead of being resampled to a multiple of the downsampling factor. A pixel
+    that every covering tile predicts as exactly 1 stays exactly 1 after blending, so masks thresholded with
+    ``threshold_probabilities`` are unaffected by the blending itself.
+
+    Args:
+        model (nn.Module): The model. It must have a ``forward_padded`` method, like ``UNet``, ``ResNet`` and the
+            models returned by ``load_backend`` and ``convert_precision``.
+        model_type (ModelType): The architecture of the model.
+        memory_budget (int): The memory a forward pass may use, in bytes.
+        overlap (int, optional): The overlap between neighbouring tiles. Defaults to 32.
+    """
+
+    def __init__(self, model: nn.Module, model_type: ModelType, memory_budget: int, overlap: int = 32):
+        super().__init__()
+        self.model = model
+        self.model_type = model_type
+        self.memory_budget = memory_budget
+        self.overlap = overlap
+
+    def forward(self, x: torch.Tensor) -> torch.Tensor:
+        return torch.cat([self.predict_image(image) for image in x.split(1)])
+
+    def predict_image(self, image: torch.Tensor) -> torch.Tensor:
+        height, width = image.shape[2:]
+        tile_height, tile_width = choose_tile_size(self.model_type, height, width, self.memory_budget, self.overlap)
+
+        padded = pad(image, max(height, tile_height), max(width, tile_width))
+        padded_height, padded_width = padded.shape[2:]
+
+        weights = blending_ramp(tile_height, self.overlap)[:, None] * blending_ramp(tile_width, self.overlap)[None]
+        weights = weights.to(image.device)
+
+        output = None
+        weight_sum = torch.zeros(padded_height, padded_width, device=image.device)
+
+        for top in tile_starts(padded_height, tile_height, self.overlap):
+            for left in tile_starts(padded_width, tile_width, self.overlap):
+                tile = padded[:, :, top:top + tile_height, left:left + tile_width]
+                probabilities = self.model.forward_padded(tile)[0]
+
+                if output is None:
+                    output = torch.zeros(probabilities.shape[0], padded_height, padded_width, device=image.device)
+
+                output[:, top:top + tile_height, left:left + tile_width] += probabilities * weights
+                weight_sum[top:top + tile_height, left:left + tile_width] += weights
+
+        output /= weight_sum
+
+        return output[None, :, :height, :width]